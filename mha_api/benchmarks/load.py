@@ -0,0 +1,447 @@
+"""
+Load test of the HTTP endpoints.
+
+Starts the app under gunicorn (sync workers, or uvicorn workers from the
+``uvicorn-worker`` package with ``--server asgi``) against the configured, seeded database, or targets a
+running server with ``--url``, and drives each scenario with concurrent
+keep-alive clients:
+
+- ``list``: first pages of ``/api/characters/``;
+- ``deep_offset``: pages near the end of the list;
+- ``search``: ``?search=`` with name fragments;
+- ``detail``: ``/api/characters/<id>/`` for existing ids;
+- ``docs``: the OpenAPI schema, Swagger UI and ReDoc pages.
+
+To test at production-like scale, seed a synthetic dataset first with
+``python manage.py generate_dataset``.
+
+Request paths are drawn from a seeded random generator, so runs with the same
+``--seed`` against the same data send the same requests. Rate limits and load
+shedding are turned off in the spawned server. The report (requests per
+second, p50/p95/p99 latency and errors per scenario) is printed as JSON;
+``--compare`` checks it against a saved report and exits with status 1 when a
+scenario got slower than ``--threshold`` allows.
+
+Usage:
+    python benchmarks/load.py [--scenarios list,search] [--duration N]
+        [--concurrency N] [--workers N] [--output report.json]
+        [--compare baseline.json]
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings that would otherwise turn benchmark traffic away.
+SERVER_ENV = {
+    "THROTTLE_RATE": "",
+    "THROTTLE_EXPENSIVE_RATE": "",
+    "LOAD_SHED_QUEUE_SECONDS": "0",
+    "LOAD_SHED_LATENCY_SECONDS": "0",
+}
+
+SCENARIOS = ["list", "deep_offset", "search", "detail", "docs"]
+# Gunicorn worker class per --server choice (None for gunicorn's default).
+WORKER_CLASSES = {"wsgi": None, "asgi": "uvicorn_worker.UvicornWorker"}
+DOCS_PATHS = ["/api/schema/", "/api/docs/", "/api/redoc/"]
+PAGE_SIZE = 20
+
+
+def percentile(values, pct):
+    """
+    Returns the nearest-rank percentile of sorted ``values``: the smallest
+    value with at least ``pct`` percent of the values at or below it.
+    """
+    if not values:
+        return None
+    index = max(math.ceil(pct / 100 * len(values)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Client:
+    """A keep-alive HTTP client for one load-generating thread."""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.conn = None
+
+    def get(self, path):
+        """Returns ``(status, body)``, reconnecting once on a dropped socket."""
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request("GET", self.prefix + path)
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def get_json(self, path):
+        status, body = self.get(path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(body)
+
+
+def build_scenarios(url, seed):
+    """
+    Reads the dataset through the API and returns ``{name: paths(rng)}``,
+    functions that draw the next request path for each scenario.
+    """
+    client = Client(url)
+    count = client.get_json("/api/characters/?limit=1")["count"]
+    if not count:
+        sys.exit("No characters in the database; seed it first.")
+    ids, names = [], []
+    for offset in range(0, min(count, 10000), 1000):
+        page = client.get_json(f"/api/characters/?limit=1000&offset={offset}")
+        ids += [c["id"] for c in page["results"]]
+        names += [c["name"] for c in page["results"]]
+
+    rng = random.Random(seed)
+    words = [w for name in names for w in name.split() if len(w) >= 3]
+    terms = sorted(
+        {
+            w[: rng.randint(3, min(len(w), 5))].lower()
+            for w in rng.sample(words, min(len(words), 200))
+        }
+    )
+    last_page = max(count - PAGE_SIZE, 0)
+
+    return count, {
+        "list": lambda r: (
+            f"/api/characters/?limit={PAGE_SIZE}"
+            f"&offset={r.randrange(0, min(count, 10 * PAGE_SIZE))}"
+        ),
+        "deep_offset": lambda r: (
+            f"/api/characters/?limit={PAGE_SIZE}"
+            f"&offset={r.randrange(max(last_page - 10 * PAGE_SIZE, 0), last_page + 1)}"
+        ),
+        "search": lambda r: "/api/characters/?search="
+        + urllib.parse.quote(r.choice(terms)),
+        "detail": lambda r: f"/api/characters/{r.choice(ids)}/",
+        "docs": lambda r: r.choice(DOCS_PATHS),
+    }
+
+
+def run_scenario(url, paths, concurrency, duration, warmup, seed):
+    """
+    Sends requests from ``concurrency`` threads for ``warmup`` + ``duration``
+    seconds and measures the last ``duration`` seconds.
+
+    Returns:
+        dict: Requests, errors, requests per second and latency percentiles.
+    """
+    latencies, statuses, errors = [], {}, []
+    lock = threading.Lock()
+    start = time.perf_counter() + warmup
+    deadline = start + duration
+
+    def worker(index):
+        client = Client(url)
+        rng = random.Random(f"{seed}-{index}")
+        local_latencies, local_statuses, local_errors = [], {}, []
+        while True:
+            path = paths(rng)
+            sent = time.perf_counter()
+            if sent >= deadline:
+                break
+            try:
+                status, _ = client.get(path)
+            except Exception as e:
+                status = None
+                error = f"{type(e).__name__}: {e}"
+            received = time.perf_counter()
+            if sent < start:
+                continue
+            local_latencies.append(received - sent)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status is None:
+                local_errors.append(error)
+            elif status >= 400:
+                local_errors.append(f"{status} {path}")
+        with lock:
+            latencies.extend(local_latencies)
+            errors.extend(local_errors)
+            for status, n in local_statuses.items():
+                statuses[str(status)] = statuses.get(str(status), 0) + n
+
+    threads = [
+        threading.Thread(target=worker, args=(i,), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(ms),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(ms) if ms else 0.0,
+        "requests_per_second": len(ms) / duration,
+        "latency_ms": {
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "mean": sum(ms) / len(ms) if ms else None,
+            "max": ms[-1] if ms else None,
+        },
+        "statuses": statuses,
+        "sample_errors": sorted(set(errors))[:5],
+    }
+
+
+def missing_worker_class(server):
+    """
+    Returns an error message if the gunicorn worker class of ``server`` cannot
+    be imported, which would otherwise only show as a crash in the server log.
+    """
+    worker_class = WORKER_CLASSES[server]
+    if worker_class is None:
+        return None
+    module = worker_class.rsplit(".", 1)[0]
+    try:
+        found = importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:  # A missing parent package.
+        found = False
+    if found:
+        return None
+    return (
+        f"--server {server} needs the {worker_class} worker class, but {module} "
+        "is not installed (pip install -r requirements.txt)"
+    )
+
+
+def start_server(server, workers, threads, port, log):
+    """Starts gunicorn and waits until it answers."""
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+    command += ["--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    command += ["--threads", str(threads)]
+    if WORKER_CLASSES[server]:
+        command += ["--worker-class", WORKER_CLASSES[server]]
+    if server == "asgi":
+        command.append("mha_api.asgi:application")
+    else:
+        command.append("mha_api.wsgi:application")
+    env = {**os.environ, **SERVER_ENV, "GUNICORN_THREADS": str(threads)}
+    process = subprocess.Popen(
+        command, cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    client = Client(url)
+    for _ in range(300):
+        if process.poll() is not None:
+            sys.exit(
+                f"The server exited with status {process.returncode}, see {log.name}"
+            )
+        try:
+            client.get("/api/characters/?limit=1")
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    sys.exit(f"The server did not start in 30 seconds, see {log.name}")
+
+
+def compare(report, baseline, threshold):
+    """
+    Compares each scenario with the baseline.
+
+    A scenario regressed when its requests per second dropped, or its p95 or
+    p99 latency grew, by more than ``threshold`` (a fraction), or when it has
+    errors the baseline did not.
+
+    Returns:
+        dict: ``{scenario: {metric: {"baseline", "current", "change"}, ...,
+        "regressed": bool}}``.
+    """
+    result = {}
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        metrics = {
+            "requests_per_second": (
+                before["requests_per_second"],
+                current["requests_per_second"],
+            ),
+            **{
+                p: (before["latency_ms"][p], current["latency_ms"][p])
+                for p in ("p50", "p95", "p99")
+            },
+            "errors": (before["errors"], current["errors"]),
+        }
+        entry = {}
+        for metric, (old, new) in metrics.items():
+            change = (new - old) / old if old and new is not None else None
+            entry[metric] = {"baseline": old, "current": new, "change": change}
+
+        def worse(metric, sign):
+            change = entry[metric]["change"]
+            return change is not None and sign * change > threshold
+
+        entry["regressed"] = (
+            worse("requests_per_second", -1)
+            or worse("p95", 1)
+            or worse("p99", 1)
+            or (current["errors"] > 0 and before["errors"] == 0)
+        )
+        result[name] = entry
+    return result
+
+
+def print_comparison(comparison, out=sys.stderr):
+    print(
+        f"{'scenario':<12} {'req/s':>18} {'p50 ms':>18} {'p95 ms':>18} "
+        f"{'p99 ms':>18}",
+        file=out,
+    )
+    for name, entry in comparison.items():
+        cells = []
+        for metric in ("requests_per_second", "p50", "p95", "p99"):
+            m = entry[metric]
+            change = f"{m['change']:+.0%}" if m["change"] is not None else "n/a"
+            cells.append(f"{m['current'] or 0:>10.1f} {change:>7}")
+        flag = "  REGRESSED" if entry["regressed"] else ""
+        print(f"{name:<12} " + " ".join(cells) + flag, file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="Comma-separated scenarios to run.",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds measured per scenario."
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=2, help="Unmeasured seconds per scenario."
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients.")
+    parser.add_argument("--seed", type=int, default=0, help="Request generator seed.")
+    parser.add_argument(
+        "--server", choices=list(WORKER_CLASSES), default="wsgi", help="Worker type."
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes.")
+    parser.add_argument("--threads", type=int, default=1, help="Threads per worker.")
+    parser.add_argument("--url", help="Benchmark a running server instead.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Report to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Allowed slowdown as a fraction before --compare fails (default 0.10).",
+    )
+    args = parser.parse_args()
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(
+            f"unknown scenarios: {', '.join(sorted(unknown))} "
+            f"(choose from {', '.join(SCENARIOS)})"
+        )
+    if args.url is None and (error := missing_worker_class(args.server)):
+        parser.error(error)
+
+    process = None
+    log = tempfile.NamedTemporaryFile(
+        "w", prefix="mha-load-", suffix=".log", delete=False
+    )
+    url = args.url
+    if url is None:
+        process, url = start_server(
+            args.server, args.workers, args.threads, free_port(), log
+        )
+    try:
+        count, scenarios = build_scenarios(url, args.seed)
+        results = {}
+        for name in names:
+            print(f"{name}...", file=sys.stderr)
+            results[name] = run_scenario(
+                url,
+                scenarios[name],
+                args.concurrency,
+                args.duration,
+                args.warmup,
+                args.seed,
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    log.close()
+    os.unlink(log.name)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=PROJECT_DIR,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+            or None,
+            "python": platform.python_version(),
+            "server": "external" if args.url else args.server,
+            "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+            "characters": count,
+        },
+        "scenarios": results,
+    }
+    regressed = False
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f), args.threshold)
+        print_comparison(report["comparison"])
+        regressed = any(entry["regressed"] for entry in report["comparison"].values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
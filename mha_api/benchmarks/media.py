@@ -0,0 +1,127 @@
+"""
+Image serving throughput of a single worker.
+
+Sends requests for the seeded character images through the full WSGI stack
+in-process (exactly what one sync gunicorn worker does per request, minus
+the socket) and reports requests and megabytes per second for:
+
+- ``serve_file``: full responses, 304 revalidations, 1 KB ranges and
+  X-Accel-Redirect offload;
+- ``django.views.static.serve``, the DEBUG-only view it replaces.
+
+Usage:
+    python benchmarks/media.py [--seconds N] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mha_api.settings")
+
+
+def run(application, environ_for, names, seconds):
+    """
+    Requests ``names`` round-robin for ``seconds`` seconds.
+
+    Returns:
+        dict: ``requests``, ``requests_per_second`` and ``mb_per_second``.
+    """
+    count = size = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for name in names:
+            statuses = []
+            body = application(
+                environ_for(name), lambda status, headers: statuses.append(status)
+            )
+            for chunk in body:
+                size += len(chunk)
+            if hasattr(body, "close"):
+                body.close()
+            if statuses[0][:3] not in ("200", "206", "304"):
+                raise RuntimeError(f"{name}: {statuses[0]}")
+            count += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": count,
+        "requests_per_second": count / elapsed,
+        "mb_per_second": size / elapsed / 1e6,
+    }
+
+
+def benchmark(seconds):
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.test import override_settings
+    from django.urls import path
+    from django.views.static import serve
+
+    from characters.images import find_images
+    from mha_api import urls
+    from mha_api.serve import file_etag
+    from mha_api.warmup import wsgi_environ
+    from mha_api.wsgi import application
+
+    names = sorted(find_images(settings.MEDIA_ROOT))
+    if not names:
+        sys.exit("No images under MEDIA_ROOT; seed the database first.")
+    etags = {n: file_etag(os.stat(os.path.join(settings.MEDIA_ROOT, n))) for n in names}
+
+    def media(headers=None):
+        return lambda name: wsgi_environ(
+            settings.MEDIA_URL + name, headers(name) if headers else None
+        )
+
+    cases = {
+        "serve_file full": media(),
+        "serve_file 304": media(lambda n: {"If-None-Match": etags[n]}),
+        "serve_file range 1KB": media(lambda n: {"Range": "bytes=0-1023"}),
+    }
+    results = {
+        case: run(application, environ_for, names, seconds)
+        for case, environ_for in cases.items()
+    }
+
+    with override_settings(SENDFILE_HEADER="X-Accel-Redirect"):
+        results["serve_file X-Accel-Redirect"] = run(
+            application, media(), names, seconds
+        )
+
+    # The DEBUG-only view, mounted on the same middleware stack.
+    urls.urlpatterns.insert(
+        0,
+        path(
+            "static-serve/<path:path>",
+            serve,
+            {"document_root": settings.MEDIA_ROOT},
+        ),
+    )
+    results["django.views.static.serve"] = run(
+        application, lambda name: wsgi_environ("/static-serve/" + name), names, seconds
+    )
+    return {"images": len(names), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration per case.")
+    parser.add_argument("--json", action="store_true", help="Print JSON.")
+    args = parser.parse_args()
+
+    report = benchmark(args.seconds)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['images']} images, one worker, {args.seconds:.0f}s per case")
+        for case, r in report["results"].items():
+            print(
+                f"  {case:<28} {r['requests_per_second']:8.0f} req/s "
+                f"{r['mb_per_second']:8.1f} MB/s"
+            )
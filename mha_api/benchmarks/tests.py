@@ -0,0 +1,70 @@
+"""
+Tests for the load test harness that need no server: percentiles and the
+checks ``main`` runs before it starts gunicorn.
+
+Run with ``python -m unittest benchmarks/tests.py`` from ``mha_api``.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+# The benchmarks are scripts, not a package.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load  # noqa: E402
+
+
+class PercentileTests(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(load.percentile(values, 50), 50)
+        self.assertEqual(load.percentile(values, 95), 95)
+        self.assertEqual(load.percentile(values, 99), 99)
+        self.assertEqual(load.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(load.percentile([1, 2, 3, 4], 75), 3)
+        self.assertEqual(load.percentile([7], 99), 7)
+        self.assertIsNone(load.percentile([], 50))
+
+
+class MainArgumentTests(unittest.TestCase):
+    def run_main(self, *args):
+        stderr = io.StringIO()
+        with (
+            mock.patch.object(sys, "argv", ["load.py", *args]),
+            mock.patch.object(load, "start_server") as start_server,
+            contextlib.redirect_stderr(stderr),
+            self.assertRaises(SystemExit) as exit,
+        ):
+            load.main()
+        start_server.assert_not_called()
+        return exit.exception.code, stderr.getvalue()
+
+    def test_rejects_a_missing_worker_class(self):
+        classes = {**load.WORKER_CLASSES, "asgi": "not_installed_worker.Worker"}
+        with mock.patch.object(load, "WORKER_CLASSES", classes):
+            code, stderr = self.run_main("--server", "asgi")
+        self.assertEqual(code, 2)
+        self.assertIn(
+            "--server asgi needs the not_installed_worker.Worker worker class",
+            stderr,
+        )
+
+    def test_rejects_unknown_scenarios(self):
+        code, stderr = self.run_main("--scenarios", "list,bogus")
+        self.assertEqual(code, 2)
+        self.assertIn("unknown scenarios: bogus", stderr)
+
+    def test_worker_classes(self):
+        self.assertIsNone(load.missing_worker_class("wsgi"))
+        classes = {"asgi": "json.JSONDecoder", "other": "missing.parent.Worker"}
+        with mock.patch.object(load, "WORKER_CLASSES", classes):
+            self.assertIsNone(load.missing_worker_class("asgi"))
+            self.assertIn("missing.parent", load.missing_worker_class("other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
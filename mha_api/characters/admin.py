@@ -1,7 +1,15 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
 
 # Register your models here.
+from .bulk import merge, merge_candidates, renumber
+from .images import variant_name
 from .models import (
     Affiliation,
     Alias,
@@ -10,6 +18,118 @@ from .models import (
     CharacterQuirk,
     Quirk,
 )
+from .paginators import EstimatedCountPaginator
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete widget that renders the selected option from an object the
+    form already loaded (``selected``) instead of querying for it, which
+    would cost a query per inline row.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(v) for v in value] != [str(selected.pk)]:
+            return super().optgroups(name, value, attr)
+        groups = super().optgroups(name, [], attr)  # The empty option only.
+        options = groups[0][1]
+        label = self.choices.field.label_from_instance(selected)
+        options.append(
+            self.create_option(name, selected.pk, label, True, len(options))
+        )
+        return groups
+
+
+class LoadedAutocompleteFormSet(BaseInlineFormSet):
+    """Hands each form's related objects to its ``LoadedAutocompleteSelect``s."""
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if form.instance.pk is None:
+            return form
+        for name, field in form.fields.items():
+            widget = getattr(field.widget, "widget", field.widget)
+            if isinstance(widget, LoadedAutocompleteSelect):
+                widget.selected = getattr(form.instance, name)
+        return form
+
+
+class LoadedAutocompleteInline(admin.TabularInline):
+    """
+    Inline whose autocomplete fields render without a query per row; the
+    inline's queryset should ``select_related`` them.
+    """
+
+    formset = LoadedAutocompleteFormSet
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs["widget"] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.action(description="Merge selected %(verbose_name_plural)s")
+def merge_selected(modeladmin, request, queryset):
+    """
+    Merges the selected rows into one the user picks on a confirmation page,
+    which lists them with their number of characters.
+    """
+    opts = queryset.model._meta
+    if request.POST.get("post"):
+        try:
+            target = queryset.filter(pk=request.POST.get("target")).first()
+        except (ValueError, ValidationError):
+            target = None
+        if target is None:
+            modeladmin.message_user(
+                request, f"Choose the {opts.verbose_name} to keep.", messages.ERROR
+            )
+            return None
+        merged, links, dropped = merge(target, queryset)
+        modeladmin.message_user(
+            request,
+            f"Merged {merged} {opts.verbose_name_plural} into {target} "
+            f"({links} links repointed).",
+        )
+        if dropped:
+            modeladmin.message_user(
+                request,
+                "These notes of duplicate links did not fit next to the kept "
+                "link's note and were dropped: "
+                + ", ".join(f"{name}: {note}" for name, note in dropped),
+                messages.WARNING,
+            )
+        return None
+
+    candidates = list(merge_candidates(queryset))
+    if len(candidates) < 2:
+        modeladmin.message_user(
+            request, "Select at least two rows to merge.", messages.WARNING
+        )
+        return None
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        "title": f"Merge {opts.verbose_name_plural}",
+        "opts": opts,
+        "candidates": candidates,
+        "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        "media": modeladmin.media,
+    }
+    return TemplateResponse(
+        request, "admin/characters/merge_selected_confirmation.html", context
+    )
+
+
+@admin.action(description="Renumber quirk and affiliation order")
+def renumber_selected(modeladmin, request, queryset):
+    """Renumbers the selected characters' links to 0, 1, 2..."""
+    links = renumber(queryset)
+    modeladmin.message_user(request, f"Renumbered {links} links.")
 
 
 class AliasInline(admin.TabularInline):
@@ -19,7 +139,7 @@ class AliasInline(admin.TabularInline):
     extra = 1
 
 
-class CharacterQuirkInline(admin.TabularInline):
+class CharacterQuirkInline(LoadedAutocompleteInline):
     """
     Inline admin interface for editing
     CharacterQuirk instances related to a Character.
@@ -31,8 +151,11 @@ class CharacterQuirkInline(admin.TabularInline):
     ordering = ["order"]
     fields = ["quirk", "order"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("character", "quirk")
 
-class CharacterAffiliationInline(admin.TabularInline):
+
+class CharacterAffiliationInline(LoadedAutocompleteInline):
     """
     Inline admin interface for editing
     CharacterAffiliation instances related to a Character.
@@ -44,12 +167,19 @@ class CharacterAffiliationInline(admin.TabularInline):
     ordering = ["order"]
     fields = ["affiliation", "note", "order"]
 
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).select_related("character", "affiliation")
+        )
+
 
 @admin.register(Affiliation)
 class AffiliationAdmin(admin.ModelAdmin):
     """Admin interface customization class for Affiliation model."""
 
     search_fields = ("name",)
+    ordering = ("name",)
+    actions = [merge_selected]
 
 
 @admin.register(Character)
@@ -61,11 +191,20 @@ class CharacterAdmin(admin.ModelAdmin):
     readonly_fields = ("image_preview",)
     fields = ("name", "kanji", "url", "image_preview", "image")
     search_fields = ("name", "kanji")
+    list_per_page = 50
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = [renumber_selected]
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" width="100" />', obj.image.url)
-        return "(No image)"
+        if not obj.image:
+            return "(No image)"
+        # The small variant, falling back to the original until it exists.
+        if obj.image.name == obj.variants_image:
+            url = default_storage.url(variant_name(obj.image.name, "small"))
+        else:
+            url = obj.image.url
+        return format_html('<img src="{}" width="100" loading="lazy" />', url)
 
     image_preview.short_description = "Image Preview"
 
@@ -74,14 +213,22 @@ class CharacterAdmin(admin.ModelAdmin):
 class CharacterAffiliationAdmin(admin.ModelAdmin):
     """Admin interface customization class for CharacterAffiliation model."""
 
-    pass
+    list_display = ("character", "affiliation", "note", "order")
+    list_select_related = ("character", "affiliation")
+    autocomplete_fields = ("character", "affiliation")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 
 @admin.register(CharacterQuirk)
 class CharacterQuirkAdmin(admin.ModelAdmin):
     """Admin interface customization class for CharacterQuirk model."""
 
-    pass
+    list_display = ("character", "quirk", "order")
+    list_select_related = ("character", "quirk")
+    autocomplete_fields = ("character", "quirk")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 
 @admin.register(Quirk)
@@ -89,3 +236,5 @@ class QuirkAdmin(admin.ModelAdmin):
     """Admin interface customization class for Quirk model."""
 
     search_fields = ("name",)
+    ordering = ("name",)
+    actions = [merge_selected]
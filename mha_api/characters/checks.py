@@ -0,0 +1,60 @@
+"""
+Deployment checks for settings the character API relies on in production.
+
+They run with ``manage.py check --deploy``, which the Render start command
+runs before gunicorn, so a misconfigured deploy fails instead of serving
+with rate limits that do not hold.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from rest_framework.settings import api_settings
+
+
+def shared_cache():
+    """Returns True if the default cache is shared between processes."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+@register(Tags.security, deploy=True)
+def check_throttling(app_configs, **kwargs):
+    if not any(api_settings.DEFAULT_THROTTLE_RATES.values()):
+        return []
+    errors = []
+    if api_settings.NUM_PROXIES is None:
+        errors.append(
+            Error(
+                "NUM_PROXIES is not set, so rate limits key clients on the whole "
+                "X-Forwarded-For header, which clients can choose freely.",
+                hint="Set the NUM_PROXIES environment variable (1 on Render).",
+                id="characters.E001",
+            )
+        )
+    if not shared_cache():
+        errors.append(
+            Error(
+                "The default cache is local to each process, so every worker "
+                "keeps its own rate limit buckets.",
+                hint="Set REDIS_URL, or disable throttling with empty "
+                "THROTTLE_RATE and THROTTLE_EXPENSIVE_RATE.",
+                id="characters.E002",
+            )
+        )
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def check_in_memory(app_configs, **kwargs):
+    if not settings.CHARACTERS_IN_MEMORY or shared_cache():
+        return []
+    return [
+        Error(
+            "CHARACTERS_IN_MEMORY needs a cache shared between processes, "
+            "otherwise dataset changes never reach the other workers.",
+            hint="Set REDIS_URL.",
+            id="characters.E003",
+        )
+    ]
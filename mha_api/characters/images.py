@@ -0,0 +1,206 @@
+"""
+Image derivative pipeline for character images.
+
+Generates sized thumbnails and WebP (plus AVIF, when Pillow is built with
+support for it) variants of the original uploads, so list views can point
+clients at a fraction of the bytes of the full-size PNGs.
+
+Variants live next to their source in a ``variants/`` folder, e.g.
+``characters/izuku-midoriya.png`` -> ``characters/variants/izuku-midoriya-small.png``.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, features
+
+VARIANT_DIR = "variants"
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+VARIANTS = {
+    "small": {
+        "max_size": (256, 256),
+        "format": "PNG",
+        "suffix": "-small.png",
+        "options": {"optimize": True},
+    },
+    "small_webp": {
+        "max_size": (256, 256),
+        "format": "WEBP",
+        "suffix": "-small.webp",
+        "options": {"quality": 80, "method": 4},
+    },
+    "webp": {
+        "max_size": None,
+        "format": "WEBP",
+        "suffix": ".webp",
+        "options": {"quality": 85, "method": 4},
+    },
+}
+
+if features.check("avif"):
+    VARIANTS["avif"] = {
+        "max_size": None,
+        "format": "AVIF",
+        "suffix": ".avif",
+        "options": {"quality": 60},
+    }
+
+
+def variant_name(name, variant):
+    """
+    Returns the storage name of a variant for the given original image name.
+
+    Args:
+        name (str): Storage name of the original image, relative to MEDIA_ROOT.
+        variant (str): Key in VARIANTS.
+
+    Returns:
+        str: Storage name of the variant, relative to MEDIA_ROOT.
+    """
+    folder, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, VARIANT_DIR, stem + VARIANTS[variant]["suffix"])
+
+
+def variant_names(name):
+    """Returns the storage names of every variant of the given image."""
+    return [variant_name(name, variant) for variant in VARIANTS]
+
+
+def is_stale(source_path, target_path):
+    """Returns True if the target is missing or older than its source."""
+    try:
+        return os.stat(target_path).st_mtime < os.stat(source_path).st_mtime
+    except FileNotFoundError:
+        return True
+
+
+def generate_variants(name, media_root=None, force=False):
+    """
+    Generates every missing or stale variant for a single image.
+
+    Args:
+        name (str): Storage name of the original image, relative to MEDIA_ROOT.
+        media_root (str): Root folder of the media files, defaults to MEDIA_ROOT.
+        force (bool): Regenerate variants even if they are up to date.
+
+    Returns:
+        list[str]: Storage names of the variants that were written.
+    """
+    media_root = media_root or settings.MEDIA_ROOT
+    source_path = os.path.join(media_root, name)
+    pending = [
+        variant
+        for variant in VARIANTS
+        if force
+        or is_stale(source_path, os.path.join(media_root, variant_name(name, variant)))
+    ]
+    if not pending:
+        return []
+
+    written = []
+    with Image.open(source_path) as original:
+        original.load()
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA")
+
+        for variant in pending:
+            spec = VARIANTS[variant]
+            img = original
+            if spec["max_size"]:
+                img = original.copy()
+                img.thumbnail(spec["max_size"], Image.Resampling.LANCZOS)
+
+            target = variant_name(name, variant)
+            target_path = os.path.join(media_root, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+            # Write to a temporary file first so readers never see a partial image.
+            tmp_path = f"{target_path}.tmp"
+            img.save(tmp_path, format=spec["format"], **spec.get("options", {}))
+            os.replace(tmp_path, target_path)
+            written.append(target)
+
+    return written
+
+
+def _generate_job(job):
+    name, media_root, force = job
+    try:
+        return name, generate_variants(name, media_root, force), None
+    except Exception as e:
+        return name, [], str(e)
+
+
+def find_images(media_root=None, folder="characters"):
+    """
+    Yields storage names of every original image under a media folder,
+    skipping previously generated variants.
+    """
+    media_root = media_root or settings.MEDIA_ROOT
+    stack = [os.path.join(media_root, folder)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != VARIANT_DIR:
+                        stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.relpath(entry.path, media_root)
+
+
+def generate_all(names, media_root=None, workers=None, force=False):
+    """
+    Generates variants for many images across a process pool.
+
+    Args:
+        names (Iterable[str]): Storage names of the original images.
+        media_root (str): Root folder of the media files, defaults to MEDIA_ROOT.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        force (bool): Regenerate variants even if they are up to date.
+
+    Yields:
+        tuple: (name, list of written variant names, error message or None).
+    """
+    media_root = media_root or settings.MEDIA_ROOT
+    jobs = ((name, media_root, force) for name in names)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_generate_job, jobs, chunksize=16)
+
+
+def render_variants(names, stderr, media_root=None, workers=None, force=False):
+    """
+    Generates variants for many images with ``generate_all``, reports the
+    images that failed on ``stderr`` and records the others for the
+    characters using them, which bulk writes skipping ``post_save`` need.
+
+    Args:
+        names (Iterable[str]): Storage names of the original images.
+        stderr: Object with a ``write`` method, e.g. a command's ``stderr``.
+        media_root (str): Root folder of the media files, defaults to MEDIA_ROOT.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        force (bool): Regenerate variants even if they are up to date.
+
+    Returns:
+        tuple: (number of variants written, number of images that failed,
+        number of characters whose variants were recorded).
+    """
+    # Imported here because bulk imports memory, which imports this module.
+    from .bulk import record_variants
+
+    written = failed = 0
+    done = []
+    for name, variants, error in generate_all(names, media_root, workers, force):
+        if error:
+            failed += 1
+            stderr.write(f"Could not generate variants for {name}: {error}")
+        else:
+            done.append(name.replace("\\", "/"))
+        written += len(variants)
+    return written, failed, record_variants(done)
@@ -0,0 +1,375 @@
+"""
+Bulk ingest engine for character datasets.
+
+Loads character entries (as produced by the scraper and stored in
+``scraper/cleaned_characters.jsonc``) with a constant number of queries per
+batch: existing names are preloaded into dicts, new rows are written with
+``bulk_create`` and changed rows with ``bulk_update``, all inside a single
+transaction.
+
+``sync`` is the differential variant: it hashes every entry, compares it with
+the hash stored on the character and only rewrites characters whose entry
+changed, deleting characters that are no longer in the dataset.
+"""
+
+import hashlib
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .memory import bump_version
+from .models import (
+    Affiliation,
+    Alias,
+    Character,
+    CharacterAffiliation,
+    CharacterQuirk,
+    Quirk,
+)
+from .storage import ContentAddressedStorage, SourceIndex
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def normalize_aliases(entry):
+    """
+    Returns the cleaned alias names of an entry, accepting both plain strings
+    and ``{"name": ...}`` objects.
+    """
+    aliases = []
+    for alias_entry in entry.get("aliases", []):
+        if isinstance(alias_entry, str):
+            aliases.append(alias_entry.strip())
+        elif isinstance(alias_entry, dict) and isinstance(alias_entry.get("name"), str):
+            aliases.append(alias_entry["name"].strip())
+        else:
+            print(
+                f"⚠️ Skipped unrecognized alias format for {entry['name']}: {alias_entry}"
+            )
+    return aliases
+
+
+def entry_hash(entry):
+    """
+    Returns a stable hash of everything an entry writes to the database, so
+    formatting changes in the source file do not count as changes.
+    """
+    canonical = {
+        "name": entry["name"],
+        "url": entry["url"],
+        "kanji": entry.get("kanji", ""),
+        "image": entry.get("image", ""),
+        "aliases": normalize_aliases(entry),
+        "quirks": [q["name"] for q in entry.get("quirks", [])],
+        "affiliations": [
+            [a["name"], a.get("note", "")] for a in entry.get("affiliations", [])
+        ],
+    }
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def batched(iterable, size):
+    """Yields lists of up to ``size`` items from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _ensure_names(model, names, by_name):
+    """
+    Creates the missing rows of a name-keyed lookup model and records their
+    ids in ``by_name``. Returns the number of rows created.
+    """
+    missing = {name for name in names if name not in by_name}
+    if not missing:
+        return 0
+    model.objects.bulk_create(
+        [model(name=name) for name in missing], ignore_conflicts=True
+    )
+    by_name.update(model.objects.filter(name__in=missing).values_list("name", "id"))
+    return len(missing)
+
+
+class Ingestor:
+    """
+    Writes batches of character entries to the database.
+
+    The name -> id lookups for characters, quirks and affiliations are loaded
+    once and kept up to date as rows are created, so each batch only issues
+    the bulk statements it needs.
+
+    By default existing quirk and affiliation links are kept, like the
+    original get_or_create seeder. With ``replace=True`` the links of every
+    written character are rebuilt from its entry, so removals and reorders
+    are applied, and the entry hash is stored for later syncs.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, media_root=None, replace=False):
+        self.batch_size = batch_size
+        self.replace = replace
+        self.media_root = media_root or settings.MEDIA_ROOT
+        self.sources = SourceIndex(ContentAddressedStorage(location=self.media_root))
+        self.characters = dict(Character.objects.values_list("name", "id"))
+        self.quirks = dict(Quirk.objects.values_list("name", "id"))
+        self.affiliations = dict(Affiliation.objects.values_list("name", "id"))
+        self.images = set()
+        self.stats = {
+            "entries": 0,
+            "characters_created": 0,
+            "characters_updated": 0,
+            "aliases": 0,
+            "quirks_created": 0,
+            "affiliations_created": 0,
+            "character_quirks": 0,
+            "character_affiliations": 0,
+        }
+
+    def image_name(self, entry):
+        """
+        Returns the content-addressed storage name of an entry's image if the
+        source file exists under MEDIA_ROOT. Sources are linked into the store
+        rather than copied, and unchanged sources cost a single stat call.
+        """
+        image_path = entry.get("image", "")
+        if not image_path:
+            return None
+        try:
+            return self.sources.store(image_path)
+        except FileNotFoundError:
+            return None
+
+    def ingest_batch(self, entries):
+        """
+        Upserts one batch of entries along with their aliases, quirks and
+        affiliations.
+        """
+        # Later duplicates of a name win, matching the old per-row seeder.
+        entries = list({entry["name"]: entry for entry in entries}.values())
+        self.stats["entries"] += len(entries)
+
+        self.stats["quirks_created"] += _ensure_names(
+            Quirk,
+            (q["name"] for e in entries for q in e.get("quirks", [])),
+            self.quirks,
+        )
+        self.stats["affiliations_created"] += _ensure_names(
+            Affiliation,
+            (a["name"] for e in entries for a in e.get("affiliations", [])),
+            self.affiliations,
+        )
+
+        self._upsert_characters(entries)
+        ids = [self.characters[entry["name"]] for entry in entries]
+
+        Alias.objects.filter(character_id__in=ids).delete()
+        if self.replace:
+            CharacterQuirk.objects.filter(character_id__in=ids).delete()
+            CharacterAffiliation.objects.filter(character_id__in=ids).delete()
+        aliases = Alias.objects.bulk_create(
+            [
+                Alias(name=alias, character_id=self.characters[entry["name"]])
+                for entry in entries
+                for alias in normalize_aliases(entry)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.stats["aliases"] += len(aliases)
+
+        self._link_quirks(entries, ids)
+        self._link_affiliations(entries, ids)
+
+    def _upsert_characters(self, entries):
+        created, updated, image_updates = [], [], []
+        for entry in entries:
+            char = Character(
+                id=self.characters.get(entry["name"]),
+                name=entry["name"],
+                url=entry["url"],
+                kanji=entry.get("kanji", ""),
+                # Merged links may not match the entry, so only replace mode
+                # can vouch for the hash.
+                content_hash=entry_hash(entry) if self.replace else "",
+            )
+            image = self.image_name(entry)
+            if image:
+                char.image = image
+                self.images.add(image)
+                if char.id:
+                    image_updates.append(char)
+            (updated if char.id else created).append(char)
+
+        if created:
+            Character.objects.bulk_create(created, batch_size=self.batch_size)
+            if any(char.id is None for char in created):
+                # Backends that cannot return ids from bulk inserts.
+                names = [char.name for char in created]
+                self.characters.update(
+                    Character.objects.filter(name__in=names).values_list("name", "id")
+                )
+            else:
+                self.characters.update((char.name, char.id) for char in created)
+        if updated:
+            Character.objects.bulk_update(
+                updated, ["url", "kanji", "content_hash"], batch_size=self.batch_size
+            )
+        # Entries whose image file is missing keep their current image.
+        if image_updates:
+            Character.objects.bulk_update(
+                image_updates, ["image"], batch_size=self.batch_size
+            )
+
+        self.stats["characters_created"] += len(created)
+        self.stats["characters_updated"] += len(updated)
+
+    def _link_quirks(self, entries, ids):
+        existing = set(
+            CharacterQuirk.objects.filter(character_id__in=ids).values_list(
+                "character_id", "quirk_id"
+            )
+        )
+        links = []
+        for entry in entries:
+            char_id = self.characters[entry["name"]]
+            for idx, q in enumerate(entry.get("quirks", [])):
+                key = (char_id, self.quirks[q["name"]])
+                if key not in existing:
+                    existing.add(key)
+                    links.append(
+                        CharacterQuirk(character_id=key[0], quirk_id=key[1], order=idx)
+                    )
+        CharacterQuirk.objects.bulk_create(links, batch_size=self.batch_size)
+        self.stats["character_quirks"] += len(links)
+
+    def _link_affiliations(self, entries, ids):
+        existing = set(
+            CharacterAffiliation.objects.filter(character_id__in=ids).values_list(
+                "character_id", "affiliation_id"
+            )
+        )
+        links = []
+        for entry in entries:
+            char_id = self.characters[entry["name"]]
+            for idx, aff in enumerate(entry.get("affiliations", [])):
+                key = (char_id, self.affiliations[aff["name"]])
+                if key not in existing:
+                    existing.add(key)
+                    links.append(
+                        CharacterAffiliation(
+                            character_id=key[0],
+                            affiliation_id=key[1],
+                            note=aff.get("note", ""),
+                            order=idx,
+                        )
+                    )
+        CharacterAffiliation.objects.bulk_create(links, batch_size=self.batch_size)
+        self.stats["character_affiliations"] += len(links)
+
+
+def ingest(entries, batch_size=DEFAULT_BATCH_SIZE, media_root=None):
+    """
+    Bulk loads character entries inside a single transaction.
+
+    Args:
+        entries (Iterable[dict]): Character entries, consumed in batches.
+        batch_size (int): Number of entries written per batch.
+        media_root (str): Root folder of the media files, defaults to MEDIA_ROOT.
+
+    Returns:
+        dict: Row counts, the referenced image names under ``images``, the
+        elapsed ``seconds`` and the overall ``rows_per_second``.
+    """
+    start = time.perf_counter()
+    with transaction.atomic():
+        ingestor = Ingestor(batch_size, media_root)
+        for batch in batched(entries, batch_size):
+            ingestor.ingest_batch(batch)
+        bump_version()
+    ingestor.sources.save()
+
+    stats = dict(ingestor.stats)
+    elapsed = time.perf_counter() - start
+    rows = sum(v for k, v in stats.items() if k != "entries")
+    stats["images"] = ingestor.images
+    stats["seconds"] = elapsed
+    stats["rows_per_second"] = rows / elapsed if elapsed else 0.0
+    return stats
+
+
+def sync(entries, batch_size=DEFAULT_BATCH_SIZE, media_root=None, delete_missing=True):
+    """
+    Applies only the differences between a dataset and the database.
+
+    Entries whose hash matches the one stored on their character are skipped.
+    Changed and new entries are written in replace mode, and characters
+    missing from the dataset are deleted, all inside a single transaction.
+
+    Args:
+        entries (Iterable[dict]): Character entries, consumed in batches.
+        batch_size (int): Number of changed entries written per batch.
+        media_root (str): Root folder of the media files, defaults to MEDIA_ROOT.
+        delete_missing (bool): Delete characters that are not in the dataset.
+
+    Returns:
+        dict: Names under ``inserted``, ``updated``, ``deleted`` and the
+        ``unchanged`` count, plus ``images``, ``seconds`` and ingest stats.
+    """
+    start = time.perf_counter()
+    inserted, updated, unchanged = [], [], 0
+
+    with transaction.atomic():
+        stored = {
+            name: (pk, content_hash)
+            for pk, name, content_hash in Character.objects.values_list(
+                "pk", "name", "content_hash"
+            )
+        }
+        ingestor = None
+        seen = set()
+        pending = []
+
+        def flush():
+            nonlocal ingestor
+            if ingestor is None:
+                ingestor = Ingestor(batch_size, media_root, replace=True)
+            ingestor.ingest_batch(pending)
+            pending.clear()
+
+        for entry in entries:
+            name = entry["name"]
+            seen.add(name)
+            current = stored.get(name)
+            if current and current[1] == entry_hash(entry):
+                unchanged += 1
+                continue
+            (updated if current else inserted).append(name)
+            pending.append(entry)
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+
+        deleted = []
+        if delete_missing:
+            missing = [(name, pk) for name, (pk, _) in stored.items() if name not in seen]
+            for batch in batched(missing, batch_size):
+                Character.objects.filter(pk__in=[pk for _, pk in batch]).delete()
+                deleted.extend(name for name, _ in batch)
+        if inserted or updated or deleted:
+            bump_version()
+
+    if ingestor:
+        ingestor.sources.save()
+    stats = dict(ingestor.stats) if ingestor else {}
+    stats.update(
+        inserted=inserted,
+        updated=updated,
+        deleted=deleted,
+        unchanged=unchanged,
+        images=ingestor.images if ingestor else set(),
+        seconds=time.perf_counter() - start,
+    )
+    return stats
@@ -0,0 +1,146 @@
+"""
+Streaming readers for character dataset files.
+
+``iter_entries`` yields one character entry at a time from either a JSONC
+file holding a top-level array (the format of
+``scraper/cleaned_characters.jsonc``) or an NDJSON file with one entry per
+line, so memory stays bounded by the size of a single entry.
+"""
+
+import json
+import re
+
+# Strings first, so comment markers and brackets inside them are left alone.
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|//|/\*|[\[\]{},]')
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+
+class JSONCError(ValueError):
+    """Raised when a JSONC file is not a well-formed top-level array."""
+
+
+def iter_jsonc_array(lines):
+    """
+    Yields the elements of a JSONC top-level array one at a time.
+
+    Comments (``//`` and ``/* */``) are stripped by a tokenizer that knows
+    about string literals, and trailing commas are accepted. JSON strings
+    cannot contain raw newlines, so only block comments carry state across
+    lines.
+
+    Args:
+        lines (Iterable[str]): Lines of the file, e.g. an open file object.
+
+    Yields:
+        The decoded array elements.
+
+    Raises:
+        JSONCError: If the input is not an array or is truncated.
+    """
+    depth = 0
+    in_comment = False
+    current = []
+    finished = False
+
+    for lineno, line in enumerate(lines, 1):
+        pos = 0
+        if in_comment:
+            end = line.find("*/")
+            if end == -1:
+                continue
+            in_comment = False
+            pos = end + 2
+
+        while True:
+            match = _TOKEN.search(line, pos)
+            if match is None:
+                if depth:
+                    current.append(line[pos:])
+                elif line[pos:].strip():
+                    raise JSONCError(f"Unexpected content on line {lineno}")
+                break
+
+            token = match.group()
+            start = match.start()
+            if depth:
+                current.append(line[pos:start])
+            elif line[pos:start].strip():
+                raise JSONCError(f"Unexpected content on line {lineno}")
+            pos = match.end()
+
+            if token == "//":
+                if depth:
+                    current.append("\n")
+                break
+            if token == "/*":
+                end = line.find("*/", pos)
+                if end == -1:
+                    in_comment = True
+                    break
+                pos = end + 2
+                continue
+
+            if finished:
+                raise JSONCError(f"Unexpected content after the array on line {lineno}")
+            if depth == 0:
+                if token != "[":
+                    raise JSONCError("Expected the file to contain a JSON array")
+                depth = 1
+                continue
+
+            if depth == 1 and token in ",]":
+                element = "".join(current).strip()
+                current = []
+                if element:
+                    yield _decode(element, lineno)
+                elif token == ",":
+                    raise JSONCError(f"Empty array element on line {lineno}")
+                if token == "]":
+                    depth = 0
+                    finished = True
+                continue
+
+            if token in "[{":
+                depth += 1
+            elif token in "]}":
+                depth -= 1
+            current.append(token)
+
+    if not finished:
+        raise JSONCError("Unexpected end of file inside the array")
+
+
+def _decode(element, lineno):
+    try:
+        return json.loads(element)
+    except json.JSONDecodeError as e:
+        raise JSONCError(f"Invalid array element ending on line {lineno}: {e}") from e
+
+
+def iter_ndjson(lines):
+    """
+    Yields one decoded entry per non-blank line of an NDJSON file.
+    """
+    for lineno, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise JSONCError(f"Invalid NDJSON on line {lineno}: {e}") from e
+
+
+def iter_entries(path):
+    """
+    Streams the character entries of a JSONC or NDJSON (``.ndjson``/``.jsonl``)
+    dataset file.
+
+    Args:
+        path (str): Path to the dataset file.
+
+    Yields:
+        dict: One character entry at a time.
+    """
+    reader = iter_ndjson if str(path).endswith(NDJSON_SUFFIXES) else iter_jsonc_array
+    with open(path, encoding="utf-8") as f:
+        yield from reader(f)
@@ -0,0 +1,167 @@
+"""
+Management command to garbage-collect orphaned media files.
+
+Files whose character was deleted or re-seeded are never removed by the
+app, so the media directory only grows. This command loads every referenced
+name (character images, their generated variants and the dataset sources
+tracked by the seeder's source index) into a set, walks MEDIA_ROOT once and
+deletes or quarantines whatever is not referenced, in batches.
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from characters.images import variant_names
+from characters.models import Character
+from characters.storage import ContentAddressedStorage, SourceIndex, iter_files
+
+QUARANTINE_DIR = ".quarantine"
+
+
+def referenced_names(media_root):
+    """
+    Returns the set of media names that must be kept: every character image,
+    its variants, and the source files and stored names in the source index.
+    """
+    referenced = set()
+    images = Character.objects.exclude(image="").values_list("image", flat=True)
+    for name in images.iterator():
+        referenced.add(name)
+        referenced.update(v.replace("\\", "/") for v in variant_names(name))
+
+    sources = SourceIndex(ContentAddressedStorage(location=media_root))
+    for source, (_, _, stored) in sources.entries.items():
+        referenced.add(source)
+        referenced.add(stored)
+    return referenced
+
+
+def find_orphans(media_root, referenced, min_age):
+    """
+    Yields ``(name, size)`` for every unreferenced file under ``media_root``
+    that was last modified at least ``min_age`` seconds ago. Only orphans are
+    stat'ed, so the walk costs one scandir per folder.
+    """
+    cutoff = time.time() - min_age
+    for name in iter_files(media_root):
+        if name in referenced:
+            continue
+        try:
+            st = os.stat(os.path.join(media_root, name))
+        except FileNotFoundError:
+            continue
+        if st.st_mtime <= cutoff:
+            yield name, st.st_size
+
+
+def format_size(size):
+    """Returns a human readable byte count."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class Command(BaseCommand):
+    """
+    Command to delete or quarantine media files no character references.
+
+    Supports --dry-run to only report, --quarantine to move files aside
+    instead of deleting them, --min-age to spare files that may belong to an
+    upload still in progress, and --batch-size for the removal batches.
+    """
+
+    help = "Delete or quarantine media files that no character references."
+
+    def add_arguments(self, parser):
+        """
+        Adds optional command-line arguments for this command.
+
+        --dry-run: Only report what would be removed.
+        --quarantine: Move orphans under MEDIA_ROOT/.quarantine/<timestamp>/.
+        --min-age: Skip files modified in the last N seconds.
+        --batch-size: Number of files removed per batch.
+        """
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report unreferenced files without removing them.",
+        )
+        parser.add_argument(
+            "--quarantine",
+            action="store_true",
+            help="Move unreferenced files to MEDIA_ROOT/.quarantine instead of deleting.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Only remove files older than this many seconds (default: 3600).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of files removed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Collects the referenced set, walks the media root and removes orphans.
+        """
+        media_root = str(settings.MEDIA_ROOT)
+        dry_run = options["dry_run"]
+        start = time.perf_counter()
+
+        referenced = referenced_names(media_root)
+        self.stdout.write(f"{len(referenced)} referenced media names.")
+
+        target = None
+        if options["quarantine"] and not dry_run:
+            target = os.path.join(
+                media_root, QUARANTINE_DIR, time.strftime("%Y%m%d-%H%M%S")
+            )
+
+        count = reclaimed = 0
+        batch = []
+        for name, size in find_orphans(media_root, referenced, options["min_age"]):
+            count += 1
+            reclaimed += size
+            if options["verbosity"] > 1 or dry_run:
+                self.stdout.write(
+                    f"{'[Dry Run] Would remove' if dry_run else 'Removing'} {name}"
+                )
+            if not dry_run:
+                batch.append(name)
+                if len(batch) >= options["batch_size"]:
+                    self.remove(media_root, batch, target)
+                    batch = []
+        if batch:
+            self.remove(media_root, batch, target)
+
+        elapsed = time.perf_counter() - start
+        if dry_run:
+            action = "Would remove"
+        else:
+            action = "Quarantined" if target else "Deleted"
+        self.stdout.write(
+            f"{action} {count} unreferenced files, "
+            f"{format_size(reclaimed)} reclaimed, in {elapsed:.2f}s."
+        )
+
+    def remove(self, media_root, names, target):
+        """Deletes a batch of files, or moves them under ``target``."""
+        for name in names:
+            path = os.path.join(media_root, name)
+            try:
+                if target:
+                    destination = os.path.join(target, name)
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    os.replace(path, destination)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
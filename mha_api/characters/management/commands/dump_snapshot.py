@@ -0,0 +1,50 @@
+"""
+Management command to write a compact binary snapshot of the character data.
+
+The snapshot can be restored with ``load_snapshot`` to bring up a new
+environment without running the seeder.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from characters.snapshot import dump
+
+
+class Command(BaseCommand):
+    """
+    Command to dump characters, aliases, quirks, affiliations and their
+    ordered links to a single checksummed file.
+    """
+
+    help = "Write a compact binary snapshot of the character data."
+
+    def add_arguments(self, parser):
+        """
+        Adds command-line arguments for this command.
+
+        path: Output file (default: characters.snapshot).
+        """
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="characters.snapshot",
+            help="Output snapshot file.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Writes the snapshot and reports its size, row counts and checksum.
+        """
+        start = time.perf_counter()
+        stats = dump(options["path"])
+        elapsed = time.perf_counter() - start
+
+        size, sha256 = stats.pop("size"), stats.pop("sha256")
+        for table, count in stats.items():
+            self.stdout.write(f"  {table}: {count}")
+        self.stdout.write(
+            f"Wrote {options['path']} ({size} bytes, sha256 {sha256[:12]}) "
+            f"in {elapsed:.2f}s."
+        )
@@ -0,0 +1,157 @@
+"""
+Management command to generate a synthetic character dataset.
+
+Writes a reproducible, production-sized dataset (see
+``characters.synthetic``) through the bulk ingest path, the staging import,
+or to an NDJSON file for ``import_characters`` and ``seed_characters.py``,
+so benchmarks and query plans can be checked at scale.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from characters.images import render_variants
+from characters.ingest import DEFAULT_BATCH_SIZE, ingest
+from characters.staging import import_entries
+from characters.synthetic import generate_entries, write_placeholders
+
+
+class Command(BaseCommand):
+    """
+    Command to generate synthetic characters.
+
+    Supports --characters, --aliases, --quirks and --affiliations to set the
+    scale, --zipf for the skew of quirk and affiliation membership, --images
+    for placeholder images, --staging to load through staging tables and
+    --output to write the entries to a file instead of the database.
+    """
+
+    help = "Generate a synthetic character dataset at a configurable scale."
+
+    def add_arguments(self, parser):
+        """
+        Adds command-line arguments for this command.
+
+        --characters: Number of characters.
+        --aliases: Total number of aliases.
+        --quirks: Number of distinct quirks.
+        --affiliations: Number of distinct affiliations.
+        --zipf: Zipf exponent of quirk and affiliation popularity.
+        --images: Number of distinct placeholder images (0 for none).
+        --seed: Seed of the random generator.
+        --batch-size: Entries written per bulk batch.
+        --staging: Load through the parallel staging-table import.
+        --output: Write NDJSON to this file instead of the database.
+        """
+        parser.add_argument(
+            "--characters", type=int, default=100_000, help="Number of characters."
+        )
+        parser.add_argument(
+            "--aliases",
+            type=int,
+            default=None,
+            help="Total number of aliases (default: 5 per character).",
+        )
+        parser.add_argument(
+            "--quirks",
+            type=int,
+            default=None,
+            help="Number of distinct quirks (default: 1 per 20 characters).",
+        )
+        parser.add_argument(
+            "--affiliations",
+            type=int,
+            default=None,
+            help="Number of distinct affiliations (default: 1 per 50 characters).",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of quirk and affiliation membership.",
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=0,
+            help="Number of distinct placeholder images to assign (default: none).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random generator."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of characters written per bulk batch.",
+        )
+        parser.add_argument(
+            "--staging",
+            action="store_true",
+            help="Load through staging tables (import_characters) instead.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the entries to this NDJSON file instead of the database.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Generates the entries and writes them to the database or a file.
+        """
+        start = time.perf_counter()
+        images = []
+        if options["images"]:
+            images = write_placeholders(settings.MEDIA_ROOT, options["images"])
+        entries = generate_entries(
+            options["characters"],
+            aliases=options["aliases"],
+            quirks=options["quirks"],
+            affiliations=options["affiliations"],
+            exponent=options["zipf"],
+            images=images,
+            seed=options["seed"],
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.stdout.write(
+                f"Wrote {options['characters']} entries to {options['output']} "
+                f"in {time.perf_counter() - start:.2f}s."
+            )
+            return
+
+        if options["staging"]:
+            result = import_entries(entries, chunk_size=options["batch_size"])
+            for phase, seconds in result["timings"].items():
+                self.stdout.write(f"  {phase:<8} {seconds:8.3f}s")
+            self.stdout.write(
+                f"Imported {result['staged']} entries "
+                f"({result['inserted']} inserted, {result['updated']} updated)."
+            )
+        else:
+            result = ingest(entries, batch_size=options["batch_size"])
+            self.stdout.write(
+                f"Ingested {result['entries']} characters "
+                f"({result['characters_created']} created, "
+                f"{result['characters_updated']} updated), "
+                f"{result['aliases']} aliases, "
+                f"{result['quirks_created']} quirks, "
+                f"{result['affiliations_created']} affiliations, "
+                f"{result['character_quirks']} quirk links, "
+                f"{result['character_affiliations']} affiliation links "
+                f"({result['rows_per_second']:.0f} rows/s)."
+            )
+
+        # Bulk writes skip post_save, so render image variants in one pass.
+        if settings.IMAGE_VARIANTS_ON_SAVE and result["images"]:
+            render_variants(sorted(result["images"]), self.stderr)
+        self.stdout.write(
+            f"Generated {options['characters']} characters "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
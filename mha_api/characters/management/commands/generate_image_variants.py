@@ -0,0 +1,68 @@
+"""
+Management command to generate thumbnail and WebP variants of character images.
+
+Scans the media directory for original images, renders every missing or
+stale variant across a pool of worker processes and records the images whose
+variants are complete, which is what the API checks before linking them.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from characters.images import VARIANTS, find_images, render_variants
+
+
+class Command(BaseCommand):
+    """
+    Command to (re)generate image variants for the whole media directory.
+
+    Supports --workers to size the process pool and --force to rebuild
+    variants that are already up to date.
+    """
+
+    help = "Generate thumbnail and WebP variants for all character images."
+
+    def add_arguments(self, parser):
+        """
+        Adds optional command-line arguments for this command.
+
+        --workers: Number of worker processes (defaults to the CPU count).
+        --force: Regenerate variants even if they are up to date.
+        """
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: CPU count).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants even if they are up to date.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Executes the variant generation and reports a summary.
+        """
+        start = time.perf_counter()
+        names = list(find_images(settings.MEDIA_ROOT))
+        self.stdout.write(
+            f"Processing {len(names)} images into variants: {', '.join(VARIANTS)}"
+        )
+
+        written, failed, recorded = render_variants(
+            names,
+            self.stderr,
+            settings.MEDIA_ROOT,
+            options["workers"],
+            options["force"],
+        )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Wrote {written} variants for {len(names)} images "
+            f"({failed} failed) in {elapsed:.2f}s, used by {recorded} characters."
+        )
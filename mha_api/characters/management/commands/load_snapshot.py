@@ -0,0 +1,53 @@
+"""
+Management command to restore the character data from a binary snapshot
+written by ``dump_snapshot``.
+
+Existing character data is replaced. Media files are not part of the
+snapshot and must be restored separately.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from characters.snapshot import SnapshotError, load
+
+
+class Command(BaseCommand):
+    """
+    Command to verify a snapshot and bulk load it in a single transaction.
+    """
+
+    help = "Replace the character data with the contents of a snapshot."
+
+    def add_arguments(self, parser):
+        """
+        Adds command-line arguments for this command.
+
+        path: Snapshot file (default: characters.snapshot).
+        --batch-size: Rows per bulk insert.
+        """
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="characters.snapshot",
+            help="Snapshot file to load.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rows per bulk insert.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Loads the snapshot and reports row counts and the elapsed time.
+        """
+        try:
+            stats = load(options["path"], batch_size=options["batch_size"])
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e)) from e
+
+        seconds = stats.pop("seconds")
+        for table, count in stats.items():
+            self.stdout.write(f"  {table}: {count}")
+        self.stdout.write(f"Loaded {options['path']} in {seconds:.3f}s.")
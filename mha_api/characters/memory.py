@@ -0,0 +1,221 @@
+"""
+Read-only in-memory copy of the character graph.
+
+With ``CHARACTERS_IN_MEMORY`` enabled, each worker loads every character,
+alias, quirk and affiliation once (four queries) into ``__slots__`` records
+with an index by id and a trigram index for searches, and the list and detail
+views are answered without a database round trip.
+
+Writers bump a dataset version stored in the cache. Workers compare it with
+the version they loaded at most every ``CHARACTERS_IN_MEMORY_CHECK_INTERVAL``
+seconds and rebuild the store when it changed, swapping the module-level
+reference in one assignment so concurrent requests always see a complete
+store. The cache must be shared between processes (see ``CACHES``) for bumps
+made by the seeder or admin to reach every worker; ``check --deploy`` fails
+without one.
+"""
+
+import threading
+import time
+import uuid
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .images import variant_name
+from .models import Alias, Character, CharacterAffiliation, CharacterQuirk
+
+VERSION_KEY = "characters:dataset-version"
+
+_store = None
+_lock = threading.Lock()
+
+
+def current_version():
+    """Returns the dataset version published in the cache, or None."""
+    return cache.get(VERSION_KEY)
+
+
+def bump_version():
+    """
+    Publishes a new dataset version once the current transaction commits, so
+    workers never reload a half-written dataset.
+    """
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+class CharacterRecord:
+    """
+    Immutable, pre-resolved character with relative media URLs.
+
+    Quirks are stored as a tuple of names, affiliations as ``(name, note)``
+    pairs and aliases as names, in the order the API returns them.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "kanji",
+        "url",
+        "image",
+        "image_small",
+        "image_webp",
+        "quirks",
+        "affiliations",
+        "aliases",
+        "search_terms",
+    )
+
+    def __init__(self, id, name, kanji, url, image, image_small, image_webp,
+                 quirks, affiliations, aliases):
+        self.id = id
+        self.name = name
+        self.kanji = kanji
+        self.url = url
+        self.image = image
+        self.image_small = image_small
+        self.image_webp = image_webp
+        self.quirks = quirks
+        self.affiliations = affiliations
+        self.aliases = aliases
+        self.search_terms = (name.lower(),) + tuple(a.lower() for a in aliases)
+
+    def matches(self, term):
+        """Case-insensitive substring match on the name or any alias."""
+        return any(term in text for text in self.search_terms)
+
+    def to_representation(self, request=None):
+        """Returns the same dict ``CharacterSerializer`` produces."""
+
+        def absolute(url):
+            if url is None or request is None:
+                return url
+            return request.build_absolute_uri(url)
+
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kanji": self.kanji,
+            "url": self.url,
+            "image": absolute(self.image),
+            "image_small": absolute(self.image_small),
+            "image_webp": absolute(self.image_webp),
+            "quirks": [{"name": name} for name in self.quirks],
+            "affiliations": [
+                {"name": name, "note": note} for name, note in self.affiliations
+            ],
+            "aliases": [{"name": name} for name in self.aliases],
+        }
+
+
+def trigrams(text):
+    """Returns the set of three-character substrings of ``text``."""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _variant_url(image, variants_image, variant):
+    if not image or image != variants_image:
+        return None
+    return default_storage.url(variant_name(image, variant))
+
+
+class CharacterStore:
+    """
+    The whole character graph, ordered by id, with an index by id and a
+    trigram index over the lowercased names and aliases.
+
+    The trigram index maps each trigram to the positions (in ``records``) of
+    the characters whose name or an alias contains it, so a search only
+    checks the characters holding every trigram of the term.
+    """
+
+    def __init__(self, records, version=None):
+        self.records = tuple(records)
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.by_id = {r.id: r for r in self.records}
+        by_trigram = defaultdict(lambda: array("L"))
+        for position, r in enumerate(self.records):
+            for gram in set().union(*map(trigrams, r.search_terms)):
+                by_trigram[gram].append(position)
+        # A plain dict, so lookups of unknown trigrams never mutate it.
+        self.by_trigram = dict(by_trigram)
+
+    @classmethod
+    def load(cls):
+        """Builds a store from the database with one query per table."""
+        version = current_version()
+        aliases = defaultdict(list)
+        for char_id, name in Alias.objects.order_by("id").values_list(
+            "character_id", "name"
+        ):
+            aliases[char_id].append(name)
+        quirks = defaultdict(list)
+        for char_id, name in CharacterQuirk.objects.order_by("order", "id").values_list(
+            "character_id", "quirk__name"
+        ):
+            quirks[char_id].append(name)
+        affiliations = defaultdict(list)
+        for char_id, name, note in CharacterAffiliation.objects.order_by(
+            "id"
+        ).values_list("character_id", "affiliation__name", "note"):
+            affiliations[char_id].append((name, note))
+
+        records = []
+        rows = Character.objects.order_by("id").values_list(
+            "id", "name", "kanji", "url", "image", "variants_image"
+        )
+        for pk, name, kanji, url, image, variants_image in rows:
+            records.append(
+                CharacterRecord(
+                    pk,
+                    name,
+                    kanji,
+                    url,
+                    default_storage.url(image) if image else None,
+                    _variant_url(image, variants_image, "small"),
+                    _variant_url(image, variants_image, "webp"),
+                    tuple(quirks.get(pk, ())),
+                    tuple(affiliations.get(pk, ())),
+                    tuple(aliases.get(pk, ())),
+                )
+            )
+        return cls(records, version)
+
+    def search(self, term=None):
+        """Returns records whose name or an alias contains ``term``, by id."""
+        if not term:
+            return self.records
+        term = term.lower()
+        if len(term) < 3:
+            return [r for r in self.records if r.matches(term)]
+        postings = sorted(
+            (self.by_trigram.get(gram, ()) for gram in trigrams(term)), key=len
+        )
+        candidates = set(postings[0]).intersection(*postings[1:])
+        records = (self.records[position] for position in sorted(candidates))
+        return [r for r in records if r.matches(term)]
+
+
+def get_store():
+    """
+    Returns the current store, loading it on first use and reloading it when
+    the published dataset version changed since the last check.
+    """
+    global _store
+    store = _store
+    interval = settings.CHARACTERS_IN_MEMORY_CHECK_INTERVAL
+    if store is not None and time.monotonic() - store.checked_at < interval:
+        return store
+    if store is not None and current_version() == store.version:
+        store.checked_at = time.monotonic()
+        return store
+
+    with _lock:
+        if _store is store:
+            _store = CharacterStore.load()
+        return _store
@@ -0,0 +1,47 @@
+"""
+Trigram indexes for the admin and API searches on Postgres.
+
+``icontains`` lookups compile to ``UPPER(column::text) LIKE UPPER(%s)``,
+which a GIN ``gin_trgm_ops`` index on the same expression can serve instead
+of scanning the table. Other databases have no equivalent, so the operations
+do nothing there.
+"""
+
+from django.db import migrations
+
+INDEXES = [
+    ("characters_character_name_trgm", "characters_character", "name"),
+    ("characters_character_kanji_trgm", "characters_character", "kanji"),
+    ("characters_alias_name_trgm", "characters_alias", "name"),
+    ("characters_quirk_name_trgm", "characters_quirk", "name"),
+    ("characters_affiliation_name_trgm", "characters_affiliation", "name"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index}" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0002_character_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0003_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='variants_image',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=100),
+        ),
+    ]
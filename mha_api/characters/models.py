@@ -33,6 +33,15 @@ class Character(models.Model):
     kanji = models.CharField(max_length=100, blank=True)
     url = models.URLField(blank=True, null=True)
     image = models.ImageField(upload_to="characters/", blank=True)
+    # Hash of the dataset entry this character was last synced from, used to
+    # skip unchanged characters when re-seeding. Blank after manual edits.
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Image the variants in MEDIA_ROOT were last rendered from. Variants are
+    # only linked while it matches ``image``, so serving them never has to
+    # ask the storage whether they exist.
+    variants_image = models.CharField(
+        max_length=100, blank=True, editable=False, default="", db_default=""
+    )
 
     quirks = models.ManyToManyField(Quirk, through="CharacterQuirk")
     affiliations = models.ManyToManyField(Affiliation, through="CharacterAffiliation")
@@ -0,0 +1,45 @@
+"""
+Paginators for large tables.
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """
+    Returns the planner's row estimate for the table of an unfiltered
+    queryset, or None where there is none (SQLite, never analyzed tables).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts unfiltered querysets of more than ``threshold``
+    rows from the table statistics instead of a ``COUNT(*)``, which reads
+    every row. Filtered querysets (searches, list filters) and small tables
+    are counted exactly.
+    """
+
+    threshold = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,115 @@
+"""
+Query plan capture for regression tests.
+
+``record_queries`` collects the SQL a block of code runs, ``explain`` asks
+the database how it executes each statement (``EXPLAIN QUERY PLAN`` on
+SQLite, ``EXPLAIN (COSTS OFF)`` on Postgres) and ``full_scans`` lists the
+tables a plan reads in full. ``format_plans`` renders everything as stable
+text, so a plan that changes shows up as a readable diff against the
+expected plans stored in ``characters/plans/<vendor>.txt``.
+
+How often each statement runs is left out of the text: it depends on the
+page and the data, and the query-count budgets in the tests check it.
+"""
+
+import re
+from contextlib import contextmanager
+
+# Column lists and IN lists carry no plan information but make diffs noisy.
+_COLUMNS = re.compile(r'SELECT (DISTINCT )?"[^()]*?" FROM ')
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+@contextmanager
+def record_queries(connection):
+    """
+    Records the ``(sql, params)`` of every statement run on ``connection``
+    inside the block, with parameters kept apart so they can be explained.
+    """
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if not many:
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def normalize_sql(sql):
+    """Returns ``sql`` without column lists and with IN lists collapsed."""
+    sql = _COLUMNS.sub(lambda m: f"SELECT {m.group(1) or ''}... FROM ", sql)
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def explain(connection, sql, params):
+    """
+    Returns the plan of a statement as a list of lines.
+
+    SQLite plans are rendered as an indented tree of the ``EXPLAIN QUERY
+    PLAN`` rows; Postgres plans are the text format without costs, which
+    depend on statistics rather than on the plan's shape.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            depth = {0: -1}
+            lines = []
+            for node, parent, _, detail in cursor.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node] + detail)
+            return lines
+        if connection.vendor == "postgresql":
+            cursor.execute("EXPLAIN (COSTS OFF) " + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+    raise NotImplementedError(f"No plan support for {connection.vendor}")
+
+
+def full_scans(vendor, plan, tables):
+    """
+    Returns the tables among ``tables`` that a plan reads in full (subqueries
+    and temporary tables are not counted).
+    """
+    pattern = _SQLITE_SCAN if vendor == "sqlite" else _POSTGRES_SCAN
+    return {
+        m.group(1)
+        for line in plan
+        if (m := pattern.search(line.strip())) and m.group(1) in tables
+    }
+
+
+def capture_plans(connection, queries):
+    """
+    Explains each distinct statement in ``queries``.
+
+    Returns:
+        list[dict]: ``sql`` (normalized), ``count`` (times it ran), ``plan``
+        and ``full_scans``, in order of first execution.
+    """
+    tables = set(connection.introspection.table_names())
+    plans = {}
+    for sql, params in queries:
+        key = normalize_sql(sql)
+        if key in plans:
+            plans[key]["count"] += 1
+            continue
+        plan = explain(connection, sql, params)
+        plans[key] = {
+            "sql": key,
+            "count": 1,
+            "plan": plan,
+            "full_scans": full_scans(connection.vendor, plan, tables),
+        }
+    return list(plans.values())
+
+
+def format_plans(name, plans):
+    """Renders the plans of one scenario as text."""
+    lines = [f"## {name}"]
+    for entry in plans:
+        lines.append(entry["sql"])
+        lines.extend("    " + line for line in entry["plan"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,149 @@
+"""
+OpenAPI documentation for the character views.
+
+The summaries, parameters and large example payloads are attached through
+drf-spectacular view extensions instead of decorators in ``views.py``, so
+they are only imported when a schema is generated (by the ``spectacular``
+command at build time or the schema view as a fallback), never at worker
+startup. The module is loaded through ``DEFAULT_GENERATOR_CLASS``.
+"""
+
+from drf_spectacular.extensions import OpenApiViewExtension
+from drf_spectacular.generators import SchemaGenerator as BaseSchemaGenerator
+from drf_spectacular.utils import OpenApiExample, extend_schema, OpenApiParameter
+
+
+class SchemaGenerator(BaseSchemaGenerator):
+    """Default generator; importing this module registers the extensions."""
+
+
+class CharacterListSchema(OpenApiViewExtension):
+    """Documents the character list endpoint."""
+
+    target_class = "characters.views.CharacterList"
+
+    def view_replacement(self):
+        @extend_schema(
+            summary="List all characters",
+            description="Retrieve a list of My Hero Academia characters. You can filter results by name or alias using the `search` query parameter, e.g. `?search=Midoriya`.",
+            parameters=[
+                OpenApiParameter(
+                    name="search",
+                    description="Filter by name or alias",
+                    required=False,
+                    type=str,
+                ),
+            ],
+            examples=[
+                OpenApiExample(
+                    name="Character List Example",
+                    value=[
+                        {
+                            "id": 1,
+                            "name": "Izuku Midoriya",
+                            "kanji": "緑谷出久",
+                            "url": "https://myheroacademia.fandom.com/wiki/Izuku_Midoriya",
+                            "image": "http://localhost:8000/media/characters/izuku-midoriya_u8fpXbE.png",
+                            "quirks": [
+                                {"name": "Quirkless"},
+                                {"name": "One For All"},
+                                {"name": "Gearshift"},
+                                {"name": "Fa Jin"},
+                                {"name": "Danger Sense"},
+                                {"name": "Blackwhip"},
+                                {"name": "Smokescreen"},
+                                {"name": "Float"},
+                            ],
+                            "affiliations": [
+                                {"name": "Aldera Junior High", "note": "Formerly"},
+                                {"name": "U.A. High School", "note": ""},
+                            ],
+                            "aliases": [{"name": "Deku"}],
+                        },
+                        {
+                            "id": 148,
+                            "name": "Katsuki Bakugo",
+                            "kanji": "爆豪勝己",
+                            "url": "https://myheroacademia.fandom.com/wiki/Dynamight",
+                            "image": "http://localhost:8000/media/characters/katsuki-bakugo_U02fniw.png",
+                            "quirks": [{"name": "Explosion"}, {"name": "One For All"}],
+                            "affiliations": [
+                                {"name": "Aldera Junior High", "note": "Formerly"},
+                                {"name": "U.A. High School", "note": "Formerly"},
+                                {"name": "Endeavor Agency", "note": "Formerly"},
+                                {"name": "Genius Office", "note": "Formerly"},
+                            ],
+                            "aliases": [
+                                {"name": "Kacchan"},
+                                {"name": "Katchan"},
+                                {
+                                    "name": "Explosive Hero: Great Explosion Murder God Dynamight"
+                                },
+                            ],
+                        },
+                        {
+                            "id": 2,
+                            "name": "Shoto Todoroki",
+                            "kanji": "轟焦凍",
+                            "url": "https://myheroacademia.fandom.com/wiki/Shoto_Todoroki",
+                            "image": "http://localhost:8000/media/characters/shoto-todoroki_PPR4jCS.png",
+                            "quirks": [{"name": "Half-Cold Half-Hot"}],
+                            "affiliations": [
+                                {"name": "Corusan Middle School", "note": "Formerly"},
+                                {"name": "U.A. High School", "note": "Formerly"},
+                            ],
+                            "aliases": [{"name": "AirCon Hero: Shoto"}],
+                        },
+                    ],
+                    response_only=True,
+                )
+            ],
+        )
+        class Fixed(self.target_class):
+            pass
+
+        return Fixed
+
+
+class CharacterDetailSchema(OpenApiViewExtension):
+    """Documents the character detail endpoint."""
+
+    target_class = "characters.views.CharacterDetail"
+
+    def view_replacement(self):
+        @extend_schema(
+            summary="Retrieve a character by ID",
+            description="""Fetch detailed information for a single character, including quirks, affiliations, and aliases.""",
+            examples=[
+                OpenApiExample(
+                    name="Character Detail Example",
+                    value={
+                        "id": 1,
+                        "name": "Izuku Midoriya",
+                        "kanji": "緑谷出久",
+                        "url": "https://myheroacademia.fandom.com/wiki/Izuku_Midoriya",
+                        "image": "http://localhost:8000/media/characters/izuku-midoriya_u8fpXbE.png",
+                        "quirks": [
+                            {"name": "Quirkless"},
+                            {"name": "One For All"},
+                            {"name": "Gearshift"},
+                            {"name": "Fa Jin"},
+                            {"name": "Danger Sense"},
+                            {"name": "Blackwhip"},
+                            {"name": "Smokescreen"},
+                            {"name": "Float"},
+                        ],
+                        "affiliations": [
+                            {"name": "Aldera Junior High", "note": "Formerly"},
+                            {"name": "U.A. High School", "note": ""},
+                        ],
+                        "aliases": [{"name": "Deku"}],
+                    },
+                    response_only=True,
+                )
+            ],
+        )
+        class Fixed(self.target_class):
+            pass
+
+        return Fixed
@@ -1,5 +1,8 @@
+from django.core.files.storage import default_storage
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from .images import variant_name
 from .models import Character, CharacterAffiliation, Quirk, Affiliation, Alias
 
 
@@ -48,7 +51,8 @@ class CharacterAffiliationSerializer(serializers.ModelSerializer):
 class CharacterSerializer(serializers.ModelSerializer):
     """
     Serializer for Character model, returning nested quirks, affiliations, and aliases.
-    Includes an image and kanji field.
+    Includes an image and kanji field, plus URLs of the smaller image variants
+    (null until the variants have been generated).
     """
 
     quirks = serializers.SerializerMethodField()
@@ -57,11 +61,30 @@ class CharacterSerializer(serializers.ModelSerializer):
     )
     aliases = AliasSerializer(many=True, read_only=True)
     image = serializers.ImageField()
+    image_small = serializers.SerializerMethodField()
+    image_webp = serializers.SerializerMethodField()
 
     @extend_schema_field(QuirkSerializer(many=True))
     def get_quirks(self, obj):
-        queryset = obj.characterquirk_set.all().order_by("order")
-        return QuirkSerializer([cq.quirk for cq in queryset], many=True).data
+        # Sorted here rather than with order_by(), which would bypass the
+        # view's prefetch and query again for every character.
+        links = sorted(obj.characterquirk_set.all(), key=lambda cq: (cq.order, cq.id))
+        return QuirkSerializer([cq.quirk for cq in links], many=True).data
+
+    def _variant_url(self, obj, variant):
+        if not obj.image or obj.image.name != obj.variants_image:
+            return None
+        url = default_storage.url(variant_name(obj.image.name, variant))
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    @extend_schema_field(OpenApiTypes.URI)
+    def get_image_small(self, obj):
+        return self._variant_url(obj, "small")
+
+    @extend_schema_field(OpenApiTypes.URI)
+    def get_image_webp(self, obj):
+        return self._variant_url(obj, "webp")
 
     class Meta:
         model = Character
@@ -71,6 +94,8 @@ class CharacterSerializer(serializers.ModelSerializer):
             "kanji",
             "url",
             "image",
+            "image_small",
+            "image_webp",
             "quirks",
             "affiliations",
             "aliases",
@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .bulk import record_variants
+from .images import generate_variants
+from .memory import bump_version
+from .models import (
+    Affiliation,
+    Alias,
+    Character,
+    CharacterAffiliation,
+    CharacterQuirk,
+    Quirk,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Character)
+def clear_content_hash(sender, instance, **kwargs):
+    """
+    Forgets the dataset hash of a character saved outside the bulk ingest
+    path (e.g. edited in the admin), so the next sync rewrites it.
+    """
+    instance.content_hash = ""
+
+
+# Renders variants after the request that saved the image has responded.
+variant_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="variants")
+
+
+def render_image_variants(name):
+    """
+    Renders the missing or stale variants of an image and records them for
+    the characters using it.
+    """
+    try:
+        generate_variants(name)
+        record_variants([name])
+    except OSError as e:
+        logger.warning("Could not generate variants for %s: %s", name, e)
+    finally:
+        connections.close_all()  # This thread's connections only.
+
+
+@receiver(post_save, sender=Character)
+def refresh_image_variants(sender, instance, **kwargs):
+    """
+    Queues the rendering of the image variants of a character whose image
+    changed, once the save commits.
+
+    Until they are recorded the API serves the original image only.
+    """
+    if not getattr(settings, "IMAGE_VARIANTS_ON_SAVE", True):
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "image" not in update_fields:
+        return
+    if instance.image and instance.image.name != instance.variants_image:
+        name = instance.image.name
+        transaction.on_commit(
+            partial(variant_executor.submit, render_image_variants, name)
+        )
+
+
+def publish_dataset_change(sender, **kwargs):
+    """Tells in-memory serving workers to reload after a model write."""
+    bump_version()
+
+
+# Delete receivers disable Django's fast bulk deletes, so they are only
+# connected when the in-memory mode needs them.
+if getattr(settings, "CHARACTERS_IN_MEMORY", False):
+    models = (Affiliation, Alias, Character, CharacterAffiliation, CharacterQuirk, Quirk)
+    for model in models:
+        post_save.connect(publish_dataset_change, sender=model)
+        post_delete.connect(publish_dataset_change, sender=model)
@@ -0,0 +1,435 @@
+"""
+Parallel, partitioned import through staging tables.
+
+The dataset is split into chunks that worker processes load into staging
+tables, with ``COPY ... FROM STDIN`` on Postgres and batched ``executemany``
+elsewhere. The staged rows are then merged into the character tables with a
+handful of set-based statements inside one transaction. Merged characters
+get their entry hash stored, and their aliases, quirks and affiliations are
+rebuilt, exactly like ``ingest.sync`` does for changed entries.
+
+Every import names its staging tables after a random run id, so imports
+running at the same time never share or drop each other's tables.
+"""
+
+import csv
+import io
+import multiprocessing
+import time
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from .ingest import entry_hash, normalize_aliases
+from .memory import bump_version
+from .models import (
+    Affiliation,
+    Alias,
+    Character,
+    CharacterAffiliation,
+    CharacterQuirk,
+    Quirk,
+)
+from .storage import ContentAddressedStorage, SourceIndex
+
+STAGE_PREFIX = "characters_stage_"
+
+# Staging table name -> column definitions. Every row carries the sequence
+# number of its entry so that later duplicates of a name win.
+STAGING_TABLES = {
+    "character": [
+        ("seq", "bigint"),
+        ("name", "varchar(100)"),
+        ("kanji", "varchar(100)"),
+        ("url", "varchar(200)"),
+        ("image", "varchar(100)"),
+        ("content_hash", "varchar(64)"),
+    ],
+    "alias": [
+        ("seq", "bigint"),
+        ("character_name", "varchar(100)"),
+        ("name", "varchar(200)"),
+    ],
+    "quirk": [
+        ("seq", "bigint"),
+        ("character_name", "varchar(100)"),
+        ("name", "varchar(100)"),
+        ("position", "integer"),
+    ],
+    "affiliation": [
+        ("seq", "bigint"),
+        ("character_name", "varchar(100)"),
+        ("name", "varchar(100)"),
+        ("note", "varchar(50)"),
+        ("position", "integer"),
+    ],
+}
+
+
+def q(name):
+    """Quotes a table or column name for the default connection."""
+    return connection.ops.quote_name(name)
+
+
+def new_run():
+    """Returns a random id naming one import's staging tables."""
+    return uuid.uuid4().hex[:12]
+
+
+def stage_table(run, name):
+    """Returns the table (or index) name of one of a run's staging tables."""
+    return f"{STAGE_PREFIX}{run}_{name}"
+
+
+def is_postgres():
+    """Returns True when the default database is Postgres."""
+    return connection.vendor == "postgresql"
+
+
+def create_staging_tables(run):
+    """Creates a run's empty staging tables, unlogged on Postgres."""
+    unlogged = "UNLOGGED " if is_postgres() else ""
+    with connection.cursor() as cursor:
+        for name, columns in STAGING_TABLES.items():
+            table = q(stage_table(run, name))
+            cols = ", ".join(f"{q(col)} {kind}" for col, kind in columns)
+            cursor.execute(f"CREATE {unlogged}TABLE {table} ({cols})")
+
+
+def drop_staging_tables(run):
+    """Drops a run's staging tables."""
+    with connection.cursor() as cursor:
+        for name in list(STAGING_TABLES) + ["latest"]:
+            cursor.execute(f"DROP TABLE IF EXISTS {q(stage_table(run, name))}")
+
+
+def entry_rows(seq, entry, image):
+    """
+    Flattens one entry into staging rows.
+
+    Returns:
+        dict: Staging table name mapped to a list of row tuples.
+    """
+    name = entry["name"]
+    return {
+        "character": [
+            (seq, name, entry.get("kanji", ""), entry["url"], image or "",
+             entry_hash(entry))
+        ],
+        "alias": [(seq, name, alias) for alias in normalize_aliases(entry)],
+        "quirk": [
+            (seq, name, quirk["name"], idx)
+            for idx, quirk in enumerate(entry.get("quirks", []))
+        ],
+        "affiliation": [
+            (seq, name, aff["name"], aff.get("note", ""), idx)
+            for idx, aff in enumerate(entry.get("affiliations", []))
+        ],
+    }
+
+
+def write_rows(cursor, run, name, rows):
+    """
+    Appends rows to a staging table using COPY on Postgres and a batched
+    executemany elsewhere.
+    """
+    if not rows:
+        return
+    columns = [col for col, _ in STAGING_TABLES[name]]
+    table = q(stage_table(run, name))
+    column_list = ", ".join(q(col) for col in columns)
+
+    if is_postgres():
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        sql = f"COPY {table} ({column_list}) FROM STDIN"
+        if is_psycopg3:
+            with cursor.cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            buffer = io.StringIO()
+            # Quoted strings keep '' distinct from NULL in CSV COPY.
+            csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+            buffer.seek(0)
+            cursor.cursor.copy_expert(f"{sql} WITH (FORMAT csv)", buffer)
+        return
+
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows
+    )
+
+
+def load_chunk(job):
+    """
+    Loads a ``(run, chunk)`` job, a chunk of ``(seq, entry)`` pairs, into the
+    run's staging tables. Runs in a worker process with its own database
+    connection.
+
+    Returns:
+        tuple: (number of entries, referenced image names, SourceIndex entries
+        added or refreshed by this chunk, for the parent to save).
+    """
+    run, chunk = job
+    sources = SourceIndex(ContentAddressedStorage(location=settings.MEDIA_ROOT))
+    known = dict(sources.entries)
+    tables = {name: [] for name in STAGING_TABLES}
+    images = set()
+    for seq, entry in chunk:
+        image = None
+        if entry.get("image"):
+            try:
+                image = sources.store(entry["image"])
+                images.add(image)
+            except FileNotFoundError:
+                pass
+        for name, rows in entry_rows(seq, entry, image).items():
+            tables[name].extend(rows)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for name, rows in tables.items():
+                write_rows(cursor, run, name, rows)
+    new_sources = {
+        name: value for name, value in sources.entries.items() if known.get(name) != value
+    }
+    return len(chunk), images, new_sources
+
+
+def close_for_fork():
+    """
+    Closes this process' database connections before workers are forked.
+
+    Closing a pooled connection only hands it back to its psycopg pool,
+    which keeps the socket open; forked workers would inherit the pool and
+    its sockets but not its threads, and end up sharing server connections.
+    So pooled aliases close their whole pool, which the parent reopens on
+    its next query.
+    """
+    for conn in connections.all():
+        conn.close()
+        if conn.settings_dict["OPTIONS"].get("pool"):
+            conn.close_pool()
+
+
+def _disable_pools():
+    # A worker needs one connection per alias, not a pool of its own.
+    for conn in connections.all():
+        conn.settings_dict["OPTIONS"].pop("pool", None)
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database connection.
+    for conn in connections.all(initialized_only=True):
+        conn.inc_thread_sharing()
+        conn.close()
+        conn.dec_thread_sharing()
+    _disable_pools()
+
+
+def _spawn_init():
+    import django
+
+    django.setup()
+    _disable_pools()
+
+
+def chunked(entries, size):
+    """Yields lists of ``(seq, entry)`` pairs of up to ``size`` entries."""
+    numbered = enumerate(entries)
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+def load_partitions(run, entries, workers, chunk_size):
+    """
+    Distributes the entries across worker processes that load them into the
+    run's staging tables. SQLite allows a single writer, so it loads
+    in-process.
+
+    Returns:
+        tuple: (number of entries staged, referenced image names).
+    """
+    sources = SourceIndex(ContentAddressedStorage(location=settings.MEDIA_ROOT))
+    staged, images = 0, set()
+
+    def collect(result):
+        nonlocal staged
+        count, chunk_images, new_sources = result
+        staged += count
+        images.update(chunk_images)
+        if new_sources:
+            sources.entries.update(new_sources)
+            sources.changed = True
+
+    jobs = ((run, chunk) for chunk in chunked(entries, chunk_size))
+    if connection.vendor == "sqlite" or workers <= 1:
+        for job in jobs:
+            collect(load_chunk(job))
+    else:
+        close_for_fork()
+        methods = multiprocessing.get_all_start_methods()
+        if "fork" in methods:
+            ctx, initializer = multiprocessing.get_context("fork"), _init_worker
+        else:
+            ctx, initializer = multiprocessing.get_context("spawn"), _spawn_init
+        with ctx.Pool(workers, initializer=initializer) as pool:
+            for result in pool.imap_unordered(load_chunk, jobs):
+                collect(result)
+
+    sources.save()
+    return staged, images
+
+
+def index_staged(run):
+    """
+    Indexes the loaded staging tables and builds the ``latest`` table holding
+    the last staged entry of each name, which is the one that wins.
+    """
+    s_char = q(stage_table(run, "character"))
+    latest = q(stage_table(run, "latest"))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX {q(stage_table(run, 'character_name'))} "
+            f"ON {s_char} (name, seq)"
+        )
+        for name in ("alias", "quirk", "affiliation"):
+            cursor.execute(
+                f"CREATE INDEX {q(stage_table(run, name + '_seq'))} "
+                f"ON {q(stage_table(run, name))} (seq)"
+            )
+        cursor.execute(
+            f"CREATE TABLE {latest} AS "
+            f"SELECT s.* FROM {s_char} s WHERE s.seq = "
+            f"(SELECT MAX(d.seq) FROM {s_char} d WHERE d.name = s.name)"
+        )
+        cursor.execute(
+            f"CREATE INDEX {q(stage_table(run, 'latest_name'))} ON {latest} (name)"
+        )
+        cursor.execute(
+            f"CREATE INDEX {q(stage_table(run, 'latest_seq'))} ON {latest} (seq)"
+        )
+
+
+def merge_staged(run):
+    """
+    Merges the staging tables into the character tables with set-based SQL.
+
+    Returns:
+        dict: Number of characters updated and inserted.
+    """
+    character = q(Character._meta.db_table)
+    alias = q(Alias._meta.db_table)
+    quirk = q(Quirk._meta.db_table)
+    affiliation = q(Affiliation._meta.db_table)
+    char_quirk = q(CharacterQuirk._meta.db_table)
+    char_aff = q(CharacterAffiliation._meta.db_table)
+    s_alias = q(stage_table(run, "alias"))
+    s_quirk = q(stage_table(run, "quirk"))
+    s_aff = q(stage_table(run, "affiliation"))
+    latest = q(stage_table(run, "latest"))
+    order = q("order")
+
+    with connection.cursor() as cursor:
+        # Only names of winning entries: superseded duplicates link nothing.
+        for model_table, staged in ((quirk, s_quirk), (affiliation, s_aff)):
+            cursor.execute(
+                f"INSERT INTO {model_table} (name) "
+                f"SELECT DISTINCT s.name FROM {staged} s "
+                f"JOIN {latest} l ON l.seq = s.seq "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {model_table} m WHERE m.name = s.name)"
+            )
+
+        cursor.execute(
+            f"UPDATE {character} SET "
+            f"kanji = l.kanji, url = l.url, content_hash = l.content_hash, "
+            f"image = CASE WHEN l.image <> '' THEN l.image ELSE {character}.image END "
+            f"FROM {latest} l WHERE {character}.name = l.name"
+        )
+        updated = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {character} (name, kanji, url, image, content_hash) "
+            f"SELECT l.name, l.kanji, l.url, l.image, l.content_hash FROM {latest} l "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {character} c WHERE c.name = l.name)"
+        )
+        inserted = cursor.rowcount
+
+        merged_ids = (
+            f"SELECT c.id FROM {character} c JOIN {latest} l ON l.name = c.name"
+        )
+        for child in (alias, char_quirk, char_aff):
+            cursor.execute(f"DELETE FROM {child} WHERE character_id IN ({merged_ids})")
+
+        cursor.execute(
+            f"INSERT INTO {alias} (name, character_id) "
+            f"SELECT a.name, c.id FROM {s_alias} a "
+            f"JOIN {latest} l ON l.seq = a.seq "
+            f"JOIN {character} c ON c.name = l.name"
+        )
+        cursor.execute(
+            f"INSERT INTO {char_quirk} (character_id, quirk_id, {order}) "
+            f"SELECT c.id, m.id, MIN(s.position) FROM {s_quirk} s "
+            f"JOIN {latest} l ON l.seq = s.seq "
+            f"JOIN {character} c ON c.name = l.name "
+            f"JOIN {quirk} m ON m.name = s.name "
+            f"GROUP BY c.id, m.id"
+        )
+        cursor.execute(
+            f"INSERT INTO {char_aff} (character_id, affiliation_id, note, {order}) "
+            f"SELECT c.id, m.id, s.note, s.position FROM {s_aff} s "
+            # Repeated affiliations keep their first occurrence and its note.
+            f"JOIN (SELECT seq, name, MIN(position) AS position FROM {s_aff} "
+            f"GROUP BY seq, name) f "
+            f"ON f.seq = s.seq AND f.name = s.name AND f.position = s.position "
+            f"JOIN {latest} l ON l.seq = s.seq "
+            f"JOIN {character} c ON c.name = l.name "
+            f"JOIN {affiliation} m ON m.name = s.name"
+        )
+
+    return {"updated": updated, "inserted": inserted}
+
+
+def import_entries(entries, workers=None, chunk_size=1000):
+    """
+    Imports a dataset through the staging tables.
+
+    Args:
+        entries (Iterable[dict]): Character entries.
+        workers (int): Worker processes for the load phase (default: CPU count).
+        chunk_size (int): Entries handed to a worker at a time.
+
+    Returns:
+        dict: ``staged``, ``updated`` and ``inserted`` counts, the referenced
+        ``images`` and ``timings``, the seconds spent in each phase.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    run = new_run()
+    timings = {}
+
+    start = time.perf_counter()
+    create_staging_tables(run)
+    timings["prepare"] = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        staged, images = load_partitions(run, entries, workers, chunk_size)
+        timings["load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index_staged(run)
+        timings["index"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            result = merge_staged(run)
+            bump_version()
+        timings["merge"] = time.perf_counter() - start
+    finally:
+        start = time.perf_counter()
+        drop_staging_tables(run)
+        timings["cleanup"] = time.perf_counter() - start
+
+    return {"staged": staged, **result, "images": images, "timings": timings}
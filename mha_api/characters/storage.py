@@ -0,0 +1,202 @@
+"""
+Content-addressed media storage.
+
+Files are stored under the SHA-256 of their bytes, e.g.
+``characters/3f/3fa2...c9.png``, so saving the same image twice is a no-op
+instead of producing ``izuku-midoriya_u8fpXbE.png``-style copies. Local
+source files are linked into the store (hardlink, then reflink, then a
+kernel-side copy as the fallback) rather than read and rewritten.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import fcntl
+
+    FICLONE = 0x40049409  # ioctl number of Linux's FICLONE (reflink)
+except ImportError:  # Windows
+    fcntl = None
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def link_or_copy(source, target):
+    """
+    Materializes ``source`` at ``target`` without copying bytes through Python:
+    a hardlink when both are on the same filesystem, a reflink on
+    copy-on-write filesystems, and ``shutil.copyfile`` (sendfile) otherwise.
+    The target appears atomically.
+    """
+    folder = os.path.dirname(target)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        try:
+            os.link(source, tmp)
+        except OSError:
+            if not _reflink(source, tmp):
+                shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _reflink(source, target):
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+
+def iter_files(root, folder=""):
+    """
+    Walks a folder under ``root`` with ``os.scandir`` and yields the
+    ``/``-separated names of its files relative to ``root``, one at a time.
+    Hidden entries (temporary files left by interrupted writes, the source
+    index, quarantine folders) are skipped.
+    """
+    stack = [folder]
+    while stack:
+        prefix = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, prefix))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                name = f"{prefix}/{entry.name}" if prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                else:
+                    yield name
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files after the SHA-256 of their content,
+    keeping the folder and extension of the requested name.
+    """
+
+    def hashed_name(self, name, digest):
+        """Returns the content-addressed name for a requested name and digest."""
+        folder = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(folder, digest[:2], digest + ext).replace("\\", "/")
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, so they never need suffixes.
+        return name
+
+    def _save(self, name, content):
+        hasher = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            hasher.update(chunk)
+        name = self.hashed_name(name, hasher.hexdigest())
+        if self.exists(name):
+            return name
+
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".tmp-")
+        try:
+            content.seek(0)
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp, self.file_permissions_mode)
+            # Concurrent writers produce identical bytes, so last one wins.
+            os.replace(tmp, full_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return name
+
+    def store_file(self, source_path, name):
+        """
+        Adds a local file to the store by linking it, skipping the write when
+        its content is already stored.
+
+        Args:
+            source_path (str): Path of the file to store.
+            name (str): Requested name, whose folder and extension are kept.
+
+        Returns:
+            str: The content-addressed storage name.
+        """
+        stored = self.hashed_name(name, file_digest(source_path))
+        if not self.exists(stored):
+            link_or_copy(source_path, self.path(stored))
+        return stored
+
+
+class SourceIndex:
+    """
+    Remembers which stored name each dataset source file maps to, keyed by
+    the file's size and mtime, so unchanged sources are resolved with a single
+    stat call and no reads. Saved as ``.source-index.json`` in the store root.
+    """
+
+    FILENAME = ".source-index.json"
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.path = storage.path(self.FILENAME)
+        self.changed = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def store(self, source_name):
+        """
+        Returns the stored name for a source file given relative to the store
+        root, linking it into the store if it is new or changed.
+        """
+        source_path = self.storage.path(source_name)
+        st = os.stat(source_path)
+        signature = [st.st_size, st.st_mtime_ns]
+        entry = self.entries.get(source_name)
+        if entry and entry[:2] == signature and self.storage.exists(entry[2]):
+            return entry[2]
+
+        stored = self.storage.store_file(source_path, source_name)
+        self.entries[source_name] = signature + [stored]
+        self.changed = True
+        return stored
+
+    def save(self):
+        """Writes the index back to disk if it changed."""
+        if not self.changed:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.changed = False
@@ -0,0 +1,228 @@
+"""
+Synthetic character datasets for scale testing.
+
+``generate_entries`` yields entries in the dataset format of
+``scraper/cleaned_characters.jsonc``, so they can be written through
+``ingest`` or the staging import like the real data. Names are built from
+romanized syllables with matching kanji, and quirks and affiliations are
+drawn with Zipf-like popularity: a few are shared by a large part of the
+cast, most by a handful of characters, as in the real dataset.
+
+Everything is derived from a seeded random generator, so the same options
+produce the same dataset. Synthetic characters link to ``SYNTHETIC_URL`` and
+synthetic quirk and affiliation names end in ``SYNTHETIC_SUFFIX``, so they are
+easy to tell apart from scraped ones and never merge into them when both are
+loaded into the same database (e.g. a generated "Half-Hot Half-Cold").
+"""
+
+import itertools
+import math
+import os
+import random
+
+from PIL import Image
+
+SYNTHETIC_URL = "https://synthetic.invalid/wiki/"
+SYNTHETIC_SUFFIX = " (synthetic)"
+PLACEHOLDER_FOLDER = "synthetic"
+
+SYLLABLES = {
+    "a": "亜", "i": "伊", "u": "宇", "e": "江", "o": "尾",
+    "ka": "火", "ki": "木", "ku": "九", "ke": "毛", "ko": "子",
+    "sa": "佐", "shi": "志", "su": "須", "se": "瀬", "so": "曽",
+    "ta": "田", "chi": "千", "tsu": "津", "te": "手", "to": "戸",
+    "na": "奈", "ni": "仁", "no": "野", "ha": "葉", "hi": "日",
+    "fu": "風", "ho": "穂", "ma": "真", "mi": "美", "mu": "武",
+    "mo": "森", "ya": "矢", "yu": "由", "yo": "代", "ra": "良",
+    "ri": "里", "ru": "留", "ro": "路", "wa": "和", "da": "大",
+    "go": "吾", "ji": "次", "ba": "馬", "ze": "是", "ryu": "竜",
+}  # fmt: skip
+
+QUIRK_WORDS = [
+    "Acid", "Black", "Blood", "Cold", "Crystal", "Dark", "Echo", "Electric",
+    "Explosive", "Frog", "Glass", "Gravity", "Half", "Hell", "Hot", "Hyper",
+    "Invisible", "Iron", "Mirror", "Rust", "Shadow", "Silent", "Sonic",
+    "Steel", "Storm", "Super", "Twin", "Vine", "Zero", "Mighty",
+]  # fmt: skip
+QUIRK_NOUNS = [
+    "Armor", "Beam", "Bind", "Blade", "Body", "Burst", "Cloud", "Copy",
+    "Drive", "Fist", "Flame", "Force", "Gear", "Grip", "Hand", "Heal", "Mist",
+    "Pulse", "Shield", "Sight", "Spark", "Step", "Voice", "Warp", "Wave",
+    "Whip", "Wing", "Zone",
+]  # fmt: skip
+AFFILIATION_PATTERNS = [
+    "{place} High School",
+    "{place} Middle School",
+    "{place} Hero Agency",
+    "{place} Police Department",
+    "{word} Squad",
+    "League of {noun}s",
+    "{word} {noun} Alliance",
+]
+HERO_TITLES = ["Hero", "Pro Hero", "Villain", "Vigilante", "Rookie Hero"]
+NOTES = ["Formerly", "Leader", "Founder", "Temporarily", "Intern", "Sidekick"]
+# Share of affiliation links that carry a note.
+NOTE_RATE = 0.3
+
+
+def zipf_cum_weights(n, exponent):
+    """Returns cumulative Zipf weights for ranks 1..n, for ``random.choices``."""
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, n + 1)))
+
+
+def pick_distinct(rng, population, cum_weights, count):
+    """Draws up to ``count`` distinct items, weighted by ``cum_weights``."""
+    picked = []
+    for _ in range(count * 4):
+        item = rng.choices(population, cum_weights=cum_weights)[0]
+        if item not in picked:
+            picked.append(item)
+            if len(picked) == count:
+                break
+    return picked
+
+
+def poisson(rng, mean):
+    """Draws from a Poisson distribution (Knuth's method, for small means)."""
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _word(rng, low=2, high=3):
+    syllables = rng.choices(list(SYLLABLES), k=rng.randint(low, high))
+    return "".join(syllables).capitalize(), "".join(SYLLABLES[s] for s in syllables)
+
+
+def unique_names(rng, count, make):
+    """Returns ``count`` distinct names built by ``make(rng)``."""
+    names = {}
+    for attempt in itertools.count():
+        if len(names) == count:
+            return list(names)
+        name = make(rng)
+        if name in names:
+            # The combinations are running out; number the repeats.
+            name = f"{name} {attempt}"
+        names.setdefault(name)
+
+
+def quirk_name(rng):
+    if rng.random() < 0.05:
+        return f"Half-{rng.choice(QUIRK_WORDS)} Half-{rng.choice(QUIRK_WORDS)}"
+    words = rng.sample(QUIRK_WORDS, rng.choice([1, 1, 2]))
+    return " ".join(words + [rng.choice(QUIRK_NOUNS)])
+
+
+def affiliation_name(rng):
+    return rng.choice(AFFILIATION_PATTERNS).format(
+        place=_word(rng)[0],
+        word=rng.choice(QUIRK_WORDS),
+        noun=rng.choice(QUIRK_NOUNS),
+    )
+
+
+def write_placeholders(media_root, count, size=256):
+    """
+    Writes ``count`` distinct solid-colour PNGs under ``PLACEHOLDER_FOLDER``.
+
+    Returns:
+        list[str]: Their names relative to ``media_root``.
+    """
+    folder = os.path.join(media_root, PLACEHOLDER_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for index in range(count):
+        name = f"{PLACEHOLDER_FOLDER}/placeholder-{index:05d}.png"
+        path = os.path.join(media_root, name)
+        if not os.path.exists(path):
+            # Distinct colours give distinct content hashes.
+            colour = ((index * 97) % 256, (index * 57) % 256, (index // 256) % 256)
+            Image.new("RGB", (size, size), colour).save(path)
+        names.append(name)
+    return names
+
+
+def generate_entries(
+    characters,
+    aliases=None,
+    quirks=None,
+    affiliations=None,
+    exponent=1.1,
+    images=(),
+    seed=0,
+):
+    """
+    Yields synthetic character entries.
+
+    Args:
+        characters (int): Number of characters.
+        aliases (int): Total number of aliases, spread over the characters
+            (defaults to five per character).
+        quirks (int): Number of distinct quirks (defaults to characters / 20).
+        affiliations (int): Number of distinct affiliations (defaults to
+            characters / 50).
+        exponent (float): Zipf exponent of quirk and affiliation popularity;
+            higher values concentrate membership on fewer of them.
+        images (list[str]): Image names under MEDIA_ROOT assigned round-robin,
+            e.g. from ``write_placeholders``. Empty for no images.
+        seed (int): Seed of the random generator.
+
+    Yields:
+        dict: Entries with ``name``, ``kanji``, ``url``, ``image``,
+        ``quirks``, ``affiliations`` and ``aliases``.
+    """
+    rng = random.Random(seed)
+    aliases = characters * 5 if aliases is None else aliases
+    quirk_names = [
+        name + SYNTHETIC_SUFFIX
+        for name in unique_names(rng, quirks or max(characters // 20, 1), quirk_name)
+    ]
+    affiliation_names = [
+        name + SYNTHETIC_SUFFIX
+        for name in unique_names(
+            rng, affiliations or max(characters // 50, 1), affiliation_name
+        )
+    ]
+    quirk_weights = zipf_cum_weights(len(quirk_names), exponent)
+    affiliation_weights = zipf_cum_weights(len(affiliation_names), exponent)
+    alias_mean = aliases / characters if characters else 0
+
+    seen = set()
+    for index in range(characters):
+        family, family_kanji = _word(rng)
+        given, given_kanji = _word(rng)
+        name = f"{given} {family}"
+        if name in seen:
+            name = f"{name} {index}"
+        seen.add(name)
+
+        alias_names = []
+        for _ in range(poisson(rng, alias_mean)):
+            title = rng.choice(HERO_TITLES)
+            alias_names.append(f"{_word(rng, 1, 3)[0]} {title}: {given}")
+
+        yield {
+            "name": name,
+            "kanji": family_kanji + given_kanji,
+            "url": SYNTHETIC_URL + name.replace(" ", "_"),
+            "image": images[index % len(images)] if images else "",
+            "quirks": [
+                {"name": q}
+                for q in pick_distinct(
+                    rng, quirk_names, quirk_weights, rng.choice([1, 1, 1, 2, 3])
+                )
+            ],
+            "affiliations": [
+                {
+                    "name": a,
+                    "note": rng.choice(NOTES) if rng.random() < NOTE_RATE else "",
+                }
+                for a in pick_distinct(
+                    rng, affiliation_names, affiliation_weights, rng.randint(1, 4)
+                )
+            ],
+            "aliases": [{"name": alias} for alias in alias_names],
+        }
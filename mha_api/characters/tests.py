@@ -1,3 +1,1608 @@
-from django.test import TestCase
+import difflib
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.db.models import Count
+from django.db.models.signals import post_delete
+from django.http import Http404, HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from mha_api.middleware import (
+    PIN_COOKIE,
+    LoadSheddingMiddleware,
+    ReplicaRoutingMiddleware,
+    queue_seconds,
+)
+from mha_api.routers import PrimaryReplicaRouter, replica_reads
+from mha_api.serve import serve_file
+from mha_api.storage import StaticFilesStorage
+from mha_api.timing import ServerTimingMiddleware, is_pool_timeout, record_connection
+
+from . import memory, signals, snapshot, staging
+from .bulk import THROUGH, merge, merge_candidates, record_variants, renumber
+from .checks import check_in_memory, check_throttling
+from .images import generate_variants, variant_name, variant_names
+from .ingest import entry_hash, ingest, sync
+from .loaders import iter_entries
+from .memory import bump_version
+from .models import (
+    Affiliation,
+    Alias,
+    Character,
+    CharacterAffiliation,
+    CharacterQuirk,
+    Quirk,
+)
+from .queryplans import capture_plans, format_plans, record_queries
+from .signals import publish_dataset_change
+from .staging import (
+    STAGE_PREFIX,
+    create_staging_tables,
+    drop_staging_tables,
+    import_entries,
+    new_run,
+    stage_table,
+)
+from .storage import ContentAddressedStorage, SourceIndex, iter_files
+from .synthetic import SYNTHETIC_SUFFIX, generate_entries, write_placeholders
+from .throttling import CharacterRateThrottle, TokenBucketThrottle, is_expensive
+
+REPLICA = "replica_test"
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Character), DEFAULT_DB_ALIAS)
+
+    def test_reads_use_replicas_inside_replica_reads(self):
+        with replica_reads():
+            self.assertIn(self.router.db_for_read(Character), ["replica_a", "replica_b"])
+        self.assertEqual(self.router.db_for_read(Character), DEFAULT_DB_ALIAS)
+
+    def test_one_replica_per_block(self):
+        seen = set()
+        for _ in range(20):
+            with replica_reads():
+                aliases = {self.router.db_for_read(Character) for _ in range(20)}
+            self.assertEqual(len(aliases), 1)
+            seen |= aliases
+        self.assertEqual(seen, {"replica_a", "replica_b"})
+
+    def test_writes_always_use_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Character), DEFAULT_DB_ALIAS)
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, "characters"))
+        self.assertFalse(self.router.allow_migrate("replica_a", "characters"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Character), DEFAULT_DB_ALIAS)
+
+    def test_middleware_only_routes_safe_api_requests(self):
+        middleware = ReplicaRoutingMiddleware(lambda request: None)
+        rf = RequestFactory()
+        self.assertTrue(middleware.use_replicas(rf.get("/api/characters/")))
+        self.assertFalse(middleware.use_replicas(rf.get("/admin/")))
+        self.assertFalse(middleware.use_replicas(rf.post("/api/characters/")))
+        pinned = rf.get("/api/characters/")
+        pinned.COOKIES[PIN_COOKIE] = "1"
+        self.assertFalse(middleware.use_replicas(pinned))
+
+
+class ReplicaSQLiteTests(TestCase):
+    """
+    Routes API reads to a second SQLite file that holds different rows than
+    the primary, so the responses show which database served them.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The replica alias only exists while this class runs, so it is added
+        # to ``databases`` after the test runner has set up the test DBs.
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA}
+        cls.tmpdir = tempfile.mkdtemp()
+        connections.settings[REPLICA] = dict(
+            connections.settings[DEFAULT_DB_ALIAS],
+            NAME=os.path.join(cls.tmpdir, "replica.sqlite3"),
+            TEST={"MIRROR": None, "NAME": None},
+        )
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (
+                Quirk,
+                Affiliation,
+                Character,
+                Alias,
+                CharacterQuirk,
+                CharacterAffiliation,
+            ):
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.tmpdir)
+
+    @classmethod
+    def setUpTestData(cls):
+        Character.objects.create(name="Primary Only")
+        Character.objects.using(REPLICA).create(name="Replica Only")
+
+    def names(self, response):
+        return [c["name"] for c in response.json()["results"]]
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_api_reads_come_from_the_replica(self):
+        self.assertEqual(self.names(self.client.get("/api/characters/")), ["Replica Only"])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_come_from_the_primary(self):
+        self.assertEqual(self.names(self.client.get("/api/characters/")), ["Primary Only"])
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.post("/api/characters/")
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.names(self.client.get("/api/characters/")), ["Primary Only"])
+
+
+PLANS_DIR = os.path.join(os.path.dirname(__file__), "plans")
+
+# Full scans that are the best plan for the statement: (SQL pattern, table).
+EXPECTED_SCANS = [
+    # The paginator's COUNT(*) reads every row by definition.
+    (
+        r'^SELECT COUNT\(\*\) AS "__count" FROM "characters_character"$',
+        "characters_character",
+    ),
+    # Pages walk the primary key in order and stop after offset + limit rows.
+    (r'ORDER BY "characters_character"\."id" ASC LIMIT', "characters_character"),
+    # Substring search (icontains) cannot use a B-tree index.
+    (r"LIKE", "characters_character"),
+    (r"LIKE", "characters_alias"),
+]
+
+
+class SyntheticDatasetTestCase(TestCase):
+    """
+    Test case with a synthetic dataset of ``CHARACTERS`` characters generated
+    from ``SEED``, loaded once per class with its media in ``media_root``.
+    """
+
+    CHARACTERS = 300
+    SEED = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        entries = generate_entries(cls.CHARACTERS, seed=cls.SEED)
+        ingest(entries, media_root=cls.media_root)
+
+    @classmethod
+    def most_linked_character(cls):
+        """Returns the character with the most affiliations."""
+        return (
+            Character.objects.annotate(links=Count("characteraffiliation"))
+            .order_by("-links")
+            .first()
+        )
+
+
+class QueryPlanTests(SyntheticDatasetTestCase):
+    """
+    Explains every query the character endpoints run against a synthetic
+    dataset. A full scan of a table that an index should serve fails the
+    test, and so does any plan that differs from ``plans/<vendor>.txt``; run
+    with ``UPDATE_QUERY_PLANS=1`` to accept the new plans. A database with no
+    plans file fails as well (only ``sqlite.txt`` is committed so far, so the
+    first run on Postgres has to record ``postgresql.txt``).
+    """
+
+    CHARACTERS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        character = Character.objects.order_by("id")[cls.CHARACTERS // 2]
+        cls.scenarios = {
+            "list": "/api/characters/?limit=20",
+            "list deep offset": (
+                f"/api/characters/?limit=20&offset={cls.CHARACTERS - 20}"
+            ),
+            "search": "/api/characters/?limit=20&search="
+            + character.name.split()[0][:4],
+            "detail": f"/api/characters/{character.pk}/",
+        }
+
+    def setUp(self):
+        cache.clear()  # Rate limits.
+
+    def capture(self):
+        plans = {}
+        for name, path in self.scenarios.items():
+            with record_queries(connection) as queries:
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            plans[name] = capture_plans(connection, queries)
+        return plans
+
+    def test_no_unexpected_full_scans(self):
+        errors = []
+        for name, plans in self.capture().items():
+            for entry in plans:
+                unexpected = entry["full_scans"] - {
+                    table
+                    for pattern, table in EXPECTED_SCANS
+                    if re.search(pattern, entry["sql"])
+                }
+                if unexpected:
+                    errors.append(
+                        f"{name}: full scan of {', '.join(sorted(unexpected))}\n"
+                        + format_plans(name, [entry])
+                    )
+        if errors:
+            self.fail("\n".join(errors))
+
+    def test_plans_match_expected(self):
+        text = "".join(
+            format_plans(name, plans) for name, plans in self.capture().items()
+        )
+        path = os.path.join(PLANS_DIR, f"{connection.vendor}.txt")
+        if os.getenv("UPDATE_QUERY_PLANS"):
+            os.makedirs(PLANS_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            return
+        if not os.path.exists(path):
+            # Not a skip: on the production database a silent skip would
+            # hide every plan regression.
+            self.fail(
+                f"No expected plans for {connection.vendor}: run the tests "
+                f"against it with UPDATE_QUERY_PLANS=1 and commit "
+                f"{os.path.relpath(path, settings.BASE_DIR)}."
+            )
+        with open(path, encoding="utf-8") as f:
+            expected = f.read()
+        if text != expected:
+            diff = difflib.unified_diff(
+                expected.splitlines(keepends=True),
+                text.splitlines(keepends=True),
+                fromfile=f"expected ({os.path.relpath(path)})",
+                tofile="actual",
+            )
+            self.fail(
+                "Query plans changed (UPDATE_QUERY_PLANS=1 accepts them):\n"
+                + "".join(diff)
+            )
+
+
+class AdminQueryBudgetTests(SyntheticDatasetTestCase):
+    """
+    Query counts of the admin pages on a synthetic dataset. The budgets
+    hold whatever the page size and number of related rows, so a new N+1
+    query (e.g. through ``__str__`` or an inline widget) fails here.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "x")
+        # The character with the most related rows, to make inline N+1 show.
+        cls.character = cls.most_linked_character()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        ContentType.objects.clear_cache()  # Keeps counts independent of order.
+
+    def assertPageQueries(self, num, path):
+        # Two of them load the session and the user.
+        with self.assertNumQueries(num):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+
+    def test_changelists(self):
+        self.assertPageQueries(4, "/admin/characters/character/")
+        self.assertPageQueries(4, "/admin/characters/character/?q=a")
+        self.assertPageQueries(4, "/admin/characters/characterquirk/")
+        self.assertPageQueries(4, "/admin/characters/characteraffiliation/")
+
+    def test_character_change_form(self):
+        self.assertGreater(self.character.characteraffiliation_set.count(), 1)
+        self.assertPageQueries(
+            7, f"/admin/characters/character/{self.character.pk}/change/"
+        )
+
+    def test_autocomplete(self):
+        self.assertPageQueries(
+            4,
+            "/admin/autocomplete/?app_label=characters&model_name=characterquirk"
+            "&field_name=quirk&term=a",
+        )
+
+    def test_paginator_counts_exactly_without_statistics(self):
+        changelist = self.client.get("/admin/characters/character/").context["cl"]
+        self.assertEqual(changelist.paginator.count, Character.objects.count())
+
+
+class ApiQueryBudgetTests(SyntheticDatasetTestCase):
+    """
+    Query counts of the character endpoints on a synthetic dataset. Like the
+    admin budgets they hold whatever the page size, so serializing a page
+    never runs queries per character.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.character = cls.most_linked_character()
+
+    def setUp(self):
+        cache.clear()  # Rate limits.
+
+    def assertEndpointQueries(self, num, path):
+        with self.assertNumQueries(num):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response
+
+    def test_list(self):
+        # COUNT, the page, then one query each for quirks, affiliations
+        # and aliases.
+        for limit in (1, 20, 100):
+            response = self.assertEndpointQueries(
+                5, f"/api/characters/?limit={limit}"
+            )
+            self.assertEqual(len(response.data["results"]), limit)
+        self.assertEndpointQueries(5, "/api/characters/?limit=20&offset=280")
+
+    def test_search(self):
+        response = self.assertEndpointQueries(
+            5, "/api/characters/?limit=100&search=a"
+        )
+        self.assertGreater(len(response.data["results"]), 1)
+
+    def test_detail(self):
+        self.assertGreater(self.character.characteraffiliation_set.count(), 1)
+        self.assertEndpointQueries(4, f"/api/characters/{self.character.pk}/")
+
+    def test_quirks_keep_their_order(self):
+        link = self.character.characterquirk_set.order_by("order").first()
+        link.order = 100
+        link.save()
+        response = self.client.get(f"/api/characters/{self.character.pk}/")
+        self.assertEqual(response.data["quirks"][-1]["name"], link.quirk.name)
+
+
+class BulkEditTests(TestCase):
+    """Merging and renumbering through the admin actions' set-based edits."""
+
+    def setUp(self):
+        self.characters = [
+            Character.objects.create(name=f"Character {i}") for i in range(6)
+        ]
+
+    def link(self, character, affiliation, order=0, note=""):
+        return CharacterAffiliation.objects.create(
+            character=character, affiliation=affiliation, order=order, note=note
+        )
+
+    def count_queries(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args)
+        return len(queries), result
+
+    def test_merge_repoints_links_and_drops_duplicates(self):
+        a, b, c = self.characters[:3]
+        keep = Affiliation.objects.create(name="Corusan Middle School")
+        typo = Affiliation.objects.create(name="Korusan Chgakk")
+        other = Affiliation.objects.create(name="Corusan Jr. High")
+        self.link(a, keep, note="Formerly")
+        self.link(b, keep)
+        self.link(a, typo)  # Already linked to the kept row.
+        self.link(c, typo, order=2)
+        self.link(c, other)  # Linked twice through merged rows.
+
+        selected = Affiliation.objects.filter(pk__in=[keep.pk, typo.pk, other.pk])
+        self.assertEqual(merge_candidates(selected)[0], keep)
+
+        self.assertEqual(merge(keep, selected), (2, 1, []))
+        self.assertQuerySetEqual(
+            Affiliation.objects.values_list("name", flat=True),
+            ["Corusan Middle School"],
+        )
+        self.assertQuerySetEqual(
+            CharacterAffiliation.objects.order_by("character_id").values_list(
+                "character__name", "note", "order"
+            ),
+            [("Character 0", "Formerly", 0), ("Character 1", "", 0),
+             ("Character 2", "", 2)],
+        )  # fmt: skip
+
+    def test_merge_keeps_the_notes_of_duplicate_links(self):
+        a, b = self.characters[:2]
+        keep = Affiliation.objects.create(name="U.A. High School")
+        typo = Affiliation.objects.create(name="UA High School")
+        other = Affiliation.objects.create(name="U.A High School")
+        self.link(a, keep, note="Formerly")
+        self.link(a, typo, note="Class 1-A")
+        self.link(a, other, note="Formerly")  # Already there.
+        self.link(b, typo)
+        self.link(b, other, note="Temporarily")
+        self.link(self.characters[2], keep, note="x" * 40)
+        self.link(self.characters[2], typo, note="Too long to fit")
+
+        merged, links, dropped = merge(
+            keep, Affiliation.objects.filter(pk__in=[keep.pk, typo.pk, other.pk])
+        )
+        self.assertEqual((merged, links), (2, 1))
+        self.assertEqual(dropped, [("Character 2", "Too long to fit")])
+        self.assertQuerySetEqual(
+            CharacterAffiliation.objects.order_by("character_id").values_list(
+                "character__name", "note"
+            ),
+            [("Character 0", "Formerly; Class 1-A"), ("Character 1", "Temporarily"),
+             ("Character 2", "x" * 40)],
+        )  # fmt: skip
+
+    def test_merge_has_no_cascades(self):
+        # merge() deletes with _raw_delete(), which skips the collector: it
+        # relies on nothing but the through rows referencing the merged
+        # rows, and nothing referencing the through rows.
+        def referrers(model):
+            return sorted(
+                f"{rel.related_model._meta.label}.{rel.field.name}"
+                for rel in model._meta.related_objects
+                if not rel.many_to_many
+            )
+
+        for model, (through, field) in THROUGH.items():
+            self.assertEqual(
+                referrers(model), [f"{through._meta.label}.{field}"], model
+            )
+            self.assertEqual(referrers(through), [], through)
+
+    def test_merge_query_count_is_constant(self):
+        quirks = [Quirk.objects.create(name=f"Quirk {i}") for i in range(40)]
+        for i, quirk in enumerate(quirks):
+            for character in self.characters[: i % 3 + 1]:
+                CharacterQuirk.objects.create(character=character, quirk=quirk)
+        small, _ = self.count_queries(
+            merge, quirks[0], Quirk.objects.filter(pk__in=[q.pk for q in quirks[:2]])
+        )
+        large, (merged, _, _) = self.count_queries(
+            merge, quirks[2], Quirk.objects.filter(pk__in=[q.pk for q in quirks[2:]])
+        )
+        self.assertEqual(merged, 37)
+        self.assertEqual(small, large)
+
+    def test_merge_query_count_is_constant_with_delete_receivers(self):
+        # The in-memory mode connects these, which disables fast deletes.
+        for model in (CharacterQuirk, Quirk):
+            post_delete.connect(publish_dataset_change, sender=model)
+            self.addCleanup(
+                post_delete.disconnect, publish_dataset_change, sender=model
+            )
+        self.test_merge_query_count_is_constant()
+
+    def test_renumber(self):
+        a, b = self.characters[:2]
+        quirks = [Quirk.objects.create(name=f"Quirk {i}") for i in range(3)]
+        for quirk, order in zip(quirks, [5, 5, 2]):
+            CharacterQuirk.objects.create(character=a, quirk=quirk, order=order)
+        CharacterQuirk.objects.create(character=b, quirk=quirks[0], order=9)
+        affiliation = Affiliation.objects.create(name="U.A. High School")
+        self.link(a, affiliation, order=3)
+
+        self.assertEqual(renumber(Character.objects.filter(pk=a.pk)), 4)
+
+        self.assertQuerySetEqual(
+            CharacterQuirk.objects.filter(character=a)
+            .order_by("order")
+            .values_list("quirk__name", "order"),
+            [("Quirk 2", 0), ("Quirk 0", 1), ("Quirk 1", 2)],
+        )
+        self.assertEqual(CharacterQuirk.objects.get(character=b).order, 9)
+        self.assertEqual(CharacterAffiliation.objects.get().order, 0)
+
+    def test_renumber_query_count_is_constant(self):
+        small, _ = self.count_queries(
+            renumber, Character.objects.filter(pk=self.characters[0].pk)
+        )
+        large, _ = self.count_queries(renumber, Character.objects.all())
+        self.assertEqual(small, large)
+
+    def test_admin_actions(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "x")
+        self.client.force_login(user)
+        typo = Affiliation.objects.create(name="Korusan Chgakk")
+        keep = Affiliation.objects.create(name="Corusan Middle School")
+        self.link(self.characters[0], typo)
+        self.link(self.characters[1], typo)
+        self.link(self.characters[2], keep)
+        data = {
+            "action": "merge_selected",
+            "_selected_action": [typo.pk, keep.pk],
+        }
+        response = self.client.post("/admin/characters/affiliation/", data)
+        self.assertContains(response, "Choose the affiliation to keep")
+        self.assertContains(response, "Korusan Chgakk (2 characters)")
+        self.assertEqual(Affiliation.objects.count(), 2)
+
+        response = self.client.post(
+            "/admin/characters/affiliation/",
+            {**data, "post": "yes", "target": keep.pk},
+            follow=True,
+        )
+        self.assertContains(
+            response, "Merged 1 affiliations into Corusan Middle School"
+        )
+        self.assertEqual(
+            CharacterAffiliation.objects.filter(affiliation=keep).count(), 3
+        )
+
+        response = self.client.post(
+            "/admin/characters/character/",
+            {"action": "renumber_selected", "select_across": "1",
+             "_selected_action": [self.characters[0].pk]},
+            follow=True,
+        )  # fmt: skip
+        self.assertContains(response, "Renumbered 3 links.")
+
+
+RATES = {"characters": "3/min", "characters_expensive": "1/min"}
+
+
+@mock.patch.object(TokenBucketThrottle, "THROTTLE_RATES", RATES)
+class ThrottlingTests(TestCase):
+    """Token buckets per client, with a separate budget for expensive requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.character = Character.objects.create(name="Izuku Midoriya")
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_bucket_allows_a_burst_then_refills(self):
+        throttle = CharacterRateThrottle()
+        now = 1000.0
+        throttle.timer = lambda: now
+        request = self.factory.get("/api/characters/")
+        allowed = [throttle.allow_request(request, None) for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertAlmostEqual(throttle.wait(), 20.0)  # One token per 20s.
+        now += 20
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertFalse(throttle.allow_request(request, None))
+
+    def test_expensive_requests(self):
+        for path, expensive in [
+            ("/api/characters/", False),
+            ("/api/characters/?limit=100&offset=1000", False),
+            ("/api/characters/?limit=101", True),
+            ("/api/characters/?offset=1001", True),
+            ("/api/characters/?search=Deku", True),
+            ("/api/characters/?limit=abc", False),
+        ]:
+            self.assertEqual(is_expensive(self.factory.get(path)), expensive, path)
+
+    def test_budgets_are_separate(self):
+        self.assertEqual(self.client.get("/api/characters/?search=a").status_code, 200)
+        self.assertEqual(self.client.get("/api/characters/?search=b").status_code, 429)
+        for _ in range(3):
+            self.assertEqual(self.client.get("/api/characters/").status_code, 200)
+        response = self.client.get(f"/api/characters/{self.character.pk}/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "20")
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_clients_cannot_pick_their_bucket(self):
+        # Only the address appended by the proxy identifies the client.
+        statuses = [
+            self.client.get(
+                "/api/characters/", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.7"
+            ).status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        response = self.client.get(
+            "/api/characters/", HTTP_X_FORWARDED_FOR="203.0.113.8"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_deploy_checks(self):
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": None}
+        ):
+            ids = [error.id for error in check_throttling(None)]
+        self.assertEqual(ids, ["characters.E001", "characters.E002"])
+        with override_settings(
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {"characters": None},
+            }
+        ):
+            self.assertEqual(check_throttling(None), [])
+
+
+@override_settings(LOAD_SHED_QUEUE_SECONDS=5, LOAD_SHED_LATENCY_SECONDS=2)
+class LoadSheddingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = LoadSheddingMiddleware(lambda request: HttpResponse("ok"))
+
+    def test_queue_seconds_units(self):
+        now = 1_700_000_010.0
+        for header in [
+            "t=1700000000",
+            "t=1700000000.000",
+            "1700000000000",
+            "t=1700000000000000",
+        ]:
+            request = self.factory.get("/", HTTP_X_REQUEST_START=header)
+            self.assertAlmostEqual(queue_seconds(request, now), 10.0, msg=header)
+        self.assertIsNone(queue_seconds(self.factory.get("/"), now))
+        request = self.factory.get("/", HTTP_X_REQUEST_START="t=garbage")
+        self.assertIsNone(queue_seconds(request, now))
+
+    def test_sheds_requests_that_queued_too_long(self):
+        start = f"t={time.time() - 6:.3f}"
+        response = self.middleware(
+            self.factory.get("/api/characters/", HTTP_X_REQUEST_START=start)
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        response = self.middleware(
+            self.factory.get("/admin/", HTTP_X_REQUEST_START=start)
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_sheds_expensive_requests_while_slow(self):
+        for _ in range(20):
+            self.middleware.record(3.0)
+        search = self.factory.get("/api/characters/?search=a")
+        self.assertEqual(self.middleware(search).status_code, 503)
+        cheap = self.factory.get("/api/characters/")
+        self.assertEqual(self.middleware(cheap).status_code, 200)
+        # Fast responses bring the average back down.
+        for _ in range(20):
+            self.middleware(cheap)
+        self.assertEqual(self.middleware(search).status_code, 200)
+
+    def test_stale_latency_is_ignored(self):
+        for _ in range(20):
+            self.middleware.record(3.0)
+        self.middleware.latency_updated -= self.middleware.LATENCY_STALE_SECONDS
+        search = self.factory.get("/api/characters/?search=a")
+        self.assertEqual(self.middleware(search).status_code, 200)
+
+
+@override_settings(CHARACTERS_IN_MEMORY_CHECK_INTERVAL=0)
+class InMemoryTests(SyntheticDatasetTestCase):
+    """The in-memory views answer exactly like the ORM-backed ones."""
+
+    CHARACTERS = 120
+    SEED = 3
+
+    def setUp(self):
+        cache.clear()  # Rate limits and the dataset version.
+        memory._store = None
+        self.addCleanup(setattr, memory, "_store", None)
+
+    def get(self, path, in_memory):
+        with override_settings(CHARACTERS_IN_MEMORY=in_memory):
+            response = self.client.get(path)
+        return response.status_code, response.json()
+
+    def test_responses_match_the_orm(self):
+        character = Character.objects.order_by("id")[60]
+        alias = Alias.objects.filter(character=character).first()
+        paths = [
+            "/api/characters/",
+            "/api/characters/?limit=7&offset=100",
+            "/api/characters/?search=" + character.name.split()[0][:2],
+            "/api/characters/?search=" + character.name.split()[1].upper(),
+            "/api/characters/?search=zzzz",
+            f"/api/characters/{character.pk}/",
+            "/api/characters/999999/",
+        ]
+        if alias:
+            paths.append("/api/characters/?search=" + alias.name[-6:])
+        for path in paths:
+            with self.subTest(path=path):
+                cache.clear()
+                self.assertEqual(self.get(path, True), self.get(path, False))
+
+    def test_search_uses_the_trigram_index(self):
+        store = memory.get_store()
+        term = Character.objects.order_by("id")[10].name[1:6].lower()
+        self.assertEqual(
+            [r.id for r in store.search(term)],
+            [r.id for r in store.records if r.matches(term)],
+        )
+        self.assertEqual(store.search("qqq"), [])
+
+    def test_reloads_after_a_version_bump(self):
+        store = memory.get_store()
+        self.assertIs(memory.get_store(), store)
+        Character.objects.create(name="Toshinori Yagi")
+        self.assertIs(memory.get_store(), store)  # Not published yet.
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version()
+        reloaded = memory.get_store()
+        self.assertIsNot(reloaded, store)
+        self.assertEqual(reloaded.search("yagi")[0].name, "Toshinori Yagi")
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        with override_settings(CHARACTERS_IN_MEMORY=True):
+            self.assertEqual(
+                [error.id for error in check_in_memory(None)], ["characters.E003"]
+            )
+        self.assertEqual(check_in_memory(None), [])
+
+
+def make_entry(name, quirks=(), affiliations=(), aliases=(), kanji=""):
+    return {
+        "name": name,
+        "kanji": kanji,
+        "url": "https://example.com/wiki/" + name.replace(" ", "_"),
+        "image": "",
+        "quirks": [{"name": quirk} for quirk in quirks],
+        "affiliations": [{"name": name, "note": note} for name, note in affiliations],
+        "aliases": [{"name": alias} for alias in aliases],
+    }
+
+
+class StagingImportTests(TestCase):
+    """The staging-table import on the database under test."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def links(self, name):
+        character = Character.objects.get(name=name)
+        return (
+            character.kanji,
+            list(
+                character.characterquirk_set.order_by("order").values_list(
+                    "quirk__name", flat=True
+                )
+            ),
+            list(
+                character.characteraffiliation_set.order_by("order").values_list(
+                    "affiliation__name", "note"
+                )
+            ),
+            sorted(character.aliases.values_list("name", flat=True)),
+        )
+
+    def test_insert_then_update(self):
+        result = import_entries(
+            [
+                make_entry("Izuku Midoriya", ["One For All", "Blackwhip"],
+                      [("U.A. High School", "")], ["Deku"]),
+                make_entry("Shoto Todoroki", ["Half-Cold Half-Hot"]),
+            ],
+            workers=1,
+        )  # fmt: skip
+        self.assertEqual((result["staged"], result["inserted"]), (2, 2))
+        self.assertEqual(
+            self.links("Izuku Midoriya"),
+            ("", ["One For All", "Blackwhip"], [("U.A. High School", "")], ["Deku"]),
+        )
+
+        result = import_entries(
+            [
+                make_entry("Izuku Midoriya", ["Blackwhip", "One For All"],
+                      [("Aldera Junior High", "Formerly"), ("U.A. High School", "")],
+                      kanji="緑谷出久"),
+            ],
+            workers=1,
+        )  # fmt: skip
+        self.assertEqual((result["updated"], result["inserted"]), (1, 0))
+        self.assertEqual(
+            self.links("Izuku Midoriya"),
+            (
+                "緑谷出久",
+                ["Blackwhip", "One For All"],
+                [("Aldera Junior High", "Formerly"), ("U.A. High School", "")],
+                [],
+            ),
+        )
+        self.assertEqual(Character.objects.count(), 2)
+        self.assertEqual(
+            Character.objects.get(name="Izuku Midoriya").content_hash,
+            entry_hash(
+                make_entry("Izuku Midoriya", ["Blackwhip", "One For All"],
+                      [("Aldera Junior High", "Formerly"), ("U.A. High School", "")],
+                      kanji="緑谷出久")
+            ),
+        )  # fmt: skip
+
+    def test_later_duplicates_win_without_orphans(self):
+        result = import_entries(
+            [
+                make_entry("Katsuki Bakugo", ["Sweating"], [("Old Agency", "")],
+                           ["Kacchan"]),
+                make_entry("Katsuki Bakugo", ["Explosion", "Explosion"],
+                      [("U.A. High School", "A"), ("U.A. High School", "B")]),
+            ],
+            workers=1,
+        )  # fmt: skip
+        self.assertEqual((result["staged"], result["inserted"]), (2, 1))
+        self.assertEqual(
+            self.links("Katsuki Bakugo"),
+            ("", ["Explosion"], [("U.A. High School", "A")], []),
+        )
+        self.assertFalse(Quirk.objects.filter(name="Sweating").exists())
+        self.assertFalse(Affiliation.objects.filter(name="Old Agency").exists())
+
+    def test_runs_use_their_own_staging_tables(self):
+        first, second = new_run(), new_run()
+        self.assertNotEqual(first, second)
+        create_staging_tables(first)
+        create_staging_tables(second)
+        tables = connection.introspection.table_names()
+        self.assertIn(stage_table(first, "character"), tables)
+        self.assertIn(stage_table(second, "character"), tables)
+        drop_staging_tables(first)
+        drop_staging_tables(second)
+
+        import_entries([make_entry("Ochaco Uraraka")], workers=1)
+        self.assertFalse(
+            [
+                table
+                for table in connection.introspection.table_names()
+                if table.startswith(STAGE_PREFIX)
+            ]
+        )
+
+
+class InlineProcessPool:
+    """Stands in for a ``multiprocessing`` pool, running jobs in-process."""
+
+    def __init__(self, events, workers, initializer):
+        events.append("fork")
+        initializer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def imap_unordered(self, func, jobs):
+        return map(func, jobs)
+
+
+class StagingWorkerTests(SimpleTestCase):
+    """Handing database connections to the import's worker processes."""
+
+    def setUp(self):
+        self.events = []
+        self.pooled = mock.Mock(settings_dict={"OPTIONS": {"pool": {"max_size": 4}}})
+        self.pooled.close_pool.side_effect = lambda: self.events.append("close_pool")
+        self.plain = mock.Mock(settings_dict={"OPTIONS": {}})
+        self.handler = mock.Mock()
+        self.handler.all.return_value = [self.pooled, self.plain]
+
+    def test_pools_are_closed_before_forking_and_off_in_workers(self):
+        context = mock.Mock()
+        context.Pool.side_effect = partial(InlineProcessPool, self.events)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with (
+            override_settings(MEDIA_ROOT=media_root),
+            mock.patch.object(staging, "connections", self.handler),
+            mock.patch.object(staging, "connection", mock.Mock(vendor="postgresql")),
+            mock.patch.object(
+                staging.multiprocessing, "get_all_start_methods", return_value=["fork"]
+            ),
+            mock.patch.object(
+                staging.multiprocessing, "get_context", return_value=context
+            ),
+            mock.patch.object(
+                staging, "load_chunk", side_effect=lambda job: (len(job[1]), set(), {})
+            ),
+        ):
+            entries = [make_entry(f"Character {i}") for i in range(5)]
+            staged, _ = staging.load_partitions("run", entries, 2, 2)
+
+        self.assertEqual(staged, 5)
+        self.assertEqual(self.events, ["close_pool", "fork"])
+        self.plain.close_pool.assert_not_called()
+        self.assertEqual(self.pooled.settings_dict["OPTIONS"], {})
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql"
+    and connection.settings_dict["OPTIONS"].get("pool"),
+    "Needs a pooled Postgres database.",
+)
+class PooledStagingImportTests(TransactionTestCase):
+    """The staging import with worker processes on a pooled database."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_workers_load_through_their_own_connections(self):
+        Character.objects.count()  # Opens the parent's pool.
+        entries = list(generate_entries(400, seed=4))
+        result = import_entries(entries, workers=4, chunk_size=25)
+        self.assertEqual((result["staged"], result["inserted"]), (400, 400))
+        # The parent reopens its pool afterwards.
+        self.assertEqual(Character.objects.count(), 400)
+
+
+class SyntheticDatasetTests(SimpleTestCase):
+    """The seeded synthetic dataset generator."""
+
+    def names(self, entries, field):
+        return {item["name"] for entry in entries for item in entry.get(field, [])}
+
+    def test_same_seed_gives_the_same_entries(self):
+        entries = list(generate_entries(200, seed=7))
+        self.assertEqual(list(generate_entries(200, seed=7)), entries)
+        self.assertNotEqual(list(generate_entries(200, seed=8)), entries)
+
+    def test_character_names_are_unique(self):
+        names = [entry["name"] for entry in generate_entries(5000, seed=1)]
+        self.assertEqual(len(set(names)), len(names))
+
+    def test_counts_follow_the_scale(self):
+        entries = list(generate_entries(2000, seed=2))
+        self.assertEqual(len(entries), 2000)
+        aliases = sum(len(entry["aliases"]) for entry in entries)
+        self.assertAlmostEqual(aliases / 10000, 1, delta=0.05)
+        # Zipf popularity leaves some of the rarest ones unused.
+        self.assertTrue(80 <= len(self.names(entries, "quirks")) <= 100)
+        self.assertTrue(30 <= len(self.names(entries, "affiliations")) <= 40)
+        for entry in entries:
+            self.assertTrue(1 <= len(entry["quirks"]) <= 3)
+            self.assertTrue(1 <= len(entry["affiliations"]) <= 4)
+
+        entries = list(generate_entries(100, aliases=0, quirks=3, seed=2))
+        self.assertEqual(sum(len(entry["aliases"]) for entry in entries), 0)
+        self.assertLessEqual(len(self.names(entries, "quirks")), 3)
+
+    def test_names_cannot_collide_with_real_ones(self):
+        entries = list(generate_entries(2000, seed=3))
+        for field in ("quirks", "affiliations"):
+            for name in self.names(entries, field):
+                self.assertTrue(name.endswith(SYNTHETIC_SUFFIX), name)
+        path = settings.BASE_DIR / "scraper" / "cleaned_characters.jsonc"
+        real = list(iter_entries(path))
+        for field in ("quirks", "affiliations"):
+            self.assertFalse(self.names(entries, field) & self.names(real, field))
+
+
+def dataset_rows():
+    """Returns every character table's rows, without the alias ids."""
+    return {
+        "characters": list(
+            Character.objects.order_by("pk").values_list(
+                "pk", "name", "kanji", "url", "image"
+            )
+        ),
+        "quirks": list(Quirk.objects.order_by("pk").values_list("pk", "name")),
+        "affiliations": list(
+            Affiliation.objects.order_by("pk").values_list("pk", "name")
+        ),
+        "quirk links": sorted(
+            CharacterQuirk.objects.values_list("character", "quirk", "order")
+        ),
+        "affiliation links": sorted(
+            CharacterAffiliation.objects.values_list(
+                "character", "affiliation", "note", "order"
+            )
+        ),
+        "aliases": sorted(Alias.objects.values_list("character", "name")),
+    }
+
+
+class IngestTests(TestCase):
+    """The batched ingest engine."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        images = write_placeholders(self.media_root, 3, size=8)
+        self.entries = list(generate_entries(40, seed=3, images=images))
+
+    def test_reingest_is_idempotent(self):
+        first = ingest(self.entries, batch_size=7, media_root=self.media_root)
+        self.assertEqual(first["characters_created"], 40)
+        before = dataset_rows()
+        self.assertEqual(len(first["images"]), 3)
+
+        second = ingest(self.entries, batch_size=7, media_root=self.media_root)
+        self.assertEqual(dataset_rows(), before)
+        self.assertEqual(second["images"], first["images"])
+        self.assertEqual(
+            (
+                second["characters_created"],
+                second["characters_updated"],
+                second["quirks_created"],
+                second["affiliations_created"],
+                second["character_quirks"],
+                second["character_affiliations"],
+            ),
+            (0, 40, 0, 0, 0, 0),
+        )
+
+    def test_later_duplicates_win_and_links_are_kept(self):
+        ingest(
+            [make_entry("Izuku Midoriya", ["One For All"], aliases=["Deku"])],
+            media_root=self.media_root,
+        )
+        ingest(
+            [
+                make_entry("Izuku Midoriya", ["Blackwhip"], aliases=["Kid"]),
+                make_entry("Izuku Midoriya", ["Blackwhip"], kanji="緑谷出久"),
+            ],
+            media_root=self.media_root,
+        )
+        character = Character.objects.get()
+        self.assertEqual(character.kanji, "緑谷出久")
+        # Without replace mode quirk links accumulate; aliases are rewritten.
+        self.assertEqual(
+            list(
+                character.characterquirk_set.order_by("quirk__name").values_list(
+                    "quirk__name", flat=True
+                )
+            ),
+            ["Blackwhip", "One For All"],
+        )
+        self.assertFalse(character.aliases.exists())
+
+
+class SyncTests(TestCase):
+    """Differential syncs driven by the stored entry hashes."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.entries = [
+            make_entry("Izuku Midoriya", ["One For All", "Blackwhip"],
+                       [("U.A. High School", "")], ["Deku"]),
+            make_entry("Shoto Todoroki", ["Half-Cold Half-Hot"],
+                       [("U.A. High School", ""), ("Endeavor Agency", "Intern")]),
+            make_entry("Katsuki Bakugo", ["Explosion"]),
+        ]  # fmt: skip
+        self.first = sync(self.entries, media_root=self.media_root)
+
+    def quirks(self, name):
+        return list(
+            CharacterQuirk.objects.filter(character__name=name)
+            .order_by("order")
+            .values_list("quirk__name", flat=True)
+        )
+
+    def test_first_sync_inserts_everything(self):
+        self.assertEqual(len(self.first["inserted"]), 3)
+        self.assertEqual(self.quirks("Izuku Midoriya"), ["One For All", "Blackwhip"])
+
+    def test_unchanged_input_writes_nothing(self):
+        before = dataset_rows()
+        with CaptureQueriesContext(connection) as queries:
+            result = sync(self.entries, media_root=self.media_root)
+        self.assertEqual(
+            (result["inserted"], result["updated"], result["deleted"]), ([], [], [])
+        )
+        self.assertEqual(result["unchanged"], 3)
+        self.assertEqual(dataset_rows(), before)
+        statements = [q["sql"] for q in queries]
+        writes = [
+            sql
+            for sql in statements
+            if not sql.startswith(("SELECT", "SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_reorders_links(self):
+        self.entries[0]["quirks"].reverse()
+        self.entries[1]["affiliations"].reverse()
+        result = sync(self.entries, media_root=self.media_root)
+        self.assertEqual(
+            sorted(result["updated"]), ["Izuku Midoriya", "Shoto Todoroki"]
+        )
+        self.assertEqual(self.quirks("Izuku Midoriya"), ["Blackwhip", "One For All"])
+        self.assertEqual(
+            list(
+                CharacterAffiliation.objects.filter(character__name="Shoto Todoroki")
+                .order_by("order")
+                .values_list("affiliation__name", "note")
+            ),
+            [("Endeavor Agency", "Intern"), ("U.A. High School", "")],
+        )
+
+    def test_removes_missing_characters_and_links(self):
+        self.entries[0]["quirks"].pop()
+        result = sync(self.entries[:2], media_root=self.media_root)
+        self.assertEqual(result["deleted"], ["Katsuki Bakugo"])
+        self.assertEqual(result["updated"], ["Izuku Midoriya"])
+        self.assertEqual(self.quirks("Izuku Midoriya"), ["One For All"])
+        self.assertFalse(Character.objects.filter(name="Katsuki Bakugo").exists())
+        self.assertFalse(
+            CharacterQuirk.objects.filter(quirk__name="Explosion").exists()
+        )
+
+        result = sync(self.entries[:2], media_root=self.media_root)
+        self.assertEqual((result["deleted"], result["unchanged"]), ([], 2))
+
+    def test_manual_edits_are_resynced(self):
+        character = Character.objects.get(name="Katsuki Bakugo")
+        character.kanji = "爆豪勝己"
+        character.save()  # Clears the stored hash.
+        result = sync(self.entries, media_root=self.media_root)
+        self.assertEqual(result["updated"], ["Katsuki Bakugo"])
+        character.refresh_from_db()
+        self.assertEqual(character.kanji, "")
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Content-addressed names, deduplication and the source index."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def stored_files(self):
+        return sorted(iter_files(self.root, "characters"))
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save("characters/deku.PNG", ContentFile(b"image"))
+        second = self.storage.save("characters/izuku.png", ContentFile(b"image"))
+        other = self.storage.save("characters/deku.png", ContentFile(b"other"))
+        digest = hashlib.sha256(b"image").hexdigest()
+        self.assertEqual(first, f"characters/{digest[:2]}/{digest}.png")
+        self.assertEqual(second, first)
+        self.assertNotEqual(other, first)
+        self.assertEqual(self.stored_files(), sorted([first, other]))
+
+    def test_store_file_links_sources_once(self):
+        a = self.write("sources/a.png", b"image")
+        b = self.write("sources/b.png", b"image")
+        stored = self.storage.store_file(a, "characters/a.png")
+        self.assertEqual(self.storage.store_file(b, "characters/b.png"), stored)
+        self.assertEqual(self.stored_files(), [stored])
+        with open(self.storage.path(stored), "rb") as f:
+            self.assertEqual(f.read(), b"image")
+
+    def test_source_index_skips_unchanged_sources(self):
+        self.write("sources/a.png", b"image")
+        index = SourceIndex(self.storage)
+        stored = index.store("sources/a.png")
+        index.save()
+
+        index = SourceIndex(self.storage)
+        with mock.patch("characters.storage.file_digest") as digest:
+            self.assertEqual(index.store("sources/a.png"), stored)
+        digest.assert_not_called()
+        self.assertFalse(index.changed)
+
+        # A changed source is hashed and stored again.
+        path = self.write("sources/a.png", b"changed")
+        later = os.stat(path).st_mtime + 10
+        os.utime(path, (later, later))
+        self.assertNotEqual(index.store("sources/a.png"), stored)
+        self.assertTrue(index.changed)
+
+
+class CollectMediaTests(TestCase):
+    """Garbage collection of unreferenced media files."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # A seeded character: its dataset source, stored image and variants.
+        source = write_placeholders(self.media_root, 1, size=8)[0]
+        entry = make_entry("Izuku Midoriya")
+        entry["image"] = source
+        (image,) = ingest([entry], media_root=self.media_root)["images"]
+        generate_variants(image, self.media_root)
+        variants = [name.replace("\\", "/") for name in variant_names(image)]
+        self.kept = [source, image, *variants]
+
+        self.orphans = [
+            self.write("characters/ab/deleted.png"),
+            self.write("characters/variants/deleted-small.png"),
+            self.write("other/notes.txt"),
+        ]
+        self.recent = self.write("characters/uploading.png", age=0)
+        self.hidden = self.write(".tmp-partial", age=2 * 3600)
+
+    def write(self, name, age=2 * 3600):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        then = time.time() - age
+        os.utime(path, (then, then))
+        return name
+
+    def existing(self, names):
+        return [n for n in names if os.path.exists(os.path.join(self.media_root, n))]
+
+    def collect(self, *args):
+        stdout = io.StringIO()
+        call_command("collect_media", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_deletes_only_unreferenced_old_files(self):
+        output = self.collect()
+        self.assertIn("Deleted 3 unreferenced files, 30 B reclaimed", output)
+        self.assertEqual(self.existing(self.orphans), [])
+        kept = [*self.kept, self.recent, self.hidden, SourceIndex.FILENAME]
+        self.assertEqual(self.existing(kept), kept)
+
+        self.assertIn("Deleted 0 unreferenced files", self.collect())
+
+    def test_dry_run_removes_nothing(self):
+        output = self.collect("--dry-run")
+        self.assertIn("Would remove 3 unreferenced files", output)
+        self.assertEqual(self.existing(self.orphans), self.orphans)
+
+    def test_quarantine_moves_orphans_aside(self):
+        self.collect("--quarantine", "--min-age", "0")
+        self.assertEqual(self.existing(self.orphans + [self.recent]), [])
+        (stamp,) = os.listdir(os.path.join(self.media_root, ".quarantine"))
+        quarantine = os.path.join(self.media_root, ".quarantine", stamp)
+        self.assertEqual(
+            sorted(iter_files(quarantine)), sorted(self.orphans + [self.recent])
+        )
+        self.assertEqual(self.existing(self.kept), self.kept)
+
+
+class SnapshotTests(SyntheticDatasetTestCase):
+    """Dumping and loading the character tables."""
+
+    CHARACTERS = 50
+    SEED = 5
+
+    def setUp(self):
+        self.path = os.path.join(self.media_root, "test.snapshot")
+
+    def rows(self):
+        return {
+            model._meta.db_table: list(
+                model.objects.order_by("pk").values_list(*fields)
+            )
+            for model, fields in snapshot.TABLES
+        }
+
+    def test_round_trip(self):
+        before = self.rows()
+        stats = snapshot.dump(self.path)
+        self.assertEqual(stats[Character._meta.db_table], 50)
+        Character.objects.all().delete()
+        Quirk.objects.all().delete()
+
+        snapshot.load(self.path)
+        self.assertEqual(self.rows(), before)
+        # Sequences continue after the restored keys.
+        last = before[Character._meta.db_table][-1][0]
+        self.assertGreater(Character.objects.create(name="New").pk, last)
+
+    def test_rejects_corrupt_and_foreign_files(self):
+        snapshot.dump(self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 1]))
+        with self.assertRaisesMessage(snapshot.SnapshotError, "integrity check"):
+            snapshot.read(self.path)
+        with open(self.path, "wb") as f:
+            f.write(b"MHASNAP1" + bytes(40))
+        with self.assertRaisesMessage(snapshot.SnapshotError, "older snapshot format"):
+            snapshot.read(self.path)
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+        with self.assertRaisesMessage(snapshot.SnapshotError, "not a character"):
+            snapshot.read(self.path)
+
+
+class ImageVariantTests(TestCase):
+    """Rendering image variants and recording them for the API."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()  # Rate limits.
+        self.name = self.write_image("characters/hero.png")
+
+    def write_image(self, name, size=(600, 400)):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new("RGB", size, "green").save(path)
+        return name
+
+    def create_character(self):
+        with mock.patch.object(signals.variant_executor, "submit"):
+            return Character.objects.create(name="Hero", image=self.name)
+
+    def test_generate_variants_renders_missing_and_stale_ones(self):
+        written = generate_variants(self.name, self.media_root)
+        self.assertEqual(sorted(written), sorted(variant_names(self.name)))
+        small = os.path.join(self.media_root, variant_name(self.name, "small"))
+        with Image.open(small) as img:
+            self.assertEqual(img.size, (256, 171))
+
+        self.assertEqual(generate_variants(self.name, self.media_root), [])
+        source = os.path.join(self.media_root, self.name)
+        later = os.stat(small).st_mtime + 10
+        os.utime(source, (later, later))
+        self.assertEqual(
+            len(generate_variants(self.name, self.media_root)), len(written)
+        )
+        forced = generate_variants(self.name, self.media_root, force=True)
+        self.assertEqual(len(forced), len(written))
+
+    def test_api_links_variants_once_recorded(self):
+        character = self.create_character()
+        with mock.patch.object(default_storage, "exists") as exists:
+            data = self.client.get(f"/api/characters/{character.pk}/").data
+            self.assertIsNone(data["image_small"])
+
+            generate_variants(self.name)
+            self.assertEqual(record_variants([self.name]), 1)
+            data = self.client.get(f"/api/characters/{character.pk}/").data
+        exists.assert_not_called()
+        self.assertTrue(data["image_small"].endswith("variants/hero-small.png"))
+        self.assertTrue(data["image_webp"].endswith("variants/hero.webp"))
+
+        # A new image is not linked to the old one's variants.
+        character.image = self.write_image("characters/other.png")
+        with mock.patch.object(signals.variant_executor, "submit"):
+            character.save()
+        data = self.client.get(f"/api/characters/{character.pk}/").data
+        self.assertIsNone(data["image_small"])
+
+    def test_save_renders_variants_after_commit(self):
+        with (
+            mock.patch.object(signals.variant_executor, "submit") as submit,
+            self.captureOnCommitCallbacks() as callbacks,
+        ):
+            character = Character.objects.create(name="Hero", image=self.name)
+            submit.assert_not_called()
+        for callback in callbacks:
+            callback()
+        submit.assert_called_once_with(signals.render_image_variants, self.name)
+
+        # Run the job here; closing connections would end the test transaction.
+        with mock.patch.object(signals.connections, "close_all"):
+            signals.render_image_variants(self.name)
+        character.refresh_from_db()
+        self.assertEqual(character.variants_image, self.name)
+        with (
+            mock.patch.object(signals.variant_executor, "submit") as submit,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            character.save()
+        submit.assert_not_called()
+
+    def test_command_renders_and_records_variants(self):
+        character = self.create_character()
+        broken = os.path.join(self.media_root, "characters", "broken.png")
+        with open(broken, "wb") as f:
+            f.write(b"not an image")
+        with mock.patch.object(signals.variant_executor, "submit"):
+            Character.objects.create(name="Broken", image="characters/broken.png")
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            "generate_image_variants", workers=1, stdout=stdout, stderr=stderr
+        )
+        self.assertIn("(1 failed)", stdout.getvalue())
+        self.assertIn("used by 1 characters", stdout.getvalue())
+        self.assertIn("characters/broken.png", stderr.getvalue())
+        for name in variant_names(self.name):
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        character.refresh_from_db()
+        self.assertEqual(character.variants_image, self.name)
+        self.assertEqual(Character.objects.get(name="Broken").variants_image, "")
+
+
+@override_settings(SERVER_TIMING_POOL=False)
+class ServerTimingTests(SimpleTestCase):
+    """The Server-Timing header and the 503 on pool timeouts."""
+
+    POOLS = {"default": {"size": 4, "max": 4, "available": 0, "waiting": 2}}
+
+    def setUp(self):
+        self.request = RequestFactory().get("/api/characters/")
+
+    def get(self, view=None):
+        middleware = ServerTimingMiddleware(view or (lambda request: HttpResponse()))
+        return middleware(self.request)
+
+    def test_reports_app_and_connection_time(self):
+        def view(request):
+            record_connection("default", 0.002)
+            record_connection("replica", 0.003)
+            return HttpResponse()
+
+        metrics = self.get(view)["Server-Timing"].split(", ")
+        self.assertRegex(metrics[0], r"^app;dur=\d+\.\d$")
+        self.assertEqual(metrics[1:], ["db-connect;dur=5.0"])
+        self.assertEqual(self.get()["Server-Timing"].count("db-connect"), 0)
+
+    def test_pool_occupancy_is_opt_in(self):
+        with (
+            mock.patch("mha_api.timing.pool_stats", return_value=self.POOLS),
+            self.assertLogs("mha_api.timing", "WARNING") as logs,
+        ):
+            self.assertNotIn("db-pool", self.get()["Server-Timing"])
+            with self.settings(SERVER_TIMING_POOL=True):
+                header = self.get()["Server-Timing"]
+        self.assertIn('db-pool;desc="default 4/4, 2 waiting"', header)
+        # Saturation is logged either way.
+        self.assertEqual(len(logs.records), 2)
+
+    def test_pool_timeout_returns_503(self):
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+        error = OperationalError("couldn't get a connection")
+        with mock.patch("mha_api.timing.is_pool_timeout", return_value=True):
+            with self.assertLogs("mha_api.timing", "ERROR"):
+                response = middleware.process_exception(self.request, error)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+        with mock.patch("mha_api.timing.is_pool_timeout", return_value=False):
+            self.assertIsNone(middleware.process_exception(self.request, error))
+
+    def test_is_pool_timeout_needs_the_pool_error(self):
+        self.assertFalse(is_pool_timeout(OperationalError("connection refused")))
+        self.assertFalse(is_pool_timeout(ValueError()))
+
+
+@override_settings(SENDFILE_HEADER="")
+class ServeFileTests(SimpleTestCase):
+    """Conditional, range and caching behaviour of the file serving view."""
+
+    BODY = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name in ("plain.bin", "app.0123456789ab.css"):
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(self.BODY)
+        self.factory = RequestFactory()
+
+    def serve(self, path="plain.bin", **headers):
+        request = self.factory.get("/" + path, headers=headers)
+        response = serve_file(request, path, self.root)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_response_and_cache_control(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.BODY)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+        response = self.serve("app.0123456789ab.css")
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+
+    def test_not_modified(self):
+        etag = self.serve()["ETag"]
+        for headers in (
+            {"If-None-Match": etag},
+            {"If-None-Match": f'"other", W/{etag}'},
+            {"If-Modified-Since": self.serve()["Last-Modified"]},
+        ):
+            response = self.serve(**headers)
+            self.assertEqual(response.status_code, 304, headers)
+            self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.serve(**{"If-None-Match": '"other"'}).status_code, 200)
+
+    def test_ranges(self):
+        for header, (start, end) in [
+            ("bytes=0-9", (0, 9)),
+            ("bytes=1000-", (1000, 1023)),
+            ("bytes=-24", (1000, 1023)),
+            ("bytes=1020-5000", (1020, 1023)),
+        ]:
+            response = self.serve(Range=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/1024")
+            self.assertEqual(response["Content-Length"], str(end - start + 1))
+            self.assertEqual(self.body(response), self.BODY[start : end + 1])
+        # Multiple ranges are answered with the whole file.
+        self.assertEqual(self.serve(Range="bytes=0-1,5-6").status_code, 200)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(Range="bytes=1024-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_if_range(self):
+        etag = self.serve()["ETag"]
+        response = self.serve(Range="bytes=0-9", **{"If-Range": etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.serve(Range="bytes=0-9", **{"If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.BODY)
+
+    def test_hidden_and_outside_files_are_not_served(self):
+        with open(os.path.join(self.root, ".sources.json"), "w") as f:
+            f.write("{}")
+        for path in (".sources.json", "../etc/passwd", "missing.bin"):
+            with self.assertRaises(Http404, msg=path):
+                self.serve(path)
+
+    def test_static_names_are_hashed_after_collectstatic(self):
+        storage = StaticFilesStorage(location=self.root)
+        self.assertEqual(storage.url("app.css"), "/static/app.css")
+        storage.hashed_files = {"app.css": "app.0123456789ab.css"}
+        self.assertEqual(storage.url("app.css"), "/static/app.0123456789ab.css")
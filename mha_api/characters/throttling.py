@@ -0,0 +1,130 @@
+"""
+Token bucket rate limiting for the character endpoints.
+
+Every client (identified by IP, see DRF's ``NUM_PROXIES``) has a bucket per
+scope in the shared cache. A rate of ``"N/period"`` gives a bucket of N
+tokens that refills at N per period, so a client can burst N requests and
+then sustain the rate. Expensive requests (see ``is_expensive``) draw from
+the ``characters_expensive`` bucket, everything else (detail pages, small
+list pages) from ``characters``, so a scraper paging through searches runs
+out long before it could slow down ordinary reads.
+
+With Redis the bucket is updated atomically by a Lua script using the Redis
+clock; other cache backends use a plain read and write, which is exact
+within one process and close enough across a few.
+"""
+
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import SimpleRateThrottle
+
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "stamp")
+local tokens = tonumber(bucket[1]) or capacity
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - stamp, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "stamp", tostring(now))
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return {allowed, tostring(tokens)}
+"""
+
+
+def _query_int(request, name):
+    try:
+        return int(request.GET.get(name, ""))
+    except ValueError:
+        return 0
+
+
+def is_expensive(request):
+    """
+    Returns True for requests that cost the database noticeably more than a
+    detail lookup: searches, and list pages with a ``limit`` above
+    ``CHARACTERS_EXPENSIVE_LIMIT`` or an ``offset`` above
+    ``CHARACTERS_EXPENSIVE_OFFSET``.
+    """
+    return (
+        bool(request.GET.get("search"))
+        or _query_int(request, "limit") > settings.CHARACTERS_EXPENSIVE_LIMIT
+        or _query_int(request, "offset") > settings.CHARACTERS_EXPENSIVE_OFFSET
+    )
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` with a token bucket instead of a request log, for
+    the requests ``applies`` selects.
+    """
+
+    def applies(self, request):
+        return True
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+    def take_token(self, key):
+        """
+        Takes a token from the bucket stored under ``key``.
+
+        Returns:
+            tuple: ``(allowed, wait)``, whether a token was taken and
+            otherwise the seconds until the next one is available.
+        """
+        capacity, period = self.num_requests, self.duration
+        rate = capacity / period
+        if isinstance(self.cache, RedisCache):
+            key = self.cache.make_and_validate_key(key)
+            client = self.cache._cache.get_client(key, write=True)
+            allowed, tokens = client.eval(TAKE_SCRIPT, 1, key, capacity, rate, period)
+            tokens = float(tokens)
+        else:
+            now = self.timer()
+            tokens, stamp = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(now - stamp, 0) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), period)
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if self.rate is None or not self.applies(request):
+            return True
+        allowed, self.retry_after = self.take_token(self.get_cache_key(request, view))
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class CharacterRateThrottle(TokenBucketThrottle):
+    """Budget for cheap character requests."""
+
+    scope = "characters"
+
+    def applies(self, request):
+        return not is_expensive(request)
+
+
+class ExpensiveCharacterRateThrottle(TokenBucketThrottle):
+    """Budget for searches and large or deep list pages."""
+
+    scope = "characters_expensive"
+
+    def applies(self, request):
+        return is_expensive(request)
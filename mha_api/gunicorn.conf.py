@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for the MHA API.
+
+The application is imported once in the master (``preload_app``) so workers
+fork with Django, the URLconf and the request path modules already loaded,
+and every worker is warmed up (database connections, caches, a few internal
+requests) before it accepts traffic. See ``mha_api/warmup.py``.
+
+Settings can be overridden with the usual ``GUNICORN_CMD_ARGS`` or the
+environment variables below.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(
+    os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4))
+)
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") != "False"
+warm_up_workers = os.getenv("GUNICORN_WARMUP", "True") != "False"
+accesslog = "-"
+# The default format plus the Server-Timing header (request time, database
+# connection wait and, with SERVER_TIMING_POOL, pool usage; see
+# mha_api/timing.py).
+access_log_format = (
+    '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" '
+    '"%({server-timing}o)s"'
+)
+
+
+def when_ready(server):
+    """Imports the request path in the master so workers share it."""
+    if preload_app:
+        from mha_api.warmup import preload
+
+        preload()
+
+
+def post_fork(server, worker):
+    """Drops database connections inherited from the master."""
+    if not preload_app:
+        return  # Django is not loaded yet.
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+
+
+def post_worker_init(worker):
+    """Warms the worker up before it is handed any request."""
+    if not warm_up_workers:
+        return
+    from mha_api.warmup import warm_up
+
+    seconds = warm_up(worker.wsgi)
+    worker.log.info("Worker %s warmed up in %.3fs", worker.pid, seconds)
@@ -0,0 +1,95 @@
+"""
+API documentation views.
+
+The OpenAPI schema is generated once at build time and served from
+``settings.OPENAPI_SCHEMA_FILE`` with an ETag and a precompressed gzip body.
+drf-spectacular's views, and with them its schema generator, are imported on
+the first documentation request instead of at worker startup.
+"""
+
+import gzip
+import hashlib
+import os
+from functools import cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+
+SCHEMA_CONTENT_TYPE = "application/vnd.oai.openapi; charset=utf-8"
+
+_schema = None
+
+
+class SchemaFile:
+    """A schema file read into memory with its ETag and gzip encoding."""
+
+    def __init__(self, path):
+        st = os.stat(path)
+        self.signature = (path, st.st_size, st.st_mtime_ns)
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+def get_schema_file():
+    """
+    Returns the prebuilt schema, rereading it if the file was replaced, or
+    None if there is no prebuilt schema.
+    """
+    global _schema
+    path = str(settings.OPENAPI_SCHEMA_FILE)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    schema = _schema
+    if schema is None or schema.signature != (path, st.st_size, st.st_mtime_ns):
+        schema = _schema = SchemaFile(path)
+    return schema
+
+
+@cache
+def _spectacular_view(name, **initkwargs):
+    from drf_spectacular import views
+
+    return getattr(views, name).as_view(**initkwargs)
+
+
+@require_GET
+def schema_view(request):
+    """
+    Serves the prebuilt OpenAPI schema, honouring If-None-Match and
+    Accept-Encoding. Requests with query parameters (e.g. ``?format=json``)
+    or without a prebuilt file fall back to per-request generation.
+    """
+    schema = get_schema_file()
+    if schema is None or request.GET:
+        return _spectacular_view("SpectacularAPIView")(request)
+
+    if schema.etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    elif "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = HttpResponse(schema.gzipped, content_type=SCHEMA_CONTENT_TYPE)
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(schema.body, content_type=SCHEMA_CONTENT_TYPE)
+    response["ETag"] = schema.etag
+    # Clients may cache the schema but must revalidate it, which is a 304.
+    response["Cache-Control"] = "public, no-cache"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def swagger_view(request, *args, **kwargs):
+    """Swagger UI pointed at the schema view."""
+    view = _spectacular_view("SpectacularSwaggerView", url_name="schema")
+    return view(request, *args, **kwargs)
+
+
+def redoc_view(request, *args, **kwargs):
+    """ReDoc pointed at the schema view."""
+    view = _spectacular_view("SpectacularRedocView", url_name="schema")
+    return view(request, *args, **kwargs)
@@ -0,0 +1,133 @@
+"""
+Project middleware.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from characters.throttling import is_expensive
+
+from .routers import replica_reads, replicas
+
+PIN_COOKIE = "db_primary"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves safe requests under ``REPLICA_READ_PATHS`` from the read replicas.
+
+    Replicas lag behind the primary, so after a write (any unsafe request)
+    the client gets a short-lived cookie that pins its reads to the primary
+    for ``REPLICA_STICKY_SECONDS``, giving it read-your-writes consistency.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def use_replicas(self, request):
+        return (
+            bool(replicas())
+            and request.method in ("GET", "HEAD", "OPTIONS")
+            and PIN_COOKIE not in request.COOKIES
+            and request.path.startswith(tuple(settings.REPLICA_READ_PATHS))
+        )
+
+    def __call__(self, request):
+        with replica_reads(self.use_replicas(request)):
+            response = self.get_response(request)
+        if replicas() and request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def queue_seconds(request, now=None):
+    """
+    Returns how long the request waited between the front proxy and Django,
+    from an ``X-Request-Start: t=<timestamp>`` header, or None without one.
+    The timestamp may be in seconds (nginx ``t=${msec}``), milliseconds
+    (Heroku) or microseconds (Apache ``t=%t``).
+    """
+    header = request.headers.get("X-Request-Start", "")
+    try:
+        start = float(header.removeprefix("t="))
+    except ValueError:
+        return None
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max((now or time.time()) - start, 0.0)
+
+
+class LoadSheddingMiddleware:
+    """
+    Turns requests under ``LOAD_SHED_PATHS`` away with ``503`` and
+    ``Retry-After`` before any view or database work when the worker is
+    overloaded:
+
+    - the request waited in the queue (see ``queue_seconds``) longer than
+      ``LOAD_SHED_QUEUE_SECONDS``, so the client has likely given up on it and
+      answering quickly is the only way to drain the backlog;
+    - the worker's recent response time (an exponentially weighted moving
+      average) is above ``LOAD_SHED_LATENCY_SECONDS``. Only expensive requests
+      (see ``characters.throttling.is_expensive``) are shed then; cheap ones
+      keep measuring the latency, as does one expensive request once the
+      average is ``LATENCY_STALE_SECONDS`` old, so shedding stops as soon as
+      the worker recovers.
+
+    A threshold of 0 disables that check.
+    """
+
+    LATENCY_WEIGHT = 0.2
+    LATENCY_STALE_SECONDS = 5
+    RETRY_AFTER = 1
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.latency = 0.0
+        self.latency_updated = 0.0
+        self.lock = threading.Lock()
+
+    def overloaded(self, request):
+        max_queue = settings.LOAD_SHED_QUEUE_SECONDS
+        if max_queue:
+            waited = queue_seconds(request)
+            if waited is not None and waited > max_queue:
+                return True
+        max_latency = settings.LOAD_SHED_LATENCY_SECONDS
+        return bool(
+            max_latency
+            and self.latency > max_latency
+            and time.monotonic() - self.latency_updated < self.LATENCY_STALE_SECONDS
+            and is_expensive(request)
+        )
+
+    def record(self, seconds):
+        with self.lock:
+            self.latency += self.LATENCY_WEIGHT * (seconds - self.latency)
+            self.latency_updated = time.monotonic()
+
+    def __call__(self, request):
+        if not request.path.startswith(tuple(settings.LOAD_SHED_PATHS)):
+            return self.get_response(request)
+        if self.overloaded(request):
+            response = HttpResponse(
+                "Service temporarily unavailable.",
+                status=503,
+                content_type="text/plain",
+            )
+            response["Retry-After"] = str(self.RETRY_AFTER)
+            return response
+        start = time.monotonic()
+        response = self.get_response(request)
+        self.record(time.monotonic() - start)
+        return response
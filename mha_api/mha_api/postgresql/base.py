@@ -0,0 +1,23 @@
+"""
+PostgreSQL backend that times connection checkout.
+
+``get_new_connection`` is where a thread takes a connection from the psycopg
+pool, blocking while every connection is in use, or, without pooling, opens
+one. The time it takes is added to the current request's ``db-connect``
+timing (see ``mha_api.timing``).
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+
+from mha_api.timing import record_connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            record_connection(self.alias, time.perf_counter() - start)
@@ -0,0 +1,64 @@
+"""
+Primary/replica database routing.
+
+Every query goes to ``default`` (the primary) unless the code runs inside
+``replica_reads()``, in which case reads go to one of the aliases in
+``settings.DATABASE_REPLICAS``, picked at random when the block is entered
+and kept for the whole block, so all queries of a request see the same
+replica and its lag. ``ReplicaRoutingMiddleware`` opens that
+context for safe API requests only, so the admin, management commands (the
+seeder, ``cleanup_data``) and anything after a write keep reading from the
+primary.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# The replica alias reads are routed to, or None for the primary.
+_replica = ContextVar("replica", default=None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Routes reads made inside the block to one replica, chosen at random
+    (or to the primary when ``enabled`` is False or there are no replicas).
+    """
+    aliases = replicas()
+    token = _replica.set(random.choice(aliases) if enabled and aliases else None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def replicas():
+    """Returns the configured replica aliases."""
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary and, inside ``replica_reads()``, reads to
+    the replica chosen for the block. Replicas hold the same data, so relations between any
+    of them are allowed, and migrations only run against the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
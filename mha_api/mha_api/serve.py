@@ -0,0 +1,191 @@
+"""
+Production media and static file serving.
+
+``serve_file`` replaces ``django.conf.urls.static.static`` (which only works
+with DEBUG on) with a view that is safe to run behind gunicorn:
+
+- ``ETag`` and ``Last-Modified`` validators, answering ``If-None-Match`` and
+  ``If-Modified-Since`` with ``304 Not Modified``;
+- single ``Range`` requests (``206 Partial Content``, ``416`` when the range
+  cannot be satisfied);
+- far-future, immutable ``Cache-Control`` for content-hashed names such as
+  ``characters/3f/3fa2...c9.png`` and their variants, revalidation for
+  everything else;
+- ``X-Sendfile`` / ``X-Accel-Redirect`` offload when a front proxy is
+  configured through ``SENDFILE_HEADER``, so no bytes pass through Python.
+
+Without offload, full responses use ``FileResponse``, which gunicorn sends
+with ``sendfile()``.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+CHUNK_SIZE = 64 * 1024
+
+# A SHA-256 stem (content-addressed storage) or a ManifestStaticFilesStorage
+# style ".<12 hex>." fingerprint.
+HASHED_NAME = re.compile(r"(?:^|/)[0-9a-f]{64}(?:-\w+)?\.\w+$|\.[0-9a-f]{12}\.\w+$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def is_hashed(path):
+    """Returns True if the name changes whenever the file content does."""
+    return bool(HASHED_NAME.search(path))
+
+
+def file_etag(st):
+    """Returns a strong ETag built from the file size and mtime."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range ``Range`` header.
+
+    Returns:
+        tuple | None: Inclusive ``(start, end)`` byte positions, or None if
+        the header is absent or not a single byte range (the whole file is
+        sent, as RFC 9110 allows).
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    match = RANGE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:  # Suffix range: the last N bytes.
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and int(mtime) <= since
+
+
+@require_safe
+def serve_file(request, path, document_root, url_prefix=""):
+    """
+    Serves a file below ``document_root``.
+
+    Args:
+        path (str): Requested path relative to ``document_root``.
+        document_root (str): Folder the files are served from.
+        url_prefix (str): Internal location the front proxy maps to
+            ``document_root``, used for ``X-Accel-Redirect``.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    # Hidden files (source index, quarantine, temp files) are never served.
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404("File not found.")
+    try:
+        st = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found.")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("File not found.")
+
+    etag = file_etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(st.st_mtime),
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if is_hashed(path) else REVALIDATE_CACHE_CONTROL
+        ),
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        response = HttpResponseNotModified()
+        for key in ("ETag", "Last-Modified", "Cache-Control"):
+            response[key] = headers[key]
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    sendfile_header = getattr(settings, "SENDFILE_HEADER", "")
+    if sendfile_header:
+        # The proxy handles Range and sends the body itself.
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header.lower() == "x-accel-redirect":
+            response[sendfile_header] = url_prefix.rstrip("/") + "/" + path
+        else:
+            response[sendfile_header] = full_path
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    try:
+        byte_range = parse_range(request.headers.get("Range"), st.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{st.st_size}"
+        return response
+    # A stale If-Range validator means the client must get the full file.
+    if_range = request.headers.get("If-Range")
+    if byte_range and if_range and if_range != etag:
+        byte_range = None
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+    else:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for key, value in headers.items():
+        response[key] = value
+    return response
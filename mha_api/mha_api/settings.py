@@ -1,3 +1,4 @@
+import importlib.util
 import os
 from pathlib import Path
 
@@ -38,7 +39,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mha_api.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "mha_api.middleware.LoadSheddingMiddleware",
+    "mha_api.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -70,11 +74,53 @@ WSGI_APPLICATION = "mha_api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Postgres connections come from a psycopg pool in each worker process. A
+# gunicorn worker serves at most GUNICORN_THREADS requests at a time, so its
+# pool needs that many connections and the server as a whole holds
+# WEB_CONCURRENCY * GUNICORN_THREADS of them (plus the same per replica).
+# Requests wait up to DATABASE_POOL_TIMEOUT seconds for a free connection and
+# get a 503 after that. Health checks replace connections the server dropped
+# instead of failing the next request with a 500. DATABASE_POOL=False falls
+# back to health-checked persistent connections, as does a missing
+# psycopg_pool (it needs psycopg 3).
+DATABASE_POOL = (
+    os.getenv("DATABASE_POOL", "True") != "False"
+    and importlib.util.find_spec("psycopg_pool") is not None
+)
+DATABASE_POOL_MAX_SIZE = int(
+    os.getenv("DATABASE_POOL_MAX_SIZE", os.getenv("GUNICORN_THREADS", "1"))
+)
+DATABASE_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", DATABASE_POOL_MAX_SIZE)),
+    "max_size": DATABASE_POOL_MAX_SIZE,
+    "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "5")),
+    "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", "600")),
+}
+# Connection waits longer than this many seconds are logged.
+DATABASE_POOL_WAIT_WARNING = float(os.getenv("DATABASE_POOL_WAIT_WARNING", "0.1"))
+# Add the pool occupancy of each alias to the Server-Timing header. It tells
+# clients about the server's capacity, so it is off unless DEBUG is on.
+SERVER_TIMING_POOL = os.getenv("SERVER_TIMING_POOL", str(DEBUG)) != "False"
+
+
+def database(url, engine=None):
+    """Returns the settings for a database URL, pooled if it is Postgres."""
+    config = dj_database_url.parse(
+        url, engine=engine, conn_max_age=600, conn_health_checks=True
+    )
+    if config["ENGINE"] == "django.db.backends.postgresql":
+        # Times connection checkout for the Server-Timing header.
+        config["ENGINE"] = "mha_api.postgresql"
+        if DATABASE_POOL:
+            config["CONN_MAX_AGE"] = 0  # Connections go back to the pool.
+            config.setdefault("OPTIONS", {})["pool"] = dict(DATABASE_POOL_OPTIONS)
+    return config
+
+
 if os.getenv("DATABASE_URL"):
     DATABASES = {
-        "default": dj_database_url.config(
-            conn_max_age=600,
-            engine="django.db.backends.postgresql",
+        "default": database(
+            os.environ["DATABASE_URL"], engine="django.db.backends.postgresql"
         )
     }
 else:
@@ -85,6 +131,24 @@ else:
         }
     }
 
+# Read replicas as a comma-separated list of URLs, e.g.
+# DATABASE_REPLICA_URLS=postgres://...,postgres://... (or
+# sqlite:///replica.sqlite3 locally). Safe requests under REPLICA_READ_PATHS
+# read from them; writes and everything else use the primary. A client that
+# wrote reads from the primary for REPLICA_STICKY_SECONDS.
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+    u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = database(url)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["mha_api.routers.PrimaryReplicaRouter"]
+REPLICA_READ_PATHS = ["/api/characters/"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +189,56 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "mha_api", "media")
 
+# Media and static files are served by mha_api.serve in every environment.
+# Behind nginx set SENDFILE_HEADER=X-Accel-Redirect and map the internal
+# SENDFILE_*_LOCATION prefixes to the folders; Apache and lighttpd use
+# X-Sendfile with the absolute file path instead.
+SERVE_FILES = os.getenv("SERVE_FILES", "True") != "False"
+SENDFILE_HEADER = os.getenv("SENDFILE_HEADER", "")
+SENDFILE_MEDIA_LOCATION = os.getenv("SENDFILE_MEDIA_LOCATION", "/internal/media/")
+SENDFILE_STATIC_LOCATION = os.getenv("SENDFILE_STATIC_LOCATION", "/internal/static/")
+
+# Uploaded and seeded images are stored under the hash of their content, and
+# collectstatic (run by the build) adds a content hash to static file names.
+STORAGES = {
+    "default": {
+        "BACKEND": "characters.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "mha_api.storage.StaticFilesStorage",
+    },
+}
+
+# Regenerate thumbnail/WebP variants in a background thread after a character
+# image changes. Bulk generation is done with
+# `python manage.py generate_image_variants`.
+IMAGE_VARIANTS_ON_SAVE = os.getenv("IMAGE_VARIANTS_ON_SAVE", "True") != "False"
+
+# Serve the character list and detail endpoints from a per-worker in-memory
+# copy of the dataset, rechecking the cached dataset version every N seconds.
+# Workers only see each other's version bumps through a shared cache
+# (REDIS_URL); `check --deploy` fails without one.
+CHARACTERS_IN_MEMORY = os.getenv("CHARACTERS_IN_MEMORY", "False") != "False"
+CHARACTERS_IN_MEMORY_CHECK_INTERVAL = int(
+    os.getenv("CHARACTERS_IN_MEMORY_CHECK_INTERVAL", "30")
+)
+
+# Rate limits and the dataset version must be shared by all workers, so
+# production uses Redis; without REDIS_URL each process has its own cache.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -134,4 +248,39 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 20,
+    # Per-client token buckets for the character endpoints ("N/period" allows
+    # bursts of N), see characters/throttling.py. Searches and pages with a
+    # limit above CHARACTERS_EXPENSIVE_LIMIT or an offset above
+    # CHARACTERS_EXPENSIVE_OFFSET use the smaller expensive budget.
+    "DEFAULT_THROTTLE_RATES": {
+        "characters": os.getenv("THROTTLE_RATE", "120/min") or None,
+        "characters_expensive": os.getenv("THROTTLE_EXPENSIVE_RATE", "20/min")
+        or None,
+    },
+    # Number of proxies in front of the app (Render has one), so clients are
+    # told apart by the address the last proxy saw in X-Forwarded-For.
+    # `check --deploy` fails while it is unset and throttling is on.
+    "NUM_PROXIES": int(os.environ["NUM_PROXIES"]) if os.getenv("NUM_PROXIES") else None,
 }
+CHARACTERS_EXPENSIVE_LIMIT = int(os.getenv("CHARACTERS_EXPENSIVE_LIMIT", "100"))
+CHARACTERS_EXPENSIVE_OFFSET = int(os.getenv("CHARACTERS_EXPENSIVE_OFFSET", "1000"))
+
+# Requests under LOAD_SHED_PATHS get a 503 before reaching the view when they
+# queued longer than LOAD_SHED_QUEUE_SECONDS (measured from the proxy's
+# X-Request-Start header) or, for expensive ones, when the worker's recent
+# response time is above LOAD_SHED_LATENCY_SECONDS. 0 disables either check.
+LOAD_SHED_PATHS = ["/api/characters/"]
+LOAD_SHED_QUEUE_SECONDS = float(os.getenv("LOAD_SHED_QUEUE_SECONDS", "5"))
+LOAD_SHED_LATENCY_SECONDS = float(os.getenv("LOAD_SHED_LATENCY_SECONDS", "2"))
+
+SPECTACULAR_SETTINGS = {
+    # Loads the view documentation only when a schema is generated.
+    "DEFAULT_GENERATOR_CLASS": "characters.schema.SchemaGenerator",
+    # Tags and operationIds are derived from the path after this prefix
+    # ("characters", "characters_list"); generated clients depend on them.
+    "SCHEMA_PATH_PREFIX": "/api/",
+}
+
+# Schema generated at build time (`python manage.py spectacular --file ...`)
+# and served as a static file; generated per request when it is missing.
+OPENAPI_SCHEMA_FILE = os.getenv("OPENAPI_SCHEMA_FILE", BASE_DIR / "schema.yaml")
@@ -0,0 +1,26 @@
+"""
+Static files storage.
+"""
+
+from urllib.parse import unquote, urlsplit
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class StaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ``ManifestStaticFilesStorage`` that links files missing from the manifest
+    by their plain name instead of failing, so pages still render where
+    ``collectstatic`` has not run (local checkouts, tests).
+
+    Hashed names are served with far-future caching by ``mha_api.serve``;
+    plain names are revalidated, so clients never keep a stale asset.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        clean_name = urlsplit(unquote(name)).path.strip()
+        if self.hash_key(clean_name) not in self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -0,0 +1,136 @@
+"""
+Request timing and database pool instrumentation.
+
+``ServerTimingMiddleware`` reports where each request spent its time in a
+``Server-Timing`` response header, which browsers show in their dev tools and
+the gunicorn access log records (see ``gunicorn.conf.py``):
+
+- ``app``: time spent in Django;
+- ``db-connect``: time spent getting database connections, that is waiting
+  for a free connection in the pool or, without pooling, connecting;
+- ``db-pool``: with ``SERVER_TIMING_POOL`` on (the default under ``DEBUG``),
+  for each pooled alias, the connections in use (this request's included)
+  out of the pool maximum and the requests queued for one, e.g.
+  ``"default 4/4, 2 waiting"``.
+
+Requests that waited longer than ``DATABASE_POOL_WAIT_WARNING`` seconds for a
+connection and pools with requests queued are logged as warnings, and a
+request that timed out waiting gets a ``503`` with ``Retry-After`` instead of
+a ``500``.
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+
+try:
+    from psycopg_pool import PoolTimeout
+except ImportError:  # Pooling is only available with psycopg 3.
+    PoolTimeout = None
+
+logger = logging.getLogger(__name__)
+
+_connection_waits = ContextVar("connection_waits", default=None)
+
+
+def record_connection(alias, seconds):
+    """Adds the time spent getting a connection to the current request."""
+    waits = _connection_waits.get()
+    if waits is not None:
+        waits[alias] = waits.get(alias, 0.0) + seconds
+
+
+def pool_stats():
+    """
+    Returns the state of this process' connection pools.
+
+    Returns:
+        dict: ``{alias: {"size": ..., "max": ..., "available": ...,
+        "waiting": ...}}`` for every alias that uses a pool.
+    """
+    stats = {}
+    for conn in connections.all(initialized_only=True):
+        pool = getattr(conn, "pool", None)
+        if pool is None:
+            continue
+        pool_stats = pool.get_stats()
+        stats[conn.alias] = {
+            "size": pool_stats.get("pool_size", 0),
+            "max": pool_stats.get("pool_max", 0),
+            "available": pool_stats.get("pool_available", 0),
+            "waiting": pool_stats.get("requests_waiting", 0),
+        }
+    return stats
+
+
+def is_pool_timeout(exception):
+    """Returns True if ``exception`` is a timeout waiting for a pooled connection."""
+    return (
+        PoolTimeout is not None
+        and isinstance(exception, OperationalError)
+        and isinstance(exception.__cause__, PoolTimeout)
+    )
+
+
+class ServerTimingMiddleware:
+    """Adds the ``Server-Timing`` header and logs connection pool pressure."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        waits = {}
+        token = _connection_waits.set(waits)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _connection_waits.reset(token)
+        duration = time.perf_counter() - start
+
+        metrics = [f"app;dur={duration * 1000:.1f}"]
+        if waits:
+            wait = sum(waits.values())
+            metrics.append(f"db-connect;dur={wait * 1000:.1f}")
+            if wait > settings.DATABASE_POOL_WAIT_WARNING:
+                logger.warning(
+                    "%s %s waited %.3fs for a database connection",
+                    request.method,
+                    request.path,
+                    wait,
+                )
+        for alias, stats in pool_stats().items():
+            in_use = stats["size"] - stats["available"]
+            if settings.SERVER_TIMING_POOL:
+                metrics.append(
+                    f'db-pool;desc="{alias} {in_use}/{stats["max"]}, '
+                    f'{stats["waiting"]} waiting"'
+                )
+            if stats["waiting"]:
+                logger.warning(
+                    "Connection pool %r saturated: %d/%d in use, %d waiting",
+                    alias,
+                    in_use,
+                    stats["max"],
+                    stats["waiting"],
+                )
+        response["Server-Timing"] = ", ".join(metrics)
+        return response
+
+    def process_exception(self, request, exception):
+        if not is_pool_timeout(exception):
+            return None
+        logger.error(
+            "%s %s timed out waiting for a database connection",
+            request.method,
+            request.path,
+        )
+        response = HttpResponse(
+            "Service temporarily unavailable.", status=503, content_type="text/plain"
+        )
+        response["Retry-After"] = "1"
+        return response
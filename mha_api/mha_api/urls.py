@@ -1,21 +1,36 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-)
+from django.urls import path, include, re_path
+
+from .docs import redoc_view, schema_view, swagger_view
+from .serve import serve_file
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("characters.urls")),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "api/docs/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
-    path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path("api/schema/", schema_view, name="schema"),
+    path("api/docs/", swagger_view, name="swagger-ui"),
+    path("api/redoc/", redoc_view, name="redoc"),
+]
+
+if settings.SERVE_FILES:
+    urlpatterns += [
+        re_path(
+            r"^%s(?P<path>.*)$" % settings.MEDIA_URL.lstrip("/"),
+            serve_file,
+            {
+                "document_root": settings.MEDIA_ROOT,
+                "url_prefix": settings.SENDFILE_MEDIA_LOCATION,
+            },
+            name="media",
+        ),
+        re_path(
+            r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"),
+            serve_file,
+            {
+                "document_root": settings.STATIC_ROOT,
+                "url_prefix": settings.SENDFILE_STATIC_LOCATION,
+            },
+            name="static",
+        ),
+    ]
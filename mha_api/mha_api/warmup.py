@@ -0,0 +1,115 @@
+"""
+Worker warm-up.
+
+``preload`` runs once in the gunicorn master (with ``preload_app``) and
+imports everything a request touches, so forked workers share those pages
+instead of importing them on their first request. ``warm_up`` runs in each
+worker after the fork and primes the per-process state that cannot be
+shared: database connections, the in-memory store, the prebuilt schema and
+the lazily built caches of the URL resolver and serializers. It does so by
+sending a few internal requests through the full middleware stack.
+"""
+
+import io
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Requests sent through the WSGI handler to warm each worker.
+WARMUP_PATHS = [
+    "/api/characters/?limit=1",
+    "/api/characters/?limit=1&search=a",
+]
+
+
+def preload():
+    """Imports the request path modules in the master process."""
+    import characters.views  # noqa: F401
+    import rest_framework.pagination  # noqa: F401
+    from django.urls import get_resolver
+
+    get_resolver().resolve("/api/characters/")
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and not host.startswith(".") and host != "*":
+            return host
+    return "localhost"
+
+
+def wsgi_environ(path, headers=None):
+    """
+    Builds a minimal WSGI environ for a GET request to ``path``, with extra
+    request headers given as a ``{"If-None-Match": ...}`` style dict.
+    """
+    path, _, query = path.partition("?")
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SCRIPT_NAME": "",
+        "SERVER_NAME": _host(),
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": _host(),
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0),
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        **{
+            f"HTTP_{name.upper().replace('-', '_')}": value
+            for name, value in (headers or {}).items()
+        },
+    }
+
+
+def warm_up(application=None, paths=WARMUP_PATHS):
+    """
+    Primes a worker before it accepts traffic.
+
+    Args:
+        application: The WSGI application, defaults to ``mha_api.wsgi``.
+        paths (list[str]): Paths requested through the application.
+
+    Returns:
+        float: Seconds spent warming up.
+    """
+    start = time.perf_counter()
+    if application is None:
+        from mha_api.wsgi import application
+
+    from mha_api.docs import get_schema_file
+
+    get_schema_file()
+
+    for path in paths:
+        statuses = []
+        body = application(
+            wsgi_environ(path), lambda status, headers: statuses.append(status)
+        )
+        for _ in body:
+            pass
+        if hasattr(body, "close"):
+            body.close()
+        if not statuses or not statuses[0].startswith("200"):
+            logger.warning("Warm-up request %s returned %s", path, statuses)
+
+    # Opened last, since request_finished closes connections that have no
+    # CONN_MAX_AGE; persistent ones stay open for the first real request, and
+    # opening a pooled one opens (and fills) the worker's pool.
+    for conn in connections.all():
+        try:
+            conn.ensure_connection()
+        except Exception as e:  # A down replica must not stop the worker.
+            logger.warning("Could not connect to database %r: %s", conn.alias, e)
+
+    return time.perf_counter() - start
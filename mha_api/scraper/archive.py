@@ -0,0 +1,149 @@
+"""
+Append-only archive of the raw HTML fetched by scrape runs, so fixes to the
+parsing helpers can be applied by re-extracting from disk instead of
+re-downloading the wiki.
+
+Each run writes one ``<run_id>.pages`` file holding a gzip member per page,
+plus a ``<run_id>.index`` NDJSON file recording the URL, offset and length of
+every member. Both files are only ever appended to, so an interrupted run
+leaves a usable archive behind, and a resumed run reopens the archive of its
+``ScrapeRun`` (see ``checkpoint.ScrapeRun.archive_id``) to add the rest.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(BASE_DIR, "archive")
+
+
+def new_run_id():
+    """Returns a sortable identifier for a new scrape run."""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def archive_path(run_id, folder=ARCHIVE_DIR):
+    """Returns the ``.pages`` file of a run's archive."""
+    return os.path.join(folder, f"{run_id}.pages")
+
+
+def index_path(pages_path):
+    """Returns the index file belonging to an archive's pages file."""
+    return os.path.splitext(pages_path)[0] + ".index"
+
+
+class PageArchiveWriter:
+    """
+    Appends fetched pages to a run's archive.
+
+    Attributes:
+        path (str): The ``.pages`` file receiving compressed pages.
+    """
+
+    def __init__(self, run_id=None, folder=ARCHIVE_DIR):
+        os.makedirs(folder, exist_ok=True)
+        self.path = archive_path(run_id or new_run_id(), folder)
+        self._pages = open(self.path, "ab")
+        self._index = open(index_path(self.path), "a", encoding="utf-8")
+
+    def add(self, url, html, status=200):
+        """
+        Compresses and appends one page, then records it in the index.
+
+        Args:
+            url (str): The page URL.
+            html (str | bytes): The page content.
+            status (int): The response status code.
+        """
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        member = gzip.compress(html, compresslevel=6, mtime=0)
+        offset = self._pages.tell()
+        self._pages.write(member)
+        self._pages.flush()
+        entry = {"url": url, "offset": offset, "length": len(member), "status": status}
+        self._index.write(json.dumps(entry) + "\n")
+        self._index.flush()
+
+    def close(self):
+        """Closes the archive files."""
+        self._pages.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PageArchiveReader:
+    """
+    Random access to the pages of an archive by URL. When a URL was fetched
+    more than once, the latest copy wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        with open(index_path(path), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can truncate the last index line.
+                    continue
+                self.entries[entry["url"]] = entry
+        self._pages = open(path, "rb")
+
+    def urls(self):
+        """Returns the archived URLs in the order they were first fetched."""
+        return list(self.entries)
+
+    def get(self, url):
+        """
+        Returns the decompressed HTML of an archived page.
+
+        Raises:
+            KeyError: If the URL is not in the archive.
+        """
+        entry = self.entries[url]
+        self._pages.seek(entry["offset"])
+        return gzip.decompress(self._pages.read(entry["length"])).decode("utf-8")
+
+    def close(self):
+        """Closes the archive file."""
+        self._pages.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArchivingSession:
+    """
+    Wraps a session and archives every HTML page it fetches.
+    """
+
+    def __init__(self, session, writer):
+        self.session = session
+        self.writer = writer
+
+    def get(self, url, **kwargs):
+        res = self.session.get(url, **kwargs)
+        content_type = res.headers.get("Content-Type", "text/html")
+        if content_type.startswith("text/html"):
+            self.writer.add(url, res.content, res.status_code)
+        return res
+
+
+def latest_archive(folder=ARCHIVE_DIR):
+    """Returns the path of the most recent archive, or None."""
+    if not os.path.isdir(folder):
+        return None
+    runs = sorted(name for name in os.listdir(folder) if name.endswith(".pages"))
+    return os.path.join(folder, runs[-1]) if runs else None
@@ -0,0 +1,176 @@
+"""
+Offline benchmark for the scraper's extraction pipeline. Replays every page in
+the recorded corpus through scrape_character and reports pages/second and peak
+memory. With --update-golden it instead rewrites the golden outputs used by the
+regression tests, after an intentional parser change.
+
+Usage:
+    python benchmark.py [--iterations N] [--json]
+    python benchmark.py --update-golden
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+from replay import CORPUS_DIR, Corpus, ReplaySession
+from scrape_characters import scrape_character
+from utils import (
+    dedupe_affiliations,
+    extract_aliases,
+    extract_quirks,
+    parse_affiliations,
+)
+
+GOLDEN_DIR = os.path.join(CORPUS_DIR, "golden")
+PAGES_GOLDEN = os.path.join(GOLDEN_DIR, "pages.json")
+UTILS_GOLDEN = os.path.join(GOLDEN_DIR, "utils.json")
+
+# Raw infobox values exercising the edge cases each helper handles.
+UTILS_CASES = {
+    "extract_quirks": [
+        "Explosion",
+        "Quirkless | (Formerly) | One For All | Blackwhip | (Daigoro Banjo)",
+        "Half-Cold Half-Hot (Half-Cold Half-Hot)",
+        "Fierce Wings (Formerly) | Erasure (Aizawa)",
+        "",
+    ],
+    "parse_affiliations": [
+        "Aldera Junior High | (Formerly) | U.A. High School | [ | 3 | ]",
+        "Korusan Chgakk | (Formerly) | ( | U.A. High School | ) | ?",
+        "League of Villains | (Formerly) | Paranormal Liberation Front | 敵連合",
+        "Endeavor Agency | (formerly) | , | Hero Public Safety Commission",
+        "",
+    ],
+    "extract_aliases": [
+        '<div data-source="alias"><div class="pi-data-value">'
+        "Deku (デク<i>Deku</i>)<br>Izu-kun<br>Nerd<br>Chosen One</div></div>",
+        '<div data-source="alias"><div class="pi-data-value">'
+        "Kacchan<br>Kacchan<br>[4]<br>lowercase alias<br>( , ? )</div></div>",
+        '<div data-source="alias"></div>',
+        "<p>No alias field</p>",
+    ],
+    "dedupe_affiliations": [
+        [{"name": "U.A. High School"}, {"name": "U.A. High School", "note": "Formerly"}],
+        [{"name": "U.A. High School", "note": "Formerly"}, {"name": "U.A. High School"}],
+        [{"name": "Class 1-A"}, {"name": "Class 1-B"}, {"name": "Class 1-A"}],
+        [],
+    ],
+}
+
+
+def run_utils_cases():
+    """
+    Runs every helper over its cases.
+
+    Returns:
+        dict: Helper name mapped to a list of {"input", "output"} pairs.
+    """
+    helpers = {
+        "extract_quirks": extract_quirks,
+        "parse_affiliations": parse_affiliations,
+        "extract_aliases": lambda html: extract_aliases(
+            BeautifulSoup(html, "html.parser")
+        ),
+        "dedupe_affiliations": lambda affs: dedupe_affiliations(
+            [dict(aff) for aff in affs]
+        ),
+    }
+    return {
+        name: [{"input": case, "output": helpers[name](case)} for case in cases]
+        for name, cases in UTILS_CASES.items()
+    }
+
+
+def scrape_corpus(session, image_folder, urls=None):
+    """
+    Scrapes every recorded page through the given session.
+
+    Args:
+        session: A ReplaySession, or a wrapper around one when urls is given.
+        image_folder (str): Destination folder for replayed images.
+        urls (list[str]): Pages to scrape, defaults to the session's corpus.
+
+    Returns:
+        dict: Page URL mapped to the extracted character data.
+    """
+    if urls is None:
+        urls = session.corpus.urls()
+    # scrape_character reports missing infoboxes with print; keep output clean.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            url: scrape_character(url, session=session, image_folder=image_folder)
+            for url in urls
+        }
+
+
+def benchmark(iterations):
+    """
+    Replays the corpus repeatedly and measures throughput and peak memory.
+
+    Args:
+        iterations (int): Number of passes over the corpus.
+
+    Returns:
+        dict: Pages processed, elapsed seconds, pages/second and peak memory.
+    """
+    session = ReplaySession(Corpus())
+    pages = 0
+    with tempfile.TemporaryDirectory() as image_folder:
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            pages += len(scrape_corpus(session, image_folder))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "pages": pages,
+        "seconds": round(elapsed, 4),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def update_golden():
+    """Rewrites the golden outputs from the current parser behaviour."""
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory() as image_folder:
+        pages = scrape_corpus(ReplaySession(Corpus()), image_folder)
+    for path, data in ((PAGES_GOLDEN, pages), (UTILS_GOLDEN, run_utils_cases())):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper offline.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print JSON only.")
+    parser.add_argument(
+        "--update-golden",
+        action="store_true",
+        help="Rewrite the golden outputs instead of benchmarking.",
+    )
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden()
+    else:
+        result = benchmark(args.iterations)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['pages']} pages in {result['seconds']}s: "
+                f"{result['pages_per_second']} pages/s, "
+                f"peak memory {result['peak_memory_kib']} KiB"
+            )
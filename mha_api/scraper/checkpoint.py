@@ -0,0 +1,175 @@
+"""
+Checkpointing helpers for resumable scrape runs. Each scraped character is
+appended to an NDJSON file as soon as it completes, and its URL is recorded in
+a checkpoint file so an interrupted run can pick up where it stopped. Once a
+run finishes, the NDJSON output is compacted into the JSON/JSONC formats used
+by the seeder. The run also records which page archive it writes to, so a
+resumed run keeps appending to the archive of the pages fetched before it.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+from archive import new_run_id
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_DIR = os.path.join(BASE_DIR, "runs")
+
+
+class ScrapeRun:
+    """
+    An append-only record of a scrape run.
+
+    Attributes:
+        ndjson_path (str): File receiving one JSON character per line.
+        checkpoint_path (str): File receiving one finished URL per line.
+        archive_id_path (str): File holding the id of the run's page archive.
+    """
+
+    def __init__(self, run_dir=RUN_DIR):
+        os.makedirs(run_dir, exist_ok=True)
+        self.ndjson_path = os.path.join(run_dir, "characters.ndjson")
+        self.checkpoint_path = os.path.join(run_dir, "checkpoint.txt")
+        self.archive_id_path = os.path.join(run_dir, "archive.txt")
+        self._ndjson = None
+        self._checkpoint = None
+
+    def exists(self):
+        """Returns True if a previous run left a checkpoint behind."""
+        return os.path.exists(self.checkpoint_path)
+
+    def completed(self):
+        """
+        Returns the URLs finished by previous runs.
+
+        Returns:
+            set[str]: URLs recorded in the checkpoint file.
+        """
+        if not self.exists():
+            return set()
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def archive_id(self, create=True):
+        """
+        Returns the id of the page archive (see archive.PageArchiveWriter)
+        holding this run's pages, starting a new one unless ``create`` is
+        False, in which case None is returned for runs without an archive.
+        """
+        if os.path.exists(self.archive_id_path):
+            with open(self.archive_id_path, encoding="utf-8") as f:
+                return f.read().strip()
+        if not create:
+            return None
+        run_id = new_run_id()
+        with open(self.archive_id_path, "w", encoding="utf-8") as f:
+            f.write(run_id + "\n")
+        return run_id
+
+    def reset(self):
+        """Discards the output, checkpoint and archive id of previous runs."""
+        self.close()
+        for path in (self.ndjson_path, self.checkpoint_path, self.archive_id_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def record(self, url, data=None):
+        """
+        Appends a finished URL, and its character data if any, to the run.
+
+        The character is written before the checkpoint entry, so a crash in
+        between only causes the URL to be scraped again on resume.
+
+        Args:
+            url (str): The character's wiki page URL.
+            data (dict): Extracted character data, or None for skipped pages.
+        """
+        if self._ndjson is None:
+            self._ndjson = open(self.ndjson_path, "a", encoding="utf-8")
+            self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+
+        if data is not None:
+            self._ndjson.write(json.dumps(data, ensure_ascii=False) + "\n")
+            _sync(self._ndjson)
+        self._checkpoint.write(url + "\n")
+        _sync(self._checkpoint)
+
+    def close(self):
+        """Closes the output files of the run."""
+        for f in (self._ndjson, self._checkpoint):
+            if f is not None:
+                f.close()
+        self._ndjson = self._checkpoint = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def iter_ndjson(path):
+    """
+    Yields the characters stored in an NDJSON file, skipping a truncated
+    last line left behind by a crash.
+
+    Args:
+        path (str): Path to the NDJSON file.
+
+    Yields:
+        dict: One character per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed NDJSON line: {line[:80]}")
+
+
+def compact(ndjson_path, json_path, jsonc_path=None):
+    """
+    Compacts a run's NDJSON output into the JSON (and optionally JSONC)
+    formats the seeder expects. Characters scraped more than once keep their
+    latest entry, in the order they were first scraped.
+
+    Args:
+        ndjson_path (str): Path to the run's NDJSON file.
+        json_path (str): Destination of the JSON array.
+        jsonc_path (str): Optional destination of a commented JSONC copy.
+
+    Returns:
+        int: Number of characters written.
+    """
+    characters = {}
+    for data in iter_ndjson(ndjson_path):
+        characters[data["url"]] = data
+    all_characters = list(characters.values())
+
+    _write_atomic(
+        json_path, json.dumps(all_characters, indent=2, ensure_ascii=False)
+    )
+    if jsonc_path:
+        generated = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        header = f"// Generated from {os.path.basename(ndjson_path)} on {generated}\n"
+        _write_atomic(
+            jsonc_path,
+            header + json.dumps(all_characters, indent=2, ensure_ascii=False),
+        )
+    return len(all_characters)
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
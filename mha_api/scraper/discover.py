@@ -0,0 +1,202 @@
+"""
+Discovery crawler that finds character URLs by walking the wiki's category
+listing pages instead of relying on a hand-maintained list.
+
+Each category is split into alphabetical shards (``?from=A``, ``?from=B``, ...)
+that are crawled concurrently, following "next page" links until a shard runs
+into the next one. Member pages go through a deduplicating frontier, redirects
+are resolved in batches through the MediaWiki API (so ``Katsuki_Bakugo`` and
+``Dynamight`` map to the same page), and canonical URLs are yielded as soon as
+they are known so scraping can start while discovery is still running.
+"""
+
+import string
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote, unquote, urlencode, urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+WIKI_ROOT = "https://myheroacademia.fandom.com"
+API_URL = f"{WIKI_ROOT}/api.php"
+CATEGORIES = ["Characters"]
+
+# Pages in these namespaces are never characters.
+SKIPPED_NAMESPACES = ("Category:", "File:", "Template:", "User:", "Help:", "Special:")
+
+# Maximum number of titles per MediaWiki API query.
+API_BATCH_SIZE = 50
+
+
+def title_to_url(title):
+    """Returns the wiki URL of a page title."""
+    return f"{WIKI_ROOT}/wiki/{quote(title.replace(' ', '_'), safe=':/()!,-._')}"
+
+
+def url_to_title(url):
+    """Returns the page title of a wiki URL."""
+    return unquote(urlparse(url).path.split("/wiki/", 1)[-1]).replace("_", " ")
+
+
+def category_shards(category):
+    """
+    Splits a category into alphabetical shards that can be crawled in parallel.
+
+    Returns:
+        list[tuple]: (listing URL, lower bound, upper bound) per shard, where
+        the bounds are the first letters covered by the shard (None if open).
+    """
+    base = f"{WIKI_ROOT}/wiki/Category:{category.replace(' ', '_')}"
+    letters = string.ascii_uppercase
+    shards = [(base, None, letters[0])]
+    for i, letter in enumerate(letters):
+        upper = letters[i + 1] if i + 1 < len(letters) else None
+        shards.append((f"{base}?{urlencode({'from': letter})}", letter, upper))
+    return shards
+
+
+def parse_listing(html, page_url):
+    """
+    Extracts member titles and the next-page link from a category listing.
+
+    Args:
+        html (str): The listing page HTML.
+        page_url (str): URL of the listing, used to resolve relative links.
+
+    Returns:
+        tuple: (list of member page titles, next listing URL or None).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    titles = []
+    for link in soup.select("a.category-page__member-link"):
+        title = link.get("title") or url_to_title(urljoin(page_url, link["href"]))
+        if not title.startswith(SKIPPED_NAMESPACES):
+            titles.append(title)
+
+    next_link = soup.select_one("a.category-page__pagination-next")
+    next_url = urljoin(page_url, next_link["href"]) if next_link else None
+    return titles, next_url
+
+
+def _in_shard(title, lower, upper):
+    key = title[:1].upper()
+    return (lower is None or key >= lower) and (upper is None or key < upper)
+
+
+def crawl_shard(session, url, lower, upper):
+    """
+    Fetches one listing page of a shard.
+
+    Returns:
+        tuple: (member titles within the shard, next URL if the shard continues).
+    """
+    res = session.get(url)
+    res.raise_for_status()
+    titles, next_url = parse_listing(res.text, url)
+    in_shard = [t for t in titles if _in_shard(t, lower, upper)]
+    # The listing is sorted, so a page spilling into the next shard ends this one.
+    if upper is not None and any(t[:1].upper() >= upper for t in titles):
+        next_url = None
+    return in_shard, next_url
+
+
+def resolve_redirects(session, titles):
+    """
+    Maps page titles to their canonical titles through the MediaWiki API.
+
+    Args:
+        session: Object providing ``get``, e.g. the requests module.
+        titles (list[str]): Up to API_BATCH_SIZE page titles.
+
+    Returns:
+        dict: Each requested title mapped to its canonical title, or None if
+        the page does not exist.
+    """
+    params = {
+        "action": "query",
+        "titles": "|".join(titles),
+        "redirects": 1,
+        "format": "json",
+        "formatversion": 2,
+    }
+    res = session.get(f"{API_URL}?{urlencode(params)}")
+    res.raise_for_status()
+    query = res.json().get("query", {})
+
+    normalized = {n["from"]: n["to"] for n in query.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in query.get("redirects", [])}
+    missing = {p["title"] for p in query.get("pages", []) if p.get("missing")}
+
+    resolved = {}
+    for title in titles:
+        canonical = normalized.get(title, title)
+        canonical = redirects.get(canonical, canonical)
+        resolved[title] = None if canonical in missing else canonical
+    return resolved
+
+
+def discover_character_urls(session=requests, categories=CATEGORIES, workers=8):
+    """
+    Crawls category listings concurrently and yields canonical character URLs.
+
+    Args:
+        session: Object providing ``get``, e.g. the requests module or a
+            replay.ReplaySession for offline runs.
+        categories (list[str]): Category names to walk.
+        workers (int): Number of listing pages fetched concurrently.
+
+    Yields:
+        str: Canonical character page URLs, each exactly once.
+    """
+    seen_listings = set()
+    seen_titles = set()
+    seen_canonical = set()
+    pending_titles = []
+
+    def flush():
+        for i in range(0, len(pending_titles), API_BATCH_SIZE):
+            batch = pending_titles[i : i + API_BATCH_SIZE]
+            try:
+                resolved = resolve_redirects(session, batch)
+            except requests.RequestException as e:
+                print(f"Failed to resolve redirects, using titles as-is: {e}")
+                resolved = {title: title for title in batch}
+            for canonical in resolved.values():
+                if canonical and canonical not in seen_canonical:
+                    seen_canonical.add(canonical)
+                    yield title_to_url(canonical)
+        pending_titles.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+
+        def submit(url, lower, upper):
+            if url not in seen_listings:
+                seen_listings.add(url)
+                future = pool.submit(crawl_shard, session, url, lower, upper)
+                futures[future] = (url, lower, upper)
+
+        for category in categories:
+            for shard in category_shards(category):
+                submit(*shard)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, lower, upper = futures.pop(future)
+                try:
+                    titles, next_url = future.result()
+                except requests.RequestException as e:
+                    print(f"Failed to crawl listing {url}: {e}")
+                    continue
+                if next_url:
+                    submit(next_url, lower, upper)
+                for title in titles:
+                    if title not in seen_titles:
+                        seen_titles.add(title)
+                        pending_titles.append(title)
+                if len(pending_titles) >= API_BATCH_SIZE:
+                    yield from flush()
+
+    if pending_titles:
+        yield from flush()
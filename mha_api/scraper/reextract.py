@@ -0,0 +1,113 @@
+"""
+Re-runs the extraction logic over an archive of raw pages, without any network
+access, to regenerate the character JSON after a parsing fix. Pages are split
+into chunks and extracted across a process pool using every CPU core.
+
+Images are not downloaded again: characters keep the image already saved in
+the media folder under their usual filename.
+
+By default the archive of the run in ``--run-dir`` is used, which holds the
+pages of every resume of that run, falling back to the latest archive.
+
+Usage:
+    python reextract.py [<archive.pages>] [--run-dir DIR] [--workers N]
+        [--output PATH]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from archive import PageArchiveReader, archive_path, latest_archive
+from checkpoint import RUN_DIR, ScrapeRun
+from scrape_characters import JSON_PATH, MEDIA_DIR, extract_character, image_filename
+
+_reader = None
+
+
+def _open_archive(path):
+    global _reader
+    _reader = PageArchiveReader(path)
+
+
+def _extract_chunk(job):
+    urls, image_folder = job
+    characters = []
+    # Keep "No infobox found" chatter from interleaving across processes.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for url in urls:
+            character, image_url = extract_character(_reader.get(url), url)
+            if image_url and "name" in character:
+                filename = image_filename(character)
+                if os.path.exists(os.path.join(image_folder, filename)):
+                    character["image"] = f"characters/{filename}"
+            characters.append(character)
+    return characters
+
+
+def reextract(path, workers=None, image_folder=MEDIA_DIR, chunk_size=25):
+    """
+    Extracts every page of an archive across a process pool.
+
+    Args:
+        path (str): Path to the archive's ``.pages`` file.
+        workers (int): Number of worker processes, defaults to the CPU count.
+        image_folder (str): Folder holding previously downloaded images.
+        chunk_size (int): Number of pages handed to a worker at a time.
+
+    Returns:
+        list[dict]: Extracted characters in archive order, skipping pages
+        without a character name.
+    """
+    with PageArchiveReader(path) as reader:
+        urls = reader.urls()
+    chunks = [
+        (urls[i : i + chunk_size], image_folder)
+        for i in range(0, len(urls), chunk_size)
+    ]
+
+    characters = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_open_archive, initargs=(path,)
+    ) as pool:
+        for chunk in pool.map(_extract_chunk, chunks):
+            characters.extend(c for c in chunk if "name" in c)
+    return characters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-extract character data from an archive of raw pages."
+    )
+    parser.add_argument(
+        "archive",
+        nargs="?",
+        help="Archive .pages file (default: the archive of --run-dir's run).",
+    )
+    parser.add_argument("--run-dir", default=RUN_DIR, help="Run output folder.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=JSON_PATH, help="Output JSON path.")
+    args = parser.parse_args()
+
+    path = args.archive
+    if not path:
+        run_id = ScrapeRun(args.run_dir).archive_id(create=False)
+        path = archive_path(run_id) if run_id else latest_archive()
+    if not path:
+        sys.exit("No archive found; run scrape_characters.py first.")
+
+    start = time.perf_counter()
+    characters = reextract(path, args.workers)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(characters, f, indent=2, ensure_ascii=False)
+    print(
+        f"Re-extracted {len(characters)} characters from {path} "
+        f"in {elapsed:.2f}s; wrote {args.output}"
+    )
@@ -0,0 +1,170 @@
+"""
+Recorded-page transport for running the scraper offline. Pages and images are
+stored gzip-compressed in a corpus folder with a JSON index keyed by URL. A
+RecordingSession fetches live pages and adds them to the corpus; a
+ReplaySession serves them back with the subset of the requests API the
+scraper uses, so scrape_character can run without network access.
+
+Usage:
+    python replay.py record <url> [<url> ...]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+from urllib.parse import unquote, urlparse
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, "corpus")
+
+
+class MissingRecording(requests.RequestException):
+    """Raised when a replayed URL is not present in the corpus."""
+
+
+class ReplayResponse:
+    """
+    Minimal stand-in for requests.Response built from a recording.
+    """
+
+    def __init__(self, url, status_code, content, headers):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}")
+
+
+class Corpus:
+    """
+    A folder of gzip-compressed recordings with an index.json mapping each URL
+    to its file, status code and content type.
+    """
+
+    def __init__(self, folder=CORPUS_DIR):
+        self.folder = folder
+        self.index_path = os.path.join(folder, "index.json")
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def urls(self, content_type="text/html"):
+        """Returns the recorded URLs whose content type starts with the given prefix."""
+        return [
+            url
+            for url, entry in self.index.items()
+            if entry["content_type"].startswith(content_type)
+        ]
+
+    def load(self, url):
+        """
+        Returns the recorded response for a URL.
+
+        Raises:
+            MissingRecording: If the URL has not been recorded.
+        """
+        entry = self.index.get(url)
+        if entry is None:
+            raise MissingRecording(f"No recording for {url}")
+        with gzip.open(os.path.join(self.folder, entry["file"]), "rb") as f:
+            content = f.read()
+        return ReplayResponse(
+            url, entry["status"], content, {"Content-Type": entry["content_type"]}
+        )
+
+    def save(self, url, content, status=200, content_type="text/html"):
+        """
+        Stores a recording and updates the index.
+
+        Args:
+            url (str): The recorded URL.
+            content (bytes): The response body.
+            status (int): The response status code.
+            content_type (str): The response content type.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        filename = _recording_name(url)
+        # mtime=0 keeps re-recording identical pages byte-for-byte reproducible.
+        with gzip.GzipFile(
+            os.path.join(self.folder, filename), "wb", compresslevel=9, mtime=0
+        ) as f:
+            f.write(content)
+        self.index[url] = {
+            "file": filename,
+            "status": status,
+            "content_type": content_type,
+        }
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def _recording_name(url):
+    # Image URLs end in "/revision/latest/...", so prefer the last segment that
+    # looks like a filename to keep recordings recognisable.
+    segments = [unquote(p) for p in urlparse(url).path.split("/") if p]
+    named = [p for p in segments if "." in p]
+    tail = (named or segments or ["index"])[-1]
+    tail = "".join(c if c.isalnum() or c in "-_." else "_" for c in tail)[:60]
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:10]
+    return f"{tail}-{digest}.gz"
+
+
+class ReplaySession:
+    """
+    Serves recorded responses in place of the requests module.
+    """
+
+    def __init__(self, corpus=None):
+        self.corpus = corpus or Corpus()
+
+    def get(self, url, **kwargs):
+        return self.corpus.load(url)
+
+
+class RecordingSession:
+    """
+    Fetches live responses and records them into the corpus.
+    """
+
+    def __init__(self, corpus=None):
+        self.corpus = corpus or Corpus()
+        self.session = requests.Session()
+
+    def get(self, url, **kwargs):
+        res = self.session.get(url, **kwargs)
+        content_type = res.headers.get("Content-Type", "text/html").split(";")[0]
+        self.corpus.save(url, res.content, res.status_code, content_type)
+        return res
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "record":
+        sys.exit(__doc__)
+
+    from scrape_characters import scrape_character
+
+    recorder = RecordingSession()
+    for url in sys.argv[2:]:
+        # Scraping through the recorder also captures the character's images.
+        scrape_character(url, session=recorder)
+        print(f"Recorded {url}")
@@ -1,16 +1,23 @@
 """
 Scraper for character data from the MHA wiki. Extracts key info such as name, kanji,
-aliases, quirks, affiliations, and downloads images. Outputs to a JSON file.
+aliases, quirks, affiliations, and downloads images. Each character is appended
+to an NDJSON file as it completes and runs can be resumed from a checkpoint; the
+final output is compacted into a JSON file (and optionally JSONC).
 """
 
+import argparse
 import os
 import random
+import sys
 import time
-from json import dump
 from pprint import pprint
 
 import requests
+from archive import ArchivingSession, PageArchiveWriter
 from bs4 import BeautifulSoup
+from character_urls import character_urls
+from checkpoint import RUN_DIR, ScrapeRun, compact
+from discover import discover_character_urls
 from slugify import slugify
 from utils import (
     dedupe_affiliations,
@@ -26,24 +33,26 @@ MEDIA_DIR = os.path.join(PROJECT_ROOT, "mha_api", "media", "characters")
 JSON_PATH = os.path.join(PROJECT_ROOT, "mha_api", "characters.json")
 
 
-def scrape_character(url):
+def extract_character(html, url):
     """
-    Scrapes character data from a given MHA wiki character URL.
+    Extracts character data from the HTML of an MHA wiki character page,
+    without any network access.
 
     Args:
+        html (str): The character page HTML.
         url (str): The character's wiki page URL.
 
     Returns:
-        dict: A dictionary with extracted character data. May contain keys like
-        'name', 'kanji', 'image', 'aliases', 'quirks', 'affiliations', and always 'url'.
+        tuple: (character dict, URL of the infobox image or None). The dict may
+        contain keys like 'name', 'kanji', 'image', 'aliases', 'quirks',
+        'affiliations', and always 'url'.
     """
-    res = requests.get(url)
-    soup = BeautifulSoup(res.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     infobox = soup.find("aside", class_="portable-infobox")
     if not infobox:
         print(f"No infobox found for {url}")
-        return {"url": url}
+        return {"url": url}, None
 
     character = {"url": url}
 
@@ -77,33 +86,131 @@ def scrape_character(url):
         elif "affiliation" in label:
             character["affiliations"] = parse_affiliations(value)
 
+    image_url = None
     image_el = infobox.find("figure", class_="pi-item pi-image")
     if image_el:
         img_tag = image_el.find("img")
         if img_tag and img_tag.has_attr("src"):
             image_url = img_tag["src"]
-            filename = slugify(character["name"]) + ".png"
-            image_path = download_image(image_url, filename)
-            if image_path:
-                character["image"] = f"characters/{filename}"
 
     character["affiliations"] = dedupe_affiliations(character.get("affiliations", []))
 
+    return character, image_url
+
+
+def image_filename(character):
+    """Returns the filename a character's image is saved under."""
+    return slugify(character["name"]) + ".png"
+
+
+def scrape_character(url, session=requests, image_folder=MEDIA_DIR):
+    """
+    Scrapes character data from a given MHA wiki character URL.
+
+    Args:
+        url (str): The character's wiki page URL.
+        session: Object providing ``get``, e.g. the requests module or a
+            replay.ReplaySession for offline runs.
+        image_folder (str): Destination folder for downloaded images.
+
+    Returns:
+        dict: A dictionary with extracted character data. May contain keys like
+        'name', 'kanji', 'image', 'aliases', 'quirks', 'affiliations', and always 'url'.
+    """
+    res = session.get(url)
+    character, image_url = extract_character(res.text, url)
+
+    if image_url:
+        filename = image_filename(character)
+        image_path = download_image(
+            image_url, filename, folder=image_folder, session=session
+        )
+        if image_path:
+            character["image"] = f"characters/{filename}"
+
     return character
 
 
-if __name__ == "__main__":
-    urls = []
+def run(urls, scrape_run, session=requests):
+    """
+    Scrapes every URL not yet recorded in the run's checkpoint.
+
+    Args:
+        urls (Iterable[str]): Character wiki page URLs, e.g. a list or the
+            stream yielded by discover.discover_character_urls.
+        scrape_run (ScrapeRun): The run receiving results and checkpoints.
+        session: Object providing ``get``, e.g. an archive.ArchivingSession.
+    """
+    done = scrape_run.completed()
+    if done:
+        print(f"Resuming: {len(done)} URLs already done.")
 
-    all_characters = []
     for url in urls:
-        data = scrape_character(url)
+        if url in done:
+            continue
+        done.add(url)
+        try:
+            data = scrape_character(url, session=session)
+        except requests.RequestException as e:
+            # Leave the URL out of the checkpoint so the next resume retries it.
+            print(f"Failed to scrape {url}: {e}")
+            continue
         time.sleep(random.uniform(1.5, 2.5))
         if "name" not in data:
             print(f"Skipping incomplete entry: {data['url']}")
+            scrape_run.record(url)
             continue
         pprint(data)
-        all_characters.append(data)
+        scrape_run.record(url, data)
+
 
-    with open(JSON_PATH, "w", encoding="utf-8") as f:
-        dump(all_characters, f, indent=2, ensure_ascii=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape MHA character data.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the previous run from its checkpoint.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard the previous run's output and checkpoint.",
+    )
+    parser.add_argument(
+        "--compact-only",
+        action="store_true",
+        help="Skip scraping and only compact the NDJSON output.",
+    )
+    parser.add_argument(
+        "--from-list",
+        action="store_true",
+        help="Scrape the URLs in character_urls.py instead of discovering them.",
+    )
+    parser.add_argument("--run-dir", default=RUN_DIR, help="Run output folder.")
+    parser.add_argument("--jsonc", help="Also write a JSONC copy to this path.")
+    args = parser.parse_args()
+
+    if args.from_list:
+        urls = character_urls
+    else:
+        urls = discover_character_urls()
+
+    with ScrapeRun(args.run_dir) as scrape_run:
+        if not args.compact_only:
+            if args.restart:
+                scrape_run.reset()
+            elif scrape_run.exists() and not args.resume:
+                sys.exit(
+                    f"A previous run exists in {args.run_dir}; "
+                    "pass --resume to continue it or --restart to discard it."
+                )
+            # Keep the raw pages so parser fixes can be re-applied offline
+            # with reextract.py. A resumed run appends to its earlier archive.
+            with PageArchiveWriter(scrape_run.archive_id()) as archive:
+                print(f"Archiving fetched pages to {archive.path}")
+                run(urls, scrape_run, ArchivingSession(requests, archive))
+
+    if not os.path.exists(scrape_run.ndjson_path):
+        sys.exit("Nothing to compact yet.")
+    count = compact(scrape_run.ndjson_path, JSON_PATH, args.jsonc)
+    print(f"Wrote {count} characters to {JSON_PATH}")
@@ -0,0 +1,246 @@
+"""
+Golden-output regression tests for the scraper, run fully offline against the
+recorded corpus. Regenerate the goldens with `python benchmark.py
+--update-golden` after an intentional parser change.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+# The scraper modules import each other as top-level scripts.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from archive import (  # noqa: E402
+    ArchivingSession,
+    PageArchiveReader,
+    PageArchiveWriter,
+    archive_path,
+)
+from benchmark import PAGES_GOLDEN, UTILS_GOLDEN, run_utils_cases, scrape_corpus  # noqa: E402
+from checkpoint import ScrapeRun  # noqa: E402
+from discover import (  # noqa: E402
+    WIKI_ROOT,
+    category_shards,
+    discover_character_urls,
+    parse_listing,
+)
+from reextract import reextract  # noqa: E402
+from replay import Corpus, MissingRecording, ReplayResponse, ReplaySession  # noqa: E402
+from scrape_characters import scrape_character  # noqa: E402
+
+
+def load_golden(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class UtilsGoldenTests(unittest.TestCase):
+    """Compares each parsing helper against its recorded outputs."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.golden = load_golden(UTILS_GOLDEN)
+        cls.actual = run_utils_cases()
+
+    def assert_matches_golden(self, helper):
+        for expected, actual in zip(self.golden[helper], self.actual[helper]):
+            with self.subTest(input=expected["input"]):
+                self.assertEqual(actual["input"], expected["input"])
+                self.assertEqual(actual["output"], expected["output"])
+        self.assertEqual(len(self.actual[helper]), len(self.golden[helper]))
+
+    def test_extract_quirks(self):
+        self.assert_matches_golden("extract_quirks")
+
+    def test_parse_affiliations(self):
+        self.assert_matches_golden("parse_affiliations")
+
+    def test_extract_aliases(self):
+        self.assert_matches_golden("extract_aliases")
+
+    def test_dedupe_affiliations(self):
+        self.assert_matches_golden("dedupe_affiliations")
+
+
+class ScrapeCharacterGoldenTests(unittest.TestCase):
+    """Replays the recorded wiki pages through scrape_character."""
+
+    def setUp(self):
+        self.session = ReplaySession(Corpus())
+        self.image_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.image_folder.cleanup)
+
+    def test_pages_match_golden(self):
+        golden = load_golden(PAGES_GOLDEN)
+        actual = scrape_corpus(self.session, self.image_folder.name)
+        self.assertEqual(sorted(actual), sorted(golden))
+        for url, expected in golden.items():
+            with self.subTest(url=url):
+                self.assertEqual(actual[url], expected)
+
+    def test_images_are_replayed(self):
+        url = "https://myheroacademia.fandom.com/wiki/Izuku_Midoriya"
+        character = scrape_character(url, self.session, self.image_folder.name)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.image_folder.name, "izuku-midoriya.png"))
+        )
+        self.assertEqual(character["image"], "characters/izuku-midoriya.png")
+
+    def test_unrecorded_url_raises(self):
+        with self.assertRaises(MissingRecording):
+            scrape_character(
+                "https://myheroacademia.fandom.com/wiki/Unrecorded", self.session
+            )
+
+
+def listing_html(titles, next_from=None):
+    links = "".join(
+        '<a class="category-page__member-link" '
+        f'href="/wiki/{t.replace(" ", "_")}" title="{t}">{t}</a>'
+        for t in titles
+    )
+    if next_from:
+        links += (
+            '<a class="category-page__pagination-next" '
+            f'href="/wiki/Category:Characters?from={next_from}">Next</a>'
+        )
+    return f"<div class='category-page__members'>{links}</div>"
+
+
+class FakeWikiSession:
+    """Serves category listings and a redirect-resolving API from memory."""
+
+    def __init__(self, listings, redirects):
+        self.listings = listings
+        self.redirects = redirects
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        if "/api.php" in url:
+            titles = parse_qs(urlparse(url).query)["titles"][0].split("|")
+            body = {
+                "query": {
+                    "redirects": [
+                        {"from": t, "to": self.redirects[t]}
+                        for t in titles
+                        if t in self.redirects
+                    ],
+                    "pages": [],
+                }
+            }
+            return ReplayResponse(url, 200, json.dumps(body).encode(), {})
+        html = self.listings.get(url)
+        if html is None:
+            return ReplayResponse(url, 200, listing_html([]).encode(), {})
+        return ReplayResponse(url, 200, html.encode(), {})
+
+
+class DiscoverTests(unittest.TestCase):
+    """Crawls an in-memory category instead of the live wiki."""
+
+    def setUp(self):
+        base = f"{WIKI_ROOT}/wiki/Category:Characters"
+        self.session = FakeWikiSession(
+            listings={
+                f"{base}?from=I": listing_html(
+                    ["Izuku Midoriya", "Category:Class 1-A"], next_from="Iz"
+                ),
+                f"{base}?from=Iz": listing_html(["Izumi", "Jiro"], next_from="Jo"),
+                f"{base}?from=K": listing_html(["Katsuki Bakugo", "Kyoka Jiro"]),
+                f"{base}?from=D": listing_html(["Dynamight"]),
+            },
+            redirects={"Katsuki Bakugo": "Dynamight"},
+        )
+
+    def test_parse_listing_skips_other_namespaces(self):
+        titles, next_url = parse_listing(
+            listing_html(["Izuku Midoriya", "Category:Class 1-A"], "Iz"),
+            f"{WIKI_ROOT}/wiki/Category:Characters",
+        )
+        self.assertEqual(titles, ["Izuku Midoriya"])
+        self.assertEqual(next_url, f"{WIKI_ROOT}/wiki/Category:Characters?from=Iz")
+
+    def test_shards_cover_the_alphabet(self):
+        shards = category_shards("Characters")
+        self.assertEqual(len(shards), 27)
+        self.assertEqual(shards[0][1:], (None, "A"))
+        self.assertEqual(shards[-1][1:], ("Z", None))
+
+    def test_discovery_canonicalizes_and_dedupes(self):
+        urls = list(discover_character_urls(self.session, workers=4))
+        self.assertEqual(
+            sorted(urls),
+            [
+                f"{WIKI_ROOT}/wiki/Dynamight",
+                f"{WIKI_ROOT}/wiki/Izuku_Midoriya",
+                f"{WIKI_ROOT}/wiki/Izumi",
+                f"{WIKI_ROOT}/wiki/Kyoka_Jiro",
+            ],
+        )
+
+    def test_shard_stops_at_next_shard(self):
+        list(discover_character_urls(self.session, workers=4))
+        # "Jiro" belongs to the J shard, so the I shard stops following links.
+        self.assertNotIn(
+            f"{WIKI_ROOT}/wiki/Category:Characters?from=Jo", self.session.requested
+        )
+
+
+class ArchiveTests(unittest.TestCase):
+    """Archives replayed pages and re-extracts them without the network."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.folder = tmp.name
+        self.replay = ReplaySession(Corpus())
+        with PageArchiveWriter("test", folder=self.folder) as writer:
+            session = ArchivingSession(self.replay, writer)
+            scrape_corpus(session, self.folder, self.replay.corpus.urls())
+            self.path = writer.path
+
+    def test_only_html_pages_are_archived(self):
+        with PageArchiveReader(self.path) as reader:
+            self.assertEqual(sorted(reader.urls()), sorted(self.replay.corpus.urls()))
+            url = reader.urls()[0]
+            self.assertEqual(reader.get(url), self.replay.get(url).text)
+
+    def test_reextract_matches_golden(self):
+        golden = load_golden(PAGES_GOLDEN)
+        characters = reextract(self.path, workers=2, image_folder=self.folder)
+        expected = [c for c in golden.values() if "name" in c]
+        self.assertEqual(
+            sorted(characters, key=lambda c: c["url"]),
+            sorted(expected, key=lambda c: c["url"]),
+        )
+
+    def test_resumed_run_appends_to_its_archive(self):
+        run_dir = os.path.join(self.folder, "run")
+        urls = self.replay.corpus.urls()
+        half = len(urls) // 2
+        # A first process archives half of the pages, a resumed one the rest.
+        for batch in (urls[:half], urls[half:]):
+            scrape_run = ScrapeRun(run_dir)
+            with PageArchiveWriter(scrape_run.archive_id(), self.folder) as writer:
+                scrape_corpus(ArchivingSession(self.replay, writer), self.folder, batch)
+
+        path = archive_path(scrape_run.archive_id(), self.folder)
+        with PageArchiveReader(path) as reader:
+            self.assertEqual(reader.urls(), urls)
+        golden = load_golden(PAGES_GOLDEN)
+        self.assertEqual(
+            len(reextract(path, workers=2, image_folder=self.folder)),
+            len([c for c in golden.values() if "name" in c]),
+        )
+
+    def test_restarted_run_starts_a_new_archive(self):
+        scrape_run = ScrapeRun(os.path.join(self.folder, "run"))
+        first = scrape_run.archive_id()
+        self.assertEqual(scrape_run.archive_id(create=False), first)
+        scrape_run.reset()
+        self.assertIsNone(scrape_run.archive_id(create=False))
@@ -93,7 +93,7 @@ def dedupe_affiliations(affiliations):
     return list(seen.values())
 
 
-def download_image(url, filename, folder=MEDIA_DIR):
+def download_image(url, filename, folder=MEDIA_DIR, session=requests):
     """
     Downloads an image from a URL and saves it to the specified folder.
 
@@ -101,6 +101,7 @@ def download_image(url, filename, folder=MEDIA_DIR):
         url (str): URL of the image to download.
         filename (str): Name to save the image as.
         folder (str): Destination folder for saving the image.
+        session: Object providing ``get``, e.g. the requests module.
 
     Returns:
         str or None: Relative path to saved image or None if download failed.
@@ -108,10 +109,14 @@ def download_image(url, filename, folder=MEDIA_DIR):
     os.makedirs(folder, exist_ok=True)
     full_path = os.path.join(folder, filename)
     try:
-        response = requests.get(url)
+        response = session.get(url)
         response.raise_for_status()
-        with open(full_path, "wb") as f:
+        # Replace rather than overwrite: the media store may hold hardlinks
+        # to this file, which an in-place write would silently change.
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "wb") as f:
             f.write(response.content)
+        os.replace(tmp_path, full_path)
         return os.path.relpath(full_path, os.path.join(PROJECT_ROOT, "media"))
     except Exception as e:
         print(f"Failed to download image {url}: {e}")
@@ -1,8 +1,6 @@
 import os
 import sys
-import json
 import argparse
-import re
 from django.conf import settings
 
 # Add the inner 'mha_api' folder to the module search path
@@ -16,6 +14,9 @@ def seed():
     import django
 
     django.setup()
+    from characters.images import render_variants
+    from characters.ingest import DEFAULT_BATCH_SIZE, ingest, sync
+    from characters.loaders import iter_entries
     from characters.models import (
         Character,
         Quirk,
@@ -24,94 +25,76 @@ def seed():
         CharacterAffiliation,
         Alias,
     )
+    from django.core.management.base import OutputWrapper
+    from django.db import transaction
 
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Seed MHA character data.")
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default="scraper/cleaned_characters.jsonc",
+        help="JSONC or NDJSON dataset file.",
+    )
     parser.add_argument(
         "--reset", action="store_true", help="Delete all existing data before seeding."
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Only apply changed, new and removed characters (by content hash).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of characters written per bulk batch.",
+    )
     args = parser.parse_args()
 
-    if args.reset:
-        print("🔄 Resetting existing data...")
-        Character.objects.all().delete()
-        Quirk.objects.all().delete()
-        Affiliation.objects.all().delete()
-        Alias.objects.all().delete()
-        CharacterQuirk.objects.all().delete()
-        CharacterAffiliation.objects.all().delete()
-
-    # Load character data
-    def load_jsonc(path):
-        with open(path, encoding="utf-8") as f:
-            lines = f.readlines()
-
-        cleaned_lines = []
-        for line in lines:
-            if '"' in line or "'" in line:
-                cleaned_lines.append(line)
-            else:
-                cleaned_lines.append(re.sub(r"//.*", "", line))
-
-        content = "".join(cleaned_lines)
-        return json.loads(content)
-
-    data = load_jsonc("scraper/cleaned_characters.jsonc")
-
-    for entry in data:
-        name = entry["name"]
-        url = entry["url"]
-        kanji = entry.get("kanji", "")
-        image_path = entry.get("image", "")
-
-        char, created = Character.objects.get_or_create(
-            name=name,
-            defaults={
-                "url": url,
-                "kanji": kanji,
-            },
+    # Stream character data; the ingest path consumes it in batches.
+    data = iter_entries(args.path)
+
+    with transaction.atomic():
+        if args.reset:
+            print("🔄 Resetting existing data...")
+            CharacterQuirk.objects.all().delete()
+            CharacterAffiliation.objects.all().delete()
+            Alias.objects.all().delete()
+            Character.objects.all().delete()
+            Quirk.objects.all().delete()
+            Affiliation.objects.all().delete()
+
+        if args.sync:
+            stats = sync(data, batch_size=args.batch_size)
+        else:
+            stats = ingest(data, batch_size=args.batch_size)
+
+    if args.sync:
+        for marker, key in (("+", "inserted"), ("~", "updated"), ("-", "deleted")):
+            for name in stats[key][:20]:
+                print(f"  {marker} {name}")
+            if len(stats[key]) > 20:
+                print(f"  {marker} ... and {len(stats[key]) - 20} more")
+        print(
+            f"🔁 {len(stats['inserted'])} inserted, {len(stats['updated'])} updated, "
+            f"{len(stats['deleted'])} deleted, {stats['unchanged']} unchanged "
+            f"in {stats['seconds']:.2f}s"
+        )
+    else:
+        print(
+            f"📦 {stats['entries']} characters "
+            f"({stats['characters_created']} created, "
+            f"{stats['characters_updated']} updated), "
+            f"{stats['aliases']} aliases, "
+            f"{stats['character_quirks']} quirk links, "
+            f"{stats['character_affiliations']} affiliation links "
+            f"in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
         )
 
-        if not created:
-            char.url = url
-            char.kanji = kanji
-            char.save()
-
-        if image_path:
-            full_path = os.path.join(settings.MEDIA_ROOT, image_path)
-            if os.path.exists(full_path):
-                from django.core.files import File
-
-                with open(full_path, "rb") as img_file:
-                    char.image.save(
-                        os.path.basename(full_path), File(img_file), save=True
-                    )
-
-        char.aliases.all().delete()
-        for alias_entry in entry.get("aliases", []):
-            if isinstance(alias_entry, str):
-                Alias.objects.create(name=alias_entry.strip(), character=char)
-            elif isinstance(alias_entry, dict) and "name" in alias_entry and isinstance(alias_entry["name"], str):
-                Alias.objects.create(name=alias_entry["name"].strip(), character=char)
-            else:
-                print(f"⚠️ Skipped unrecognized alias format for {char.name}: {alias_entry}")
-
-        for idx, q in enumerate(entry.get("quirks", [])):
-            quirk, _ = Quirk.objects.get_or_create(name=q["name"])
-            CharacterQuirk.objects.get_or_create(
-                character=char, quirk=quirk, defaults={"order": idx}
-            )
-
-        for idx, aff in enumerate(entry.get("affiliations", [])):
-            affiliation, _ = Affiliation.objects.get_or_create(name=aff["name"])
-            CharacterAffiliation.objects.get_or_create(
-                character=char,
-                affiliation=affiliation,
-                defaults={
-                    "note": aff.get("note", ""),
-                    "order": idx,
-                },
-            )
+    # Bulk writes skip post_save, so render image variants in one pass.
+    if settings.IMAGE_VARIANTS_ON_SAVE and stats["images"]:
+        render_variants(sorted(stats["images"]), OutputWrapper(sys.stderr))
 
     print("✅ Done seeding character data!")
 